@@ -0,0 +1,495 @@
+"""benchmark for `build.py`, on synthetic sites of increasing size
+
+generates a content directory with a configurable number of pages, body size,
+dotlist depth, index pages, filter usage, and `csv_table` blocks, then times
+`gen_all_pages` three ways for each site size:
+
+ - `cold`: nothing built yet, no build manifest or on-disk caches
+ - `warm`: every page rebuilt again (`smart_rebuild: false`), with the in-process caches warm
+ - `noop`: nothing changed, so every page is skipped using the build manifest
+
+and reports pages per second, how the time per page scales with the number of pages,
+and the peak RSS of each site. each site is built in a process of its own, so the peak
+RSS (which the os only tracks per process) is that of the three builds of that site. with `--stub-pandoc`, pandoc is replaced by a trivial converter
+running in-process, so that only the python side of the build is measured
+
+# Usage:
+
+```bash
+# pandoc stubbed out, 100 to 1600 pages
+python benchmark.py --stub-pandoc --pages 100 400 1600
+# real pandoc, with the filters and 2 csv tables per page, saving the results
+python benchmark.py --pages 50 200 --filters --csv-tables 2 --json bench.json
+```
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import io
+import json
+import math
+import os
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from typing import *
+from pathlib import Path
+
+import yaml
+
+import build
+from build import Config, PandocBackend
+
+
+REPO_DIR: Path = Path(__file__).resolve().parent
+
+LOREM: List[str] = (
+	"lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+	"incididunt ut labore et dolore magna aliqua ut enim ad minim veniam quis nostrud "
+	"exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat"
+).split()
+
+INDEX_BODY: str = """
+{{#__children__}}
+- [**{{title}}**]({{__filename__}})
+	*{{description}}*
+{{/__children__}}
+"""
+
+PHASES: Tuple[str, ...] = ("cold", "warm", "noop")
+
+
+class StubBackend(PandocBackend):
+	"""stands in for pandoc, to measure only the python side of the build
+
+	markdown is split into paragraphs (with `[text](target)` links) and fenced
+	code blocks, which is enough for the filters to have something to do.
+	the json it produces and reads is a small subset of the pandoc AST
+	"""
+
+	PATTERN_LINK: re.Pattern = re.compile(r"\[([^\]]*)\]\(([^)]*)\)")
+	PATTERN_CODE: re.Pattern = re.compile(r"^```\s*(?:\{([^}]*)\})?\n(.*?)^```\s*$", re.M | re.S)
+
+	def __init__(self, CFG: Config) -> None:
+		pass
+
+	@classmethod
+	def _inlines(cls, text: str) -> List[Dict[str, Any]]:
+		inlines: List[Dict[str, Any]] = list()
+		pos: int = 0
+		for m in cls.PATTERN_LINK.finditer(text):
+			inlines.append({"t": "Str", "c": text[pos:m.start()]})
+			inlines.append({
+				"t": "Link",
+				"c": [["", [], []], [{"t": "Str", "c": m.group(1)}], [m.group(2), ""]],
+			})
+			pos = m.end()
+		inlines.append({"t": "Str", "c": text[pos:]})
+		return inlines
+
+	@classmethod
+	def _code_attrs(cls, attrs: Optional[str]) -> List[Any]:
+		classes: List[str] = list()
+		keyvals: List[List[str]] = list()
+		for item in (attrs or "").split():
+			if item.startswith("."):
+				classes.append(item[1:])
+			elif "=" in item:
+				keyvals.append(item.split("=", 1))
+		return ["", classes, keyvals]
+
+	@classmethod
+	def to_ast(cls, text: str) -> Dict[str, Any]:
+		# drop the frontmatter, pandoc would read it as metadata
+		if text.lstrip().startswith("---"):
+			text = text.lstrip()[3:].split("\n---", 1)[-1]
+		blocks: List[Dict[str, Any]] = list()
+		pos: int = 0
+		for m in cls.PATTERN_CODE.finditer(text):
+			blocks.extend(
+				{"t": "Para", "c": cls._inlines(para.strip())}
+				for para in text[pos:m.start()].split("\n\n")
+				if para.strip()
+			)
+			blocks.append({"t": "CodeBlock", "c": [cls._code_attrs(m.group(1)), m.group(2)]})
+			pos = m.end()
+		blocks.extend(
+			{"t": "Para", "c": cls._inlines(para.strip())}
+			for para in text[pos:].split("\n\n")
+			if para.strip()
+		)
+		return {"pandoc-api-version": [1, 23, 1], "meta": {}, "blocks": blocks}
+
+	@classmethod
+	def _html_inlines(cls, inlines: List[Dict[str, Any]]) -> str:
+		return "".join(
+			f'<a href="{x["c"][2][0]}">{cls._html_inlines(x["c"][1])}</a>' if x["t"] == "Link"
+			else x["c"] if x["t"] == "Str"
+			else ""
+			for x in inlines
+		)
+
+	@classmethod
+	def to_html(cls, ast: Dict[str, Any]) -> str:
+		html: List[str] = list()
+		for block in ast["blocks"]:
+			if block["t"] == "Para":
+				html.append(f"<p>{cls._html_inlines(block['c'])}</p>")
+			elif block["t"] == "CodeBlock":
+				html.append(f"<pre><code>{block['c'][1]}</code></pre>")
+			elif block["t"] == "Table":
+				html.append(f"<table>{len(block['c'][4][0][3])} rows</table>")
+		return "\n".join(html)
+
+	def convert(
+		self,
+		text: str,
+		fmt_from: str,
+		fmt_to: str,
+		pandoc_args: Dict[str, Any],
+		label: str = "text",
+	) -> str:
+		ast: Dict[str, Any] = json.loads(text) if fmt_from == "json" else self.to_ast(text)
+		if fmt_to == "json":
+			return json.dumps(ast)
+		return self.to_html(ast)
+
+
+build.PANDOC_BACKENDS["stub"] = StubBackend
+
+
+def gen_page_body(
+	idx: int,
+	body_size: int,
+	links: List[str],
+	csv_tables: int,
+	csv_rows: int,
+) -> str:
+	"""generate about `body_size` bytes of markdown, with links to `links` and `csv_tables` tables"""
+	paragraphs: List[str] = list()
+	size: int = 0
+	i: int = idx
+	while size < body_size:
+		words: List[str] = [LOREM[(i + k) % len(LOREM)] for k in range(40)]
+		if links:
+			target: str = links[i % len(links)]
+			words.append(f"[{Path(target).stem}]({target})")
+		paragraphs.append(" ".join(words) + ".")
+		size += len(paragraphs[-1]) + 2
+		i += 7
+
+	for t in range(csv_tables):
+		rows: List[str] = ["name,value,notes"] + [
+			f"item{r},{(idx * 31 + r * 17 + t) % 1000},{LOREM[r % len(LOREM)]}"
+			for r in range(csv_rows)
+		]
+		paragraphs.insert(
+			min(len(paragraphs), 1 + t),
+			"```{.csv_table caption=\"table " + str(t) + "\"}\n" + "\n".join(rows) + "\n```",
+		)
+
+	return "\n\n".join(paragraphs) + "\n"
+
+
+def gen_site(
+	root: Path,
+	n_pages: int,
+	body_size: int = 2048,
+	depth: int = 3,
+	fanout: int = 4,
+	n_index: int = 8,
+	filters: bool = False,
+	csv_tables: int = 0,
+	csv_rows: int = 20,
+	backend: str = "subprocess",
+	jobs: int = 1,
+) -> Path:
+	"""write a synthetic site under `root`, returning the path to its config
+
+	### Parameters:
+	 - `n_pages : int`
+	   number of leaf pages
+	 - `body_size : int`
+	   approximate size of the body of each leaf page, in bytes
+	 - `depth : int`
+	   number of levels of the dotlist hierarchy, leaf pages are at this depth
+	 - `fanout : int`
+	   number of sections under each section
+	 - `n_index : int`
+	   number of sections which get an `__index__: true` page, shallowest first
+	 - `filters : bool`
+	   use the filters in `filters/`, and put links between pages for them to rewrite
+	 - `csv_tables : int`
+	   number of `csv_table` code blocks per leaf page, of `csv_rows` rows each
+	 - `backend : str`
+	   the `pandoc_backend` to use
+	"""
+	content: Path = root / "content"
+	resources: Path = content / "resources"
+	resources.mkdir(parents=True)
+	(resources / "style.css").write_text("body { margin: 0 auto; max-width: 50em; }\n")
+
+	# the section of each leaf page, as a dotlist
+	def _section(i: int) -> str:
+		return ".".join(
+			f"s{(i // (fanout ** k)) % fanout}"
+			for k in reversed(range(depth - 1))
+		)
+
+	leaf_names: List[str] = [
+		f"{_section(i)}.p{i}" if depth > 1 else f"p{i}"
+		for i in range(n_pages)
+	]
+
+	# all sections, shallowest first
+	sections: List[str] = sorted(
+		{
+			".".join(name.split(".")[:k])
+			for name in leaf_names
+			for k in range(1, depth)
+		},
+		key=lambda x: (x.count("."), x),
+	)
+	for section in sections[:n_index]:
+		(content / f"{section}.md").write_text(
+			"---\n"
+			+ yaml.dump({
+				"title": f"section {section}",
+				"description": f"index of {section}",
+				"__index__": True,
+				"__index_sort_key__": "title",
+			})
+			+ "---\n"
+			+ INDEX_BODY
+		)
+
+	for i, name in enumerate(leaf_names):
+		links: List[str] = (
+			[f"{leaf_names[(i + k) % n_pages]}.md" for k in (1, 2)]
+			if filters else []
+		)
+		(content / f"{name}.md").write_text(
+			"---\n"
+			+ yaml.dump({
+				"title": f"page {i}",
+				"description": f"synthetic page {i} in {name.rsplit('.', 1)[0]}",
+				"date": f"2022-{1 + i % 12:02d}-{1 + i % 28:02d}",
+				"tags": [f"tag{i % 5}", f"tag{i % 7}"],
+			})
+			+ "---\n\n"
+			+ gen_page_body(i, body_size, links, csv_tables, csv_rows)
+		)
+
+	config: Config = {
+		"content": "./content/",
+		"public": "./public/",
+		"resources": "./content/resources/",
+		"site_link": "https://example.com",
+		"pandoc_backend": backend,
+		"jobs": jobs,
+		"__pandoc__": {
+			"filter": (
+				[
+					str(REPO_DIR / "filters" / "links_md2html.py"),
+					*([str(REPO_DIR / "filters" / "csv_code_table.py")] if csv_tables else []),
+				]
+				if filters or csv_tables else []
+			),
+		},
+	}
+	config_path: Path = root / "config.yml"
+	config_path.write_text(yaml.dump(config))
+	return config_path
+
+
+def max_rss_mb() -> Tuple[float, float]:
+	"""peak resident memory of this process and of its (finished) children, in MB"""
+	# `ru_maxrss` is in kilobytes on linux, but bytes on macos
+	scale: float = 1 / 1024 if sys.platform != "darwin" else 1 / (1024 * 1024)
+	return (
+		resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+		resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale,
+	)
+
+
+# state and caches kept next to the config, removed before the `cold` build
+STATE_FILE_KEYS: Tuple[str, ...] = (
+	"build_manifest_fname",
+	"parse_cache_fname",
+	"pandoc_cache_dir",
+	"postprocess_state_fname",
+	"fingerprint_state_fname",
+	"search_state_fname",
+)
+
+
+def clear_build_state(CFG: Config) -> None:
+	"""remove the output, the build manifest, and every on-disk cache of the site, from its directory"""
+	paths: List[str] = [
+		CFG["public"],
+		*(CFG[k] for k in STATE_FILE_KEYS if CFG.get(k)),
+		# see `filters/csv_code_table.py`
+		os.environ.get("CSV_TABLE_CACHE_DIR", ".csv_table_cache"),
+	]
+	for path in paths:
+		if os.path.isdir(path):
+			shutil.rmtree(path)
+		elif os.path.exists(path):
+			os.remove(path)
+
+
+def bench_site(config_path: Path, quiet: bool = True) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+	"""build the site at `config_path` cold, warm, and no-op
+
+	should be run in a fresh process (see `bench_site_isolated`), since the peak RSS
+	is that of the whole process
+
+	### Returns: `Tuple[List[Dict[str, Any]], Dict[str, Any]]`
+	 the timings of each phase, and the peak memory of all of them
+	"""
+	results: List[Dict[str, Any]] = list()
+	cwd: str = os.getcwd()
+	os.chdir(config_path.parent)
+	try:
+		CFG: Config = build.load_config(config_path.name, [])
+		n_pages: int = sum(1 for _ in build.iter_content_files(CFG))
+
+		for phase in PHASES:
+			if phase == "cold":
+				clear_build_state(CFG)
+			CFG["smart_rebuild"] = phase != "warm"
+
+			out: io.StringIO = io.StringIO()
+			t_start: float = time.perf_counter()
+			with contextlib.redirect_stdout(out if quiet else sys.stdout):
+				build.build_site(CFG)
+			elapsed: float = time.perf_counter() - t_start
+
+			results.append({
+				"phase": phase,
+				"pages": n_pages,
+				"seconds": elapsed,
+				"pages_per_second": n_pages / elapsed,
+			})
+	finally:
+		os.chdir(cwd)
+
+	rss_self, rss_children = max_rss_mb()
+	memory: Dict[str, Any] = {
+		"pages": n_pages,
+		"peak_rss_mb": rss_self,
+		"peak_rss_children_mb": rss_children,
+	}
+	return results, memory
+
+
+def bench_site_isolated(config_path: Path, quiet: bool = True) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+	"""run `bench_site` in a new process, so its peak RSS is not that of an earlier, bigger site"""
+	with ProcessPoolExecutor(max_workers=1) as pool:
+		return pool.submit(bench_site, config_path, quiet).result()
+
+
+def scaling_exponent(results: List[Dict[str, Any]], phase: str) -> Optional[float]:
+	"""least squares slope of log(time) against log(pages), 1 being linear"""
+	points: List[Tuple[float, float]] = [
+		(math.log(r["pages"]), math.log(r["seconds"]))
+		for r in results
+		if r["phase"] == phase and r["seconds"] > 0
+	]
+	if len(points) < 2:
+		return None
+	mean_x: float = sum(x for x, _ in points) / len(points)
+	mean_y: float = sum(y for _, y in points) / len(points)
+	var_x: float = sum((x - mean_x) ** 2 for x, _ in points)
+	if var_x == 0:
+		return None
+	return sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+
+
+def print_report(results: List[Dict[str, Any]], memory: List[Dict[str, Any]]) -> None:
+	print(f"{'pages':>7} {'phase':<6} {'seconds':>9} {'pages/s':>9} {'ms/page':>9}")
+	for r in results:
+		print(
+			f"{r['pages']:>7} {r['phase']:<6} {r['seconds']:>9.3f} {r['pages_per_second']:>9.1f} "
+			f"{1000 * r['seconds'] / r['pages']:>9.3f}"
+		)
+
+	print("\n# peak RSS of all phases, in MB, of the build and of its largest child process (pandoc)")
+	print(f"{'pages':>7} {'rss MB':>8} {'child MB':>9}")
+	for m in memory:
+		print(f"{m['pages']:>7} {m['peak_rss_mb']:>8.1f} {m['peak_rss_children_mb']:>9.1f}")
+
+	print("\n# scaling of build time with number of pages (1.0 is linear)")
+	for phase in PHASES:
+		exponent: Optional[float] = scaling_exponent(results, phase)
+		print(f"\t{phase:<6} {'n/a' if exponent is None else f'{exponent:.2f}'}")
+
+
+def main(argv: List[str]) -> None:
+	parser: argparse.ArgumentParser = argparse.ArgumentParser(
+		description="benchmark build.py on synthetic sites of increasing size",
+	)
+	parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 800], help="number of pages, one site per value")
+	parser.add_argument("--body-size", type=int, default=2048, help="approximate body size of each page, in bytes")
+	parser.add_argument("--depth", type=int, default=3, help="depth of the dotlist hierarchy")
+	parser.add_argument("--fanout", type=int, default=4, help="sections under each section")
+	parser.add_argument("--index-pages", type=int, default=8, help="number of `__index__: true` pages")
+	parser.add_argument("--filters", action="store_true", help="use the filters, with links between pages")
+	parser.add_argument("--csv-tables", type=int, default=0, help="`csv_table` blocks per page")
+	parser.add_argument("--csv-rows", type=int, default=20, help="rows in each `csv_table` block")
+	parser.add_argument("--stub-pandoc", action="store_true", help="replace pandoc with an in-process stub")
+	parser.add_argument("--backend", default="subprocess", help="`pandoc_backend` to use, if not stubbed")
+	parser.add_argument("--jobs", type=int, default=1, help="pages to build at the same time, 0 for one per cpu")
+	parser.add_argument("--keep", type=str, default=None, help="generate the sites in this directory and keep them")
+	parser.add_argument("--json", type=str, default=None, help="write the results to this file")
+	parser.add_argument("--verbose", action="store_true", help="show the output of the builds")
+	args: argparse.Namespace = parser.parse_args(argv[1:])
+	if (args.filters or args.csv_tables) and build.pandocfilters is None:
+		# the stub backend only runs filters in-process, and real pandoc would fail to run them
+		parser.error("--filters and --csv-tables need the `pandocfilters` package")
+
+	root: Path = Path(args.keep if args.keep is not None else tempfile.mkdtemp(prefix="sitegen-bench-"))
+	results: List[Dict[str, Any]] = list()
+	memory: List[Dict[str, Any]] = list()
+	try:
+		for n_pages in args.pages:
+			site_dir: Path = root / f"site_{n_pages}"
+			shutil.rmtree(site_dir, ignore_errors=True)
+			config_path: Path = gen_site(
+				site_dir,
+				n_pages,
+				body_size=args.body_size,
+				depth=args.depth,
+				fanout=args.fanout,
+				n_index=args.index_pages,
+				filters=args.filters,
+				csv_tables=args.csv_tables,
+				csv_rows=args.csv_rows,
+				backend="stub" if args.stub_pandoc else args.backend,
+				jobs=args.jobs,
+			)
+			print(f"# benchmarking {n_pages} pages in '{site_dir}'", file=sys.stderr)
+			site_results, site_memory = bench_site_isolated(config_path, quiet=not args.verbose)
+			results.extend(site_results)
+			memory.append(site_memory)
+	finally:
+		if args.keep is None:
+			shutil.rmtree(root, ignore_errors=True)
+
+	print_report(results, memory)
+
+	if args.json is not None:
+		with open(args.json, "w", encoding="utf-8") as f:
+			json.dump(
+				{"args": vars(args), "results": results, "memory": memory},
+				f,
+				indent="\t",
+			)
+
+
+if __name__ == "__main__":
+	main(sys.argv)
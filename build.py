@@ -11,6 +11,24 @@ python build.py --help
 python build.py --default-cfg
 # builds according to the config
 python build.py <config_path>
+# rebuilds every page, even if none of its inputs changed since the last build
+python build.py <config_path> --rebuild
+# builds 8 pages at a time, reporting all failed pages at the end instead of stopping at the first
+python build.py <config_path> --jobs 8 --keep-going
+# prints which pages would be rebuilt and why, and how long that should take, without building anything
+python build.py <config_path> --plan
+# builds, then rebuilds affected pages whenever an input changes, serving the site at http://127.0.0.1:8000/
+python build.py <config_path> --watch --serve 8000
+# builds once, then serves the site at http://127.0.0.1:8000/ until Ctrl+C is pressed
+python build.py <config_path> --serve 8000
+# prints the slowest phases and pages, and writes a chrome trace of the build to `build_profile.json`
+python build.py <config_path> --profile build_profile.json
+# also runs each page build under cProfile (one page at a time), writing the stats to `build_profile.prof`
+python build.py <config_path> --profile --cprofile build_profile.prof
+# prints every page, its messages, and the loaded config (`--quiet` only prints failures)
+python build.py <config_path> --verbose
+# also appends an event per page (and for the start and end of each build) to `build_log.jsonl`
+python build.py <config_path> --log-json build_log.jsonl
 ```
 
 see the [example website](https://mivanit.github.io/pandoc-sitegen/)
@@ -40,6 +58,8 @@ If we want `blog.md` to be an index page, put `__index__: true` in the frontmatt
 
 - files matching `blog.*.md` will have their frontmatter read, and their path added to the dictionary as `__filename__`
 - that list of dictionaries will be passed to mustache as `__children__`
+- only the ones directly below `blog.md` (like `blog.post1.md`, but not `blog.2022.post2.md`, unless there is no `blog.2022.md`) are also passed as `__direct_children__`
+- with `dotlist_hierarchy: false`, the files under `blog/` are used instead, and `__filename__` is relative to `blog.html`
 
 So, we might have our `blog.md` file look like:
 ```markdown
@@ -60,12 +80,46 @@ No blog posts yet. :(
 {{/__children__}}
 ```
 
+### pagination
+
+To split a long index page, set `__index_page_size__: 10` in its frontmatter. `blog.html` then only gets the first 10 children, `blog.page2.html` the next 10, and so on. Each page also gets:
+
+- `__page__` and `__page_count__`, the page number (starting from 1) and the number of pages
+- `__prev_page__` and `__next_page__`, the filename of the previous and next page, unset on the first and last page
+- `__pages__`, a list with the `__page__`, `__filename__`, and `__current__` of every page
+
+```markdown
+{{#__prev_page__}}[newer]({{__prev_page__}}){{/__prev_page__}}
+page {{__page__}} of {{__page_count__}}
+{{#__next_page__}}[older]({{__next_page__}}){{/__next_page__}}
+```
+
+Only the pages whose children changed are rebuilt. The feeds are still of all children.
+
+## feeds
+
+Each index page also gets an RSS feed next to it (`blog.rss`), of its `feed_max_items` most recent children by the date in their `date` frontmatter (see `feed_date_key`). Set `make_atom: true` to also get an Atom feed (`blog.atom`), or `make_rss: false` to turn feeds off. `site_link` has to be set, since feeds need absolute links. A feed is only rewritten when its items change.
+
+## tag pages
+
+With `make_tag_pages: true`, each tag in the `tags` frontmatter of a page (see `tags_key`) gets a page listing the pages with that tag, and feeds like an index page. These are at `tags.<tag>.html` (or `tags/<tag>.html` with `dotlist_hierarchy: false`), with the tag lowercased and spaces replaced by `-`. Set `tag_template_file` to a mustache template for the body, which gets `__tag__` and `__children__` like an index page. Pages of tags which are no longer used are removed.
+
+## search
+
+With `make_search_index: true`, an index of the title, tags, description, and text of every page is written to `search/` in the public directory, for a search box on the site to fetch. It is split into json files by the first letters of each word, so a search only fetches `search/docs.json` and the files for its words. Only the pages which changed are indexed again.
+
+## minifying and compressing
+
+`minify_html` and `minify_css` minify the html and css files in the public directory after each build, and `compress_gzip` and `compress_brotli` write `.gz` and `.br` copies next to them, for servers which serve precompressed files. Only files which changed since the last build are processed.
+
 ## resources & assets
 
 Won't lie, this part is kind of messy at the moment. 
 
 Ideally, you have your assets (such as CSS, images) located in a directory under your content directory -- specified by `resources` in the config file. Then, any links to them will be preserved, since the whole directory is copied.
 
+With `fingerprint_assets: true`, each CSS, JS, image, or font file is also copied to a name with its content hash (`css/default.3f2a1b9c0d4e.css`), and links to it from the generated pages are rewritten to point there, so the files can be served with a long cache lifetime. Templates can get these paths as `{{__assets__.css/default.css}}`.
+
 
 ## building the website
 
@@ -82,6 +136,7 @@ you will need:
 
 - Python 3.8 or later
 - [`Pandoc`](https://pandoc.org/) for rendering markdown to html. make sure it is in your path!
+  - optionally, `pandoc-server` (shipped with pandoc 3), to avoid starting a new pandoc process for every page with `pandoc_backend: "server"`
 - [`PyYAML`](https://pyyaml.org/), which you can install with `pip install PyYAML`
 - [`chevron`](https://github.com/noahmorrison/chevron) for rendering [mustache](http://mustache.github.io/mustache.5.html) templates. The version on pypi is broken, so you'll need to install from git: `pip install git+https://github.com/noahmorrison/chevron@5e1c12827b7fc3db30cb3b24cae9a7ee3092822b`
 
@@ -101,8 +156,8 @@ Every feature I originally intended for `pandoc-sitegen` has been added, but I'm
 - [x] templating in YAML headers? (rendering with globals now applied to yaml header raw text)
   - filter locations and other paths in header are not portable, would be good to fix this
 - [ ] inheriting pandoc args/config from parent items (mostly for styling different parts of a site differently)
-- [ ] auto-generate tag pages
-- [ ] generation of RSS files
+- [x] auto-generate tag pages (set `make_tag_pages: true`)
+- [x] generation of RSS files (on by default, see `make_rss` and `make_atom`)
 
 I'd like to keep this project as a single-file script of pure python with minimal dependencies, for simplicity and portability.
 
@@ -123,19 +178,57 @@ By [Michael Ivanitskiy](mailto:mivanits@umich.edu)
 """
 
 
+import contextlib
+import cProfile
+import datetime
+import email.utils
+import functools
+import gzip
+import hashlib
+import heapq
+import http.server
+import importlib.util
+import itertools
 import json
+import socket
+import sqlite3
 import time
 from typing import *
 import subprocess
+import io
 import os
+import posixpath
+import pstats
+import re
 import sys
+import tempfile
+import traceback
+import threading
+from collections import ChainMap, OrderedDict
+import urllib.error
+import urllib.request
+from xml.sax.saxutils import escape as xml_escape
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pathlib import Path
-from shutil import copytree
+import shutil
 
 import yaml
 import chevron  # type: ignore
 
-RSS_TEMPLATE: str = """<rss version="0.91">
+try:
+	import pandocfilters  # type: ignore
+except ImportError:
+	# only needed to run filters in-process, see `run_pandoc`
+	pandocfilters = None
+
+try:
+	import brotli  # type: ignore
+except ImportError:
+	# only needed for `compress_brotli`, see `postprocess_file`
+	brotli = None
+
+RSS_TEMPLATE: str = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0">
   <channel>
     <title>{title}</title>
     <link>{link}</link>
@@ -149,9 +242,38 @@ RSS_TEMPLATE: str = """<rss version="0.91">
 RSS_ITEM_TEMPLATE: str = """<item>
       <title>{title}</title>
       <link>{link}</link>
-      <description>{description}</description>
+      <guid>{link}</guid>
+      <description>{description}</description>{pub_date}
     </item>"""
 
+TAG_PAGE_TEMPLATE: str = """# {{__tag__}}
+
+{{#__children__}}
+- [**{{title}}**]({{__filename__}})  
+	*{{description}}*
+{{/__children__}}
+"""
+
+ATOM_TEMPLATE: str = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <title>{title}</title>
+  <subtitle>{subtitle}</subtitle>
+  <link href="{link}"/>
+  <id>{link}</id>
+  <updated>{updated}</updated>
+  <author><name>{author}</name></author>
+  {entries}
+</feed>
+"""
+
+ATOM_ENTRY_TEMPLATE: str = """<entry>
+    <title>{title}</title>
+    <link href="{link}"/>
+    <id>{link}</id>
+    <updated>{updated}</updated>
+    <summary>{summary}</summary>
+  </entry>"""
+
 
 DEFAULT_CONFIG_STR: str = """# NOTE: `!join` is a custom directive that will add the elements of the list together. useful for concatenating strings
 
@@ -184,7 +306,7 @@ frontmatter_defaults:
 # ==============================
 # whether to treat files with `index: true` specially
 make_index_files: true 
-# dont worry about this, its for generating temporary files
+# markdown files ending with this are ignored. older versions used it for temporary index files
 generated_index_suffix: "._index.md" 
 
 # whether to give each HTML file a final pass with the mustache renderer, 
@@ -192,15 +314,112 @@ generated_index_suffix: "._index.md"
 # you can also set this to an integer if you want to re-render the templates multiple times
 mustache_rerender: true 
 
-# whether to keep track of when the site was last built
-# any file last modified prior to the saved time will not be rebuilt
-# this can be overridden by passing `--rebuild` or by deleting the file at `build_time_fname`
+# whether to keep a manifest of the content hash of every input, and which inputs each page was built from
+# a page is only rebuilt if its source, the config, its includes/filters/template, or (for index pages) its children changed
+# this can be overridden by passing `--rebuild` or by deleting the file at `build_manifest_fname`
 smart_rebuild: true
-build_time_fname": ".build_time"
+build_manifest_fname: ".build_manifest.json"
+
+# sqlite file in which the parsed frontmatter of each page is cached, by content hash,
+# so that unchanged pages are not parsed again on the next build. set to null to disable
+parse_cache_fname: ".parse_cache.sqlite"
+
+# directory in which to cache the html generated by pandoc (e.g. ".pandoc_cache"), by a hash of the markdown,
+# pandoc args, contents of files passed to pandoc, pandoc backend and version. unlike `smart_rebuild`, this still
+# works on a fresh checkout, if the directory is kept (e.g. by CI). files read by filters themselves (such as
+# the `source` of a csv table) are not part of the key, so only enable this if your filters dont read files.
+# with `--rebuild`, the cache is not read, only refreshed. null to disable
+pandoc_cache_dir: null
+# least recently used entries are removed once the cache is larger than this
+pandoc_cache_max_mb: 256
 
 # use dotlist hierarchy if true, folder hierarchy if false. this will mess with relative paths in the markdown files
 dotlist_hierarchy: true
 
+# number of pages to build at the same time. `1` builds pages one by one, `0` uses one job per cpu
+# can be overridden by passing `--jobs N`. the pages which took longest on the last build (as recorded
+# in `build_manifest_fname`) are started first, and index and tag pages after the pages they list
+jobs: 1
+# if true, keep building the remaining pages after a page fails, and report all failures at the end
+# otherwise, stop at the first failure. can be overridden by passing `--keep-going`
+keep_going: false
+
+# how to run pandoc. "subprocess" starts a new pandoc process for every page
+# "server" starts `pandoc_server_count` local pandoc-server processes once, and sends every page to them
+# pages using options pandoc-server does not support (such as filters) still use a subprocess
+pandoc_backend: "subprocess"
+pandoc_server_cmd: ["pandoc-server"]
+pandoc_server_count: 1
+# seconds pandoc-server may spend converting a single page
+pandoc_server_timeout: 60
+# run python filters which define `FILTER_ACTIONS` inside this process, instead of starting
+# a python interpreter per filter per page. pages with any other filters run them through pandoc as usual
+inprocess_filters: true
+
+# resources are synced to the public directory on every build, copying only new or changed files
+# "copy" copies them, "hardlink" links them (no bytes are copied, but the public file is then the same file as the source)
+# "reflink" makes a copy-on-write clone where the filesystem supports it, and copies otherwise
+resources_sync_mode: "copy"
+# how to tell if a resource changed: "mtime" compares size and modification time, "hash" compares contents
+resources_sync_check: "mtime"
+# whether to delete files from the public resources directory which are no longer in `resources`
+resources_sync_delete: false
+# if true, resources with one of `fingerprint_extensions` are also copied to a name with their content hash
+# (`css/default.css` to `css/default.3f2a1b9c0d4e.css`), so they can be cached forever, and `href` and `src`
+# links to them in generated pages (including the `include-*` fragments) are rewritten to point there.
+# templates get the fingerprinted paths as `{{__assets__.css/default.css}}`, relative to the public directory.
+# links inside css files are not rewritten. the copies written are recorded in `fingerprint_state_fname`,
+# and those of older versions are removed
+fingerprint_assets: false
+fingerprint_extensions: [".css", ".js", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".ico", ".woff", ".woff2"]
+fingerprint_state_fname: ".fingerprint_state.json"
+
+# with `--watch`, how often (in seconds) to check the content, resources, config, and other inputs for changes
+watch_interval: 0.5
+
+# search
+# ==============================
+# if true, write an index of the title, tags, description, and text of every page to `search_index_dir`
+# in the public directory, for client-side search. it is split into json files by the first letters of each
+# word, so a search only fetches `docs.json` and the files for its words. only pages which changed since the
+# last build are indexed again, as recorded in `search_state_fname`
+make_search_index: false
+search_index_dir: "search"
+search_state_fname: ".search_state.json"
+
+# post-processing
+# ==============================
+# after each build, html and css files in the public directory can be minified in place, and files with
+# one of `compress_extensions` get compressed copies next to them (`page.html.gz`, `page.html.br`), for
+# servers which serve precompressed files. only files which changed since the last build are processed,
+# as recorded in `postprocess_state_fname`. `compress_brotli` needs the `brotli` package
+minify_html: false
+minify_css: false
+compress_gzip: false
+compress_brotli: false
+compress_extensions: [".html", ".css", ".js", ".svg", ".xml", ".rss", ".atom", ".json", ".txt"]
+postprocess_state_fname: ".postprocess_state.json"
+
+# feeds
+# ==============================
+# index pages get an rss feed (and an atom feed, if `make_atom`) of the `feed_max_items` most recent
+# pages below them, by the date in `feed_date_key` in their frontmatter. set `feed_max_items` to null for all
+make_rss: true
+make_atom: false
+feed_max_items: 20
+feed_date_key: "date"
+
+# tag pages
+# ==============================
+# if true, generate a page (and feeds, if `make_rss`) for each tag in the `tags_key` of the frontmatter of pages,
+# listing those pages. these are named like pages below `tag_page_dir` in the hierarchy (e.g. `tags.<tag>.html`),
+# and are only regenerated when the set of pages with that tag, or the frontmatter of one of them, changes.
+# `tag_template_file` is a mustache template for the body, given `__tag__` and `__children__` like index pages
+make_tag_pages: false
+tags_key: "tags"
+tag_page_dir: "tags"
+tag_template_file: null
+
 # pandoc stuff
 # ==============================
 # these items will be passed as arguments to pandoc
@@ -236,8 +455,14 @@ def join(loader, node):
 	return "".join([str(i) for i in seq])
 
 
-# register the tag handler
+# use the LibYAML based loaders and dumper if PyYAML was built with it, they are much faster
+YAML_SAFE_LOADER: Type[yaml.SafeLoader] = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+YAML_FULL_LOADER: Type[yaml.FullLoader] = getattr(yaml, "CFullLoader", yaml.FullLoader)
+YAML_DUMPER: Type[yaml.Dumper] = getattr(yaml, "CDumper", yaml.Dumper)
+
+# register the tag handler, for the config
 yaml.add_constructor("!join", join)
+yaml.add_constructor("!join", join, Loader=YAML_FULL_LOADER)
 
 # define a custom `Config` type
 Config = Dict[str, Any]
@@ -256,6 +481,16 @@ class FrontmatterKeys:
 	pandoc: str = "__pandoc__"
 	filename: str = "__filename__"
 	children: str = "__children__"
+	direct_children: str = "__direct_children__"
+	tag: str = "__tag__"
+	index_page_size: str = "__index_page_size__"
+	page: str = "__page__"
+	page_count: str = "__page_count__"
+	prev_page: str = "__prev_page__"
+	next_page: str = "__next_page__"
+	pages: str = "__pages__"
+	current: str = "__current__"
+	assets: str = "__assets__"
 
 	def __init__(self):
 		raise Exception("FrontmatterKeys is a read-only class")
@@ -276,7 +511,7 @@ DEFAULT_CONFIG: Config = {
 	"mustache_rerender": True,
 	"dotlist_hierarchy": True,
 	"smart_rebuild": True,
-	"build_time_fname": ".build_time",
+	"build_manifest_fname": ".build_manifest.json",
 	"public": None,
 	"globals_key" : "__globals__",
 	"extras_path": None,
@@ -288,6 +523,39 @@ DEFAULT_CONFIG: Config = {
 	},
 	"site_link": None,
 	"make_rss": True,
+	"make_atom": False,
+	"feed_max_items": 20,
+	"feed_date_key": "date",
+	"make_tag_pages": False,
+	"tags_key": "tags",
+	"tag_page_dir": "tags",
+	"tag_template_file": None,
+	"jobs": 1,
+	"keep_going": False,
+	"pandoc_backend": "subprocess",
+	"pandoc_server_cmd": ["pandoc-server"],
+	"pandoc_server_count": 1,
+	"pandoc_server_timeout": 60,
+	"inprocess_filters": True,
+	"resources_sync_mode": "copy",
+	"resources_sync_check": "mtime",
+	"resources_sync_delete": False,
+	"fingerprint_assets": False,
+	"fingerprint_extensions": [".css", ".js", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".ico", ".woff", ".woff2"],
+	"fingerprint_state_fname": ".fingerprint_state.json",
+	"watch_interval": 0.5,
+	"make_search_index": False,
+	"search_index_dir": "search",
+	"search_state_fname": ".search_state.json",
+	"minify_html": False,
+	"minify_css": False,
+	"compress_gzip": False,
+	"compress_brotli": False,
+	"compress_extensions": [".html", ".css", ".js", ".svg", ".xml", ".rss", ".atom", ".json", ".txt"],
+	"postprocess_state_fname": ".postprocess_state.json",
+	"parse_cache_fname": ".parse_cache.sqlite",
+	"pandoc_cache_dir": None,
+	"pandoc_cache_max_mb": 256,
 }
 
 def update_extras(config: Config) -> None:
@@ -303,7 +571,7 @@ def update_extras(config: Config) -> None:
 	else:
 		with open(globals_file, "r", encoding="utf-8") as f:
 			if globals_file.endswith(".yaml") or globals_file.endswith(".yml"):
-				file_data = yaml.safe_load(f)
+				file_data = yaml.load(f, Loader=YAML_SAFE_LOADER)
 			elif globals_file.endswith(".json"):
 				file_data = json.load(f)
 			else:
@@ -315,15 +583,233 @@ def update_extras(config: Config) -> None:
 		**config.get("extras_data", {}),
 	}
 
+class BuildProfiler(object):
+	"""times each phase of the build, per page and per build, when enabled with `--profile`
+
+	phases are timed with `with PROFILER.phase("name"):`, and nest. phases inside a
+	`page` phase are attributed to that page, per thread. when disabled, `phase`
+	returns a shared no-op context, so the instrumentation costs next to nothing.
+
+	the recorded phases can be written as a chrome trace (open it in `chrome://tracing`
+	or https://ui.perfetto.dev), and summarized as a table of the slowest phases and
+	pages. optionally, the python side of each page build is run under `cProfile`
+	"""
+
+	_NULL_CONTEXT: ContextManager[None] = contextlib.nullcontext()
+
+	def __init__(self) -> None:
+		self.enabled: bool = False
+		self.cprofile: Optional[cProfile.Profile] = None
+		# chrome trace events: name, category, start and duration in microseconds, thread, page
+		self.events: List[Dict[str, Any]] = list()
+		self._lock: threading.Lock = threading.Lock()
+		self._local: threading.local = threading.local()
+		self._t0: float = time.perf_counter()
+
+	def enable(self, cprofile: bool = False) -> None:
+		"""start recording, discarding anything recorded so far"""
+		self.enabled = True
+		self.cprofile = cProfile.Profile() if cprofile else None
+		self.events = list()
+		self._t0 = time.perf_counter()
+
+	def phase(self, name: str, page: Optional[str] = None) -> ContextManager[None]:
+		"""time the enclosed block as phase `name`, of `page` if given (otherwise the enclosing page)"""
+		if not self.enabled:
+			return self._NULL_CONTEXT
+		return self._phase(name, page)
+
+	@contextlib.contextmanager
+	def _phase(self, name: str, page: Optional[str]) -> Iterator[None]:
+		prev_page: Optional[str] = getattr(self._local, "page", None)
+		if page is None:
+			page = prev_page
+		self._local.page = page
+		# only one `cProfile` can be active at a time, so only profile the outermost page phase
+		# (`--cprofile` builds one page at a time)
+		prof: Optional[cProfile.Profile] = (
+			self.cprofile if (name == "page" and prev_page is None) else None
+		)
+		if prof is not None:
+			prof.enable()
+		t_start: float = time.perf_counter()
+		try:
+			yield
+		finally:
+			t_end: float = time.perf_counter()
+			if prof is not None:
+				prof.disable()
+			event: Dict[str, Any] = {
+				"name": name,
+				"cat": "page" if page is not None else "build",
+				"ph": "X",
+				"ts": (t_start - self._t0) * 1e6,
+				"dur": (t_end - t_start) * 1e6,
+				"pid": os.getpid(),
+				"tid": threading.get_ident(),
+				"args": {"page": page} if page is not None else {},
+			}
+			self._local.page = prev_page
+			with self._lock:
+				self.events.append(event)
+
+	def save_trace(self, path: Union[str, Path]) -> None:
+		"""write the recorded phases as a chrome trace json file"""
+		write_atomic(path, json.dumps({"traceEvents": self.events, "displayTimeUnit": "ms"}))
+
+	def summary(self, n: int = 15) -> str:
+		"""table of the `n` phases with the most total time, and the `n` slowest pages
+
+		nested phases are included in the time of the phases containing them
+		"""
+		phase_times: Dict[str, List[float]] = dict()
+		page_times: Dict[str, float] = dict()
+		for event in self.events:
+			phase_times.setdefault(event["name"], list()).append(event["dur"] / 1e3)
+			if event["name"] == "page":
+				page_times[event["args"]["page"]] = event["dur"] / 1e3
+
+		lines: List[str] = [
+			f"{'phase':<24} {'count':>6} {'total ms':>10} {'mean ms':>10} {'max ms':>10}",
+		]
+		for name, times in heapq.nlargest(n, phase_times.items(), key=lambda x: sum(x[1])):
+			lines.append(
+				f"{name:<24} {len(times):>6} {sum(times):>10.1f} {sum(times) / len(times):>10.2f} {max(times):>10.1f}"
+			)
+		lines.append("")
+		lines.append(f"{'page':<48} {'ms':>10}")
+		for page, t in heapq.nlargest(n, page_times.items(), key=lambda x: x[1]):
+			lines.append(f"{page:<48} {t:>10.1f}")
+
+		return "\n".join(lines)
+
+
+# profiler for the whole build, enabled by `--profile`
+PROFILER: BuildProfiler = BuildProfiler()
+
+
+class BuildLog(object):
+	"""leveled output of the build, plus an optional log of events as JSON lines
+
+	at the default level, the status of each page is only counted, and a one-line
+	progress summary is printed at most every `progress_interval` seconds, so printing
+	does not slow down large builds or swell CI logs. failed pages are always printed.
+	`--verbose` prints every page and the messages of each page build, as well as the
+	config and the list of pages, and `--quiet` only prints failures, errors, and warnings.
+
+	with `--log-json`, each event (the start of the build, each page and its status,
+	cache statistics, the summary) is written as a line of JSON, regardless of the level
+	"""
+
+	QUIET: int = 0
+	NORMAL: int = 1
+	VERBOSE: int = 2
+
+	def __init__(self) -> None:
+		self.level: int = self.NORMAL
+		self.progress_interval: float = 2.0
+		self._json_file: Optional[IO[str]] = None
+		self._lock: threading.Lock = threading.Lock()
+		self._n_files: int = 0
+		self._counts: Dict[str, int] = dict()
+		self._t_start: float = time.perf_counter()
+		self._t_progress: float = self._t_start
+
+	def open_json(self, path: Union[str, Path]) -> None:
+		"""start writing events to `path`, appending to it if it exists"""
+		self.close()
+		self._json_file = open(path, "a", encoding="utf-8")
+
+	def close(self) -> None:
+		if self._json_file is not None:
+			self._json_file.close()
+			self._json_file = None
+
+	def info(self, msg: str, level: int = NORMAL) -> None:
+		"""print `msg` if the level is at least `level`"""
+		if self.level >= level:
+			print(msg)
+
+	def verbose(self, msg: str) -> None:
+		self.info(msg, self.VERBOSE)
+
+	def warning(self, msg: str) -> None:
+		"""print `msg` even with `--quiet`, and log it as an event"""
+		self.info(msg, self.QUIET)
+		self.event("warning", message=msg)
+
+	def event(self, event: str, **data: Any) -> None:
+		"""write an event to the JSON log, if enabled"""
+		if self._json_file is None:
+			return
+		line: str = json.dumps({"event": event, "time": time.time(), **data}, default=str)
+		with self._lock:
+			self._json_file.write(line + "\n")
+
+	def start_pages(self, n_files: int) -> None:
+		"""start counting the status of `n_files` pages"""
+		self._n_files = n_files
+		self._counts = dict()
+		self._t_start = time.perf_counter()
+		self._t_progress = self._t_start
+		self.event("build_start", n_files=n_files)
+
+	def page(self, idx: int, status: str, label: str, messages: Iterable[str] = ()) -> None:
+		"""record the `status` of page number `idx`, one of "unmodified", "built", or "FAILED"
+
+		pages are numbered in the order they are done, since they are not built in the
+		order they were found. `idx` is only written to the JSON log
+		"""
+		self._counts[status] = self._counts.get(status, 0) + 1
+		n_done: int = sum(self._counts.values())
+		self.event("page", idx=idx, status=status, page=label)
+		if status == "FAILED" or self.level >= self.VERBOSE:
+			print(f"\t({n_done} / {self._n_files})  [{status:<10}]  '{label}'")
+			if self.level >= self.VERBOSE:
+				for msg in messages:
+					print(msg)
+		elif self.level >= self.NORMAL:
+			t_now: float = time.perf_counter()
+			if t_now - self._t_progress >= self.progress_interval:
+				self._t_progress = t_now
+				print(f"\t[{n_done} / {self._n_files}]  {self._format_counts()}")
+
+	def end_pages(self) -> None:
+		"""print and log the summary of the pages, since `start_pages`"""
+		elapsed: float = time.perf_counter() - self._t_start
+		self.info(
+			f"# Done {sum(self._counts.values())} / {self._n_files} pages in {elapsed:.2f}s:  {self._format_counts()}"
+		)
+		self.event("build_end", n_files=self._n_files, seconds=elapsed, **self._counts)
+
+	def _format_counts(self) -> str:
+		return ", ".join(f"{n} {status}" for status, n in sorted(self._counts.items()))
+
+
+# output of the build, set by `--quiet`, `--verbose`, and `--log-json`
+LOG: BuildLog = BuildLog()
+
+
+# pandoc args whose values are paths to files read during the build
+PANDOC_FILE_ARGS: Tuple[str, ...] = (
+	"include-in-header",
+	"include-before-body",
+	"include-after-body",
+	"filter",
+	"lua-filter",
+	"template",
+)
+
+
 class PandocMarkdown(object):
 	"""handles pandoc-flavored markdown and frontmatter"""
 
 	def __init__(
 		self,
 		delim: str = "---",
-		loader: Callable[[str], Dict] = yaml.safe_load,
+		loader: Callable[[str], Dict] = lambda x: yaml.load(x, Loader=YAML_SAFE_LOADER),
 		writer: Callable[[Dict], str] = lambda x: yaml.dump(
-			x, default_flow_style=None, sort_keys=False
+			x, Dumper=YAML_DUMPER, default_flow_style=None, sort_keys=False
 		),
 	) -> None:
 
@@ -334,35 +820,77 @@ class PandocMarkdown(object):
 		self.initialized: bool = False
 		# get the first section and parse as yaml
 		self.frontmatter: Dict[str, Any] = dict()
-		# get the content
-		self.content: str = ""
+		# the content, or `None` if it has not been read from `self.content_source` yet
+		self._content: Optional[str] = ""
+		# file and byte offset the content starts at, if it was loaded from a file
+		self.content_source: Optional[Tuple[Path, int]] = None
+
+	@property
+	def content(self) -> str:
+		"""the document body, read from `content_source` the first time it is accessed"""
+		if self._content is None:
+			filename, offset = self.content_source
+			with open(filename, "rb") as f:
+				f.seek(offset)
+				self._content = f.read().decode("utf-8").replace("\r\n", "\n")
+		return self._content
+
+	@content.setter
+	def content(self, value: str) -> None:
+		self._content = value
 
 	def load_file(self, filename: Path) -> None:
 		"""load a file into the pandoc markdown object
 
+		only the frontmatter is read and parsed: lines are read up to the closing
+		delimiter, and the content is read from there only once it is accessed.
+		delimiters must be on a line of their own, so a `---` horizontal rule in
+		the body is left alone
+
 		### Parameters:
 		 - `filename : Path`
 		   the filename to load
 		"""
 
-		with open(filename, "r", encoding="utf-8") as f:
-			# split the document by yaml file front matter
-			file_text: str = f.read()
-			sections: List[str] = file_text.split(self.delim)
-
-		# check the zeroth section is empty
-		if sections[0].strip():
+		with open(filename, "rb") as f:
+			frontmatter_text, offset = self.read_frontmatter(f, filename)
+
+		# parse the frontmatter as yaml
+		self.set_frontmatter_source(self.loader(frontmatter_text), filename, offset)
+
+	def read_frontmatter(self, f: BinaryIO, filename: Path) -> Tuple[str, int]:
+		"""read the frontmatter text from the start of `f`, and the byte offset the content starts at"""
+		frontmatter_lines: List[str] = list()
+		# skip blank lines, the first nonblank line should be the opening delimiter
+		line: str = ""
+		for line_b in f:
+			line = line_b.decode("utf-8")
+			if line.strip():
+				break
+		if line.strip() != self.delim:
 			raise ValueError(
-				f"file does not start with yaml front matter, found at start of file: {sections[0]}"
+				f"file does not start with yaml front matter, found at start of file: {line}"
 			)
 
-		if len(sections) < 3:
-			raise ValueError(f"missing sections in file {filename}, check delims")
-
-		# get the first section and parse as yaml
-		self.frontmatter = self.loader(sections[1])
-		# get the content
-		self.content = self.delim.join(sections[2:])
+		# read the frontmatter up to the closing delimiter
+		# `readline` instead of iterating, since we need `tell` afterwards
+		while True:
+			line_b = f.readline()
+			if not line_b:
+				raise ValueError(f"missing sections in file {filename}, check delims")
+			line = line_b.decode("utf-8")
+			if line.rstrip() == self.delim:
+				break
+			frontmatter_lines.append(line)
+
+		# content starts right after the delimiter, like when splitting on it
+		return "".join(frontmatter_lines), f.tell() - len(line_b) + len(self.delim.encode("utf-8"))
+
+	def set_frontmatter_source(self, frontmatter: Dict[str, Any], filename: Path, offset: int) -> None:
+		"""set the parsed frontmatter, with the content to be read from `filename` at `offset` when needed"""
+		self.frontmatter = frontmatter
+		self._content = None
+		self.content_source = (Path(filename), offset)
 
 		self.initialized = True
 
@@ -396,378 +924,3739 @@ class PandocMarkdown(object):
 
 
 
-def gen_cmd(
-	plain_path: Path,
-	plain_path_out: Optional[Path],
-	CFG: Config,
-	frontmatter: Dict[str, Any],
-) -> Tuple[List[str], Path]:
-	"""generate the command to run pandoc
-
-	### Returns: `Tuple[List[str],Path]`
-	 - `List[str]`
-	   command to run pandoc
-	 - `Path`
-	   the path to the output file
-	"""
-	# if a different plain path not specified, use the same path as the input
-	if plain_path_out is None:
-		plain_path_out = plain_path
-	# create the output path
-	out_path: Path = Path(CFG["public"]) / Path(f"{plain_path_out}.html")
-
-	# get the pandoc args from *both* the CFG, but override with frontmatter
-	pandoc_args: Dict[str, str] = {
-		**CFG["__pandoc__"],
+# formats pandoc converts from and to
+PANDOC_FROM: str = "markdown+smart"
+PANDOC_TO: str = "html5"
+
+def get_pandoc_base_args(fmt_from: str = PANDOC_FROM, fmt_to: str = PANDOC_TO) -> List[str]:
+	"""get the arguments always passed to pandoc, before any from the config or frontmatter"""
+	return [
+		"--mathjax",
+		"--from", fmt_from,
+		"--to", fmt_to,
+	]
+
+
+PANDOC_BASE_ARGS: List[str] = get_pandoc_base_args()
+
+# pandoc args that act on the document as it is read: reader options, and transforms
+# like citeproc. when filters run in-process (see `run_pandoc`), these only go to the
+# markdown to json conversion, and all other args only to the json to html one
+PANDOC_READER_ARGS: Tuple[str, ...] = (
+	"shift-heading-level-by",
+	"base-header-level",
+	"indented-code-classes",
+	"default-image-extension",
+	"file-scope",
+	"metadata",
+	"metadata-file",
+	"preserve-tabs",
+	"tab-stop",
+	"track-changes",
+	"extract-media",
+	"abbreviations",
+	"strip-comments",
+	"citeproc",
+	"bibliography",
+	"csl",
+	"citation-abbreviations",
+)
+
+# pandoc args that are not about the document, passed to both conversions
+PANDOC_GENERAL_ARGS: Tuple[str, ...] = (
+	"data-dir",
+	"resource-path",
+	"verbose",
+	"quiet",
+	"fail-if-warnings",
+)
+
+
+def get_pandoc_args(CFG: Config, frontmatter: Dict[str, Any]) -> Dict[str, Any]:
+	"""get the pandoc args from *both* the CFG, but override with frontmatter"""
+	pandoc_args: Dict[str, Any] = {
+		**CFG[FrontmatterKeys.pandoc],
 		**(frontmatter.get(FrontmatterKeys.pandoc, dict())),
 	}
 
 	# remove entries that map to 'None'
-	pandoc_args = {k: v for k, v in pandoc_args.items() if v is not None}
+	return {k: v for k, v in pandoc_args.items() if v is not None}
 
-	# construct the base command with inputs, outputs, and paths
-	md_doc_path: Path = Path(CFG["content"]) / Path(f"{plain_path}.md")
 
-	base_cmd: List[str] = [
-		"pandoc",
-		"--mathjax",
-		"--from", "markdown+smart",
-		"--to", "html5",
-		"--output", str(out_path),
-		str(md_doc_path),
-	]
+def add_source_path_args(
+	pandoc_args: Dict[str, Any],
+	source_path: Path,
+	frontmatter: Dict[str, Any],
+) -> Dict[str, Any]:
+	"""add the args pandoc would get from reading `source_path` itself, since it is given the text instead
+
+	this sets the `sourcefile` variable, and if there is no title, the `pagetitle`
+	metadata to the name of the file, which is what pandoc falls back to
+	"""
+	def as_list(value: Union[str, List[str], None]) -> List[str]:
+		if value is None:
+			return list()
+		return [value] if isinstance(value, str) else list(value)
+
+	pandoc_args = dict(pandoc_args)
+	pandoc_args["variable"] = [*as_list(pandoc_args.get("variable")), f"sourcefile={unipath(source_path)}"]
+
+	metadata: List[str] = as_list(pandoc_args.get("metadata"))
+	has_title: bool = (
+		any(k in frontmatter for k in ("title", "pagetitle"))
+		or any(re.split(r"[:=]", str(kv), maxsplit=1)[0] in ("title", "pagetitle") for kv in metadata)
+	)
+	if not has_title:
+		pandoc_args["metadata"] = [*metadata, f"pagetitle={source_path.stem}"]
 
-	# add the pandoc args
+	return pandoc_args
+
+
+def pandoc_args_to_cli(pandoc_args: Dict[str, Any]) -> List[str]:
+	"""convert a dict of pandoc args to command line arguments
+
+	 - `foo: bar` is passed as `--foo bar`
+	 - `foo: true` is passed as `--foo`, and `foo: false` is not passed
+	 - `foo: [a, b]` is passed as `--foo a --foo b`
+	"""
+	cli_args: List[str] = list()
 	for k, v in pandoc_args.items():
 		if isinstance(v, bool):
 			if v:
-				base_cmd.append(f"--{k}")
+				cli_args.append(f"--{k}")
 		elif isinstance(v, str):
-			base_cmd.extend([f"--{k}", v])
+			cli_args.extend([f"--{k}", v])
 		elif isinstance(v, Iterable):
 			for x in v:
-				base_cmd.extend([f"--{k}", x])
+				cli_args.extend([f"--{k}", str(x)])
 		else:
-			base_cmd.extend([f"--{k}", v])
+			cli_args.extend([f"--{k}", str(v)])
 
-	return base_cmd, out_path
+	return cli_args
 
 
-def get_plain_path(fname: Path, CFG: Config) -> Path:
-	"""get the plain path from a filename"""
+# permissions of newly created files. `mkstemp` only gives the owner access
+_UMASK: int = os.umask(0)
+os.umask(_UMASK)
 
-	return Path(str(fname).removesuffix(".md")).relative_to(CFG["content"])
 
+def write_atomic(path: Union[str, Path], text: Union[str, bytes]) -> None:
+	"""write `text` (or bytes) to `path`, so that readers see either the old or the new file, never a partial one"""
+	fd, path_tmp = tempfile.mkstemp(
+		prefix=f".{os.path.basename(path)}.",
+		suffix=".tmp",
+		dir=os.path.dirname(path) or ".",
+	)
+	try:
+		with (
+			os.fdopen(fd, "wb") if isinstance(text, bytes)
+			else os.fdopen(fd, "w", encoding="utf-8")
+		) as f:
+			f.write(text)
+		os.chmod(path_tmp, 0o666 & ~_UMASK)
+		os.replace(path_tmp, path)
+	except BaseException:
+		os.remove(path_tmp)
+		raise
+
+
+def write_if_changed(path: Union[str, Path], text: str) -> bool:
+	"""write `text` to `path` atomically, unless it already has exactly that content. returns whether it was written"""
+	try:
+		with open(path, "r", encoding="utf-8") as f:
+			if f.read() == text:
+				return False
+	except FileNotFoundError:
+		pass
+	write_atomic(path, text)
+	return True
+
+
+class PandocBackend(object):
+	"""runs pandoc on some text with a dict of pandoc args (see `get_pandoc_args`)
+
+	selected by `CFG["pandoc_backend"]`, see `PANDOC_BACKENDS`. `convert` may be
+	called from several threads at once
+	"""
+
+	def convert(
+		self,
+		text: str,
+		fmt_from: str,
+		fmt_to: str,
+		pandoc_args: Dict[str, Any],
+		label: str = "text",
+	) -> str:
+		"""convert `text` from `fmt_from` to `fmt_to`, and return the output
+
+		`label` names the page being converted in error messages
+		"""
+		raise NotImplementedError()
 
-def add_tag_page(path_original: Path, CFG: Config) -> Path:
-	"""add a page which lists all pages with a given tag"""
+	def version(self) -> str:
+		"""get the version of pandoc used, see `get_pandoc_version`"""
+		return get_pandoc_version()
 
-	raise NotImplementedError()
+	def close(self) -> None:
+		"""release any resources, called once at the end of the build"""
+		pass
 
 
-def add_index_page(path_original: Path, CFG: Config) -> Tuple[Path, List[Dict[str, Any]]]:
-	"""process an index page from `path_original` and return the new path
+class SubprocessBackend(PandocBackend):
+	"""starts a new `pandoc` process for every page"""
 
-	new path depends on `CFG['generated_index_suffix']`
+	def __init__(self, CFG: Config) -> None:
+		pass
 
-	TODO: this will only work for things organized by dotlists, not nested folders
-	"""
-	# create the new path
-	path_new: Path = Path(
-		str(path_original).removesuffix(".md") + CFG["generated_index_suffix"]
-	)
+	def convert(
+		self,
+		text: str,
+		fmt_from: str,
+		fmt_to: str,
+		pandoc_args: Dict[str, Any],
+		label: str = "text",
+	) -> str:
+		p_out = subprocess.run(
+			[
+				"pandoc",
+				*get_pandoc_base_args(fmt_from, fmt_to),
+				*pandoc_args_to_cli(pandoc_args),
+			],
+			input=text.encode("utf-8"),
+			stdout=subprocess.PIPE,
+			stderr=subprocess.PIPE,
+		)
+		if p_out.returncode != 0:
+			raise RuntimeError(
+				f"Failed to generate {label} ({fmt_from} to {fmt_to}):\n\n{p_out.stderr.decode('utf-8')}"
+			)
+		return p_out.stdout.decode("utf-8")
 
-	# read the existing document
-	doc: PandocMarkdown = PandocMarkdown.create_from_file(path_original)
 
-	# if we use a template from a file, append that template to the end of the content
-	if "template_file" in doc.frontmatter:
-		with open(doc.frontmatter["template_file"], "r", encoding="utf-8") as f:
-			doc.content += f.read()
+class PandocServerBackend(PandocBackend):
+	"""sends pages to `CFG["pandoc_server_count"]` local `pandoc-server` processes
 
-	# read the frontmatter of all downstream files (recursively)
+	the servers are started once, when the backend is created, which avoids paying
+	for pandoc startup on every page. pandoc-server cannot read files, so include
+	files and templates are read here and sent along with the page. pages using an
+	option pandoc-server does not support (such as `filter`) are converted with
+	`SubprocessBackend` instead
+	"""
 
-	# ignore auto-generated pages, as well as the current page
-	search_glob: str = (
-		f"{path_original.stem}.*" if CFG["dotlist_hierarchy"]
-		else f"{path_original.stem}/**/*.md"
-	)
-	downstream_pages: List[Path] = [
-		p
-		for p in path_original.parent.glob(search_glob)
-		if (
-			(not p.name.endswith(CFG["generated_index_suffix"]))
-			and (p.name != path_original.name) # dont include the current file
-			and (not p.is_dir())
+	# pandoc args which pandoc-server accepts as-is, mapped to the name it expects
+	SERVER_ARGS: Dict[str, str] = {
+		"email-obfuscation": "email-obfuscation",
+		"html-q-tags": "html-q-tags",
+		"toc": "table-of-contents",
+		"table-of-contents": "table-of-contents",
+		"toc-depth": "toc-depth",
+		"number-sections": "number-sections",
+		"number-offset": "number-offset",
+		"section-divs": "section-divs",
+		"shift-heading-level-by": "shift-heading-level-by",
+		"top-level-division": "top-level-division",
+		"identifier-prefix": "identifier-prefix",
+		"title-prefix": "title-prefix",
+		"highlight-style": "highlight-style",
+		"strip-comments": "strip-comments",
+		"standalone": "standalone",
+		"wrap": "wrap",
+		"columns": "columns",
+		"tab-stop": "tab-stop",
+		"ascii": "ascii",
+		"incremental": "incremental",
+		"reference-links": "reference-links",
+		"reference-location": "reference-location",
+		"indented-code-classes": "indented-code-classes",
+		"default-image-extension": "default-image-extension",
+	}
+
+	# include args, mapped to the template variable pandoc puts their contents in
+	INCLUDE_ARGS: Dict[str, str] = {
+		"include-in-header": "header-includes",
+		"include-before-body": "include-before",
+		"include-after-body": "include-after",
+	}
+
+	def __init__(self, CFG: Config) -> None:
+		self.fallback: SubprocessBackend = SubprocessBackend(CFG)
+		self.processes: List[subprocess.Popen] = list()
+		self.urls: List[str] = list()
+		# as reported by the servers
+		self.server_version: str = "unknown"
+		self._next_server: Iterator[int] = itertools.cycle(range(CFG["pandoc_server_count"]))
+		self._lock: threading.Lock = threading.Lock()
+
+		try:
+			for _ in range(CFG["pandoc_server_count"]):
+				self._start_server(CFG)
+		except Exception:
+			self.close()
+			raise
+
+	def _start_server(self, CFG: Config) -> None:
+		# find a free port, by letting the os pick one
+		with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+			sock.bind(("127.0.0.1", 0))
+			port: int = sock.getsockname()[1]
+
+		proc: subprocess.Popen = subprocess.Popen(
+			[
+				*CFG["pandoc_server_cmd"],
+				"--port", str(port),
+				"--timeout", str(CFG["pandoc_server_timeout"]),
+			],
+			stdout=subprocess.DEVNULL,
+			stderr=subprocess.PIPE,
 		)
-	]
+		self.processes.append(proc)
+		url: str = f"http://127.0.0.1:{port}"
+
+		# wait for the server to come up
+		t_start: float = time.monotonic()
+		while True:
+			if proc.poll() is not None:
+				raise RuntimeError(
+					f"pandoc-server exited with code {proc.returncode}:\n\n{proc.stderr.read().decode('utf-8')}"
+				)
+			try:
+				with urllib.request.urlopen(f"{url}/version", timeout=1) as response:
+					self.server_version = response.read().decode("utf-8").strip()
+					break
+			except OSError:
+				if time.monotonic() - t_start > 10:
+					raise RuntimeError(f"pandoc-server at {url} did not start within 10 seconds")
+				time.sleep(0.05)
+
+		self.urls.append(url)
+
+	def server_request(
+		self,
+		text: str,
+		fmt_from: str,
+		fmt_to: str,
+		pandoc_args: Dict[str, Any],
+	) -> Optional[Dict[str, Any]]:
+		"""map the pandoc args onto a pandoc-server request, or `None` if any are unsupported"""
+		request: Dict[str, Any] = {
+			"text": text,
+			"from": fmt_from,
+			"to": fmt_to,
+			"html-math-method": "mathjax",
+		}
+		variables: Dict[str, Any] = dict()
+
+		for k, v in pandoc_args.items():
+			values: List[Any] = v if isinstance(v, list) else [v]
+			if k in self.SERVER_ARGS:
+				request[self.SERVER_ARGS[k]] = v
+			elif k in self.INCLUDE_ARGS:
+				# like `--include-*`, this implies `--standalone`
+				contents: List[str] = list()
+				for inc_path in values:
+					with open(inc_path, "r", encoding="utf-8") as f:
+						contents.append(f.read())
+				variables[self.INCLUDE_ARGS[k]] = contents
+				request["standalone"] = True
+			elif k == "template":
+				with open(v, "r", encoding="utf-8") as f:
+					request["template"] = f.read()
+				request["standalone"] = True
+			elif k in ("variable", "metadata"):
+				# `key:value` or `key=value`, like on the command line
+				target: Dict[str, Any] = variables if k == "variable" else request.setdefault("metadata", dict())
+				for kv in values:
+					# split at whichever separator comes first, the value may contain the other
+					key, *value = re.split(r"[:=]", str(kv), maxsplit=1)
+					target[key] = value[0] if value and value[0] else True
+			else:
+				# not supported by pandoc-server (e.g. filters), use a subprocess instead
+				return None
 
-	print(f"\t   found downstream pages: ", [unipath(x) for x in downstream_pages])
+		if variables:
+			request["variables"] = variables
 
-	# read the frontmatter for each file
-	downstream_frontmatter: List[Dict[str, Any]] = list()
-	for downstream_path in downstream_pages:
-		# read the frontmatter
-		fm_temp: Dict[str, Any] = PandocMarkdown.create_from_file(
-			downstream_path
-		).frontmatter
-		# add the filename relative to the `content` directory
-		fm_temp[FrontmatterKeys.filename] = (
-			get_plain_path(downstream_path, CFG).name + ".html"
+		return request
+
+	def convert(
+		self,
+		text: str,
+		fmt_from: str,
+		fmt_to: str,
+		pandoc_args: Dict[str, Any],
+		label: str = "text",
+	) -> str:
+		request: Optional[Dict[str, Any]] = self.server_request(
+			text, fmt_from, fmt_to, pandoc_args,
 		)
+		if request is None:
+			return self.fallback.convert(text, fmt_from, fmt_to, pandoc_args, label)
 
-		downstream_frontmatter.append(fm_temp)
+		return self._send(request, f"{label} ({fmt_from} to {fmt_to})")
 
-	# figure out how we should sort the downstream pages
-	sort_key: str = doc.frontmatter_get(FrontmatterKeys.index_sort_key)
-	sort_reverse: bool = doc.frontmatter_get(FrontmatterKeys.index_sort_reverse)
+	def version(self) -> str:
+		"""get the version of pandoc-server, and of pandoc for pages it does not support"""
+		return f"pandoc-server {self.server_version}, {self.fallback.version()}"
 
-	# sort the paths according to the frontmatter
-	downstream_frontmatter.sort(
-		key=lambda x: x.get(sort_key, ""),
-		reverse=sort_reverse,
-	)
+	def _send(self, request: Dict[str, Any], description: str) -> str:
+		"""send a request to the next server, and return the output"""
+		with self._lock:
+			url: str = self.urls[next(self._next_server)]
 
-	# plug the frontmatter into the content using chevron
-	new_content: str = (
-		"\n\n<!-- THIS IS AN AUTOMATICALLY GENERATED PAGE, CHANGES WILL BE OVERWRITTEN -->\n\n"
-		+ chevron.render(
-			doc.content,
-			{
-				**CFG["frontmatter_defaults"],
-				**doc.frontmatter,
-				CFG["globals_key"]: CFG,
-				FrontmatterKeys.children: downstream_frontmatter,
-				FrontmatterKeys.filename: path_new,
-			},
-			keep=True,
+		http_request: urllib.request.Request = urllib.request.Request(
+			url,
+			data=json.dumps(request).encode("utf-8"),
+			headers={"Content-Type": "application/json", "Accept": "application/json"},
 		)
-	)
+		try:
+			with urllib.request.urlopen(http_request) as response:
+				result: Dict[str, Any] = json.load(response)
+		except urllib.error.HTTPError as e:
+			raise RuntimeError(
+				f"Failed to generate {description}:\n\n{e.read().decode('utf-8')}"
+			) from e
+
+		if "error" in result:
+			raise RuntimeError(f"Failed to generate {description}:\n\n{result['error']}")
+
+		return result["output"]
+
+	def close(self) -> None:
+		for proc in self.processes:
+			proc.terminate()
+		for proc in self.processes:
+			proc.wait()
+			proc.stderr.close()
+		self.processes = list()
+
+
+# ways of running pandoc, selected by `CFG["pandoc_backend"]`
+PANDOC_BACKENDS: Dict[str, Callable[[Config], PandocBackend]] = {
+	"subprocess": SubprocessBackend,
+	"server": PandocServerBackend,
+}
 
-	# write the new content
-	doc.content = new_content
-	with open(path_new, "w", encoding="utf-8") as f:
-		f.write(doc.dumps())
 
-	# return the path of the written file so we know where to find it
-	return path_new, downstream_frontmatter
+# python filter modules loaded in-process, by `(path, mtime)`, see `load_filter_actions`
+_FILTER_MODULES: Dict[Tuple[str, int], Optional[List[Callable]]] = dict()
+_FILTER_MODULES_LOCK: threading.Lock = threading.Lock()
 
 
-def gen_page(md_path: Path, CFG: Config) -> None:
-	"""generate a single page, putting it in the public directory"""
-	# get the original file
-	if not os.path.isfile(md_path):
-		raise FileNotFoundError(f"{md_path} is not a valid source file")
+def load_filter_actions(filter_path: str) -> Optional[List[Callable]]:
+	"""import the python filter at `filter_path` and get its `FILTER_ACTIONS`
 
-	plain_path: Path = get_plain_path(md_path, CFG)
-	plain_path_out: Path = plain_path
-	is_index_page: bool = False
-	doc: PandocMarkdown = PandocMarkdown.create_from_file(md_path)
-	# add globals to the frontmatter
-	# TODO: this isnt very clear, render it before reading as yaml?
-	doc.frontmatter = yaml.safe_load(chevron.render(
-		yaml.dump(doc.frontmatter),
-		{ CFG["globals_key"]: CFG },
-		keep=True,
-	))
+	`FILTER_ACTIONS` should be a list of `pandocfilters` actions, i.e. the
+	functions passed to `toJSONFilter`/`toJSONFilters`. returns `None` if the filter
+	is not a python file, does not define `FILTER_ACTIONS`, or raises any error when
+	imported here, in which case it has to be run by pandoc as usual
+	"""
+	if pandocfilters is None or not filter_path.endswith(".py") or not os.path.isfile(filter_path):
+		return None
+
+	key: Tuple[str, int] = (os.path.abspath(filter_path), os.stat(filter_path).st_mtime_ns)
+	with _FILTER_MODULES_LOCK:
+		if key not in _FILTER_MODULES:
+			actions: Optional[List[Callable]] = None
+			try:
+				spec = importlib.util.spec_from_file_location(
+					f"_sitegen_filter_{Path(filter_path).stem}", filter_path,
+				)
+				module = importlib.util.module_from_spec(spec)
+				spec.loader.exec_module(module)
+				actions = getattr(module, "FILTER_ACTIONS", None)
+			except Exception as e:
+				LOG.warning(f"# Running filter '{filter_path}' through pandoc, since importing it failed: {e!r}")
+			_FILTER_MODULES[key] = actions
 
-	# make the directory if needed
-	os.makedirs(Path(CFG["public"]) / plain_path_out.parent, exist_ok=True)
+		return _FILTER_MODULES[key]
 
-	# if it is a special index file, generate the index page
-	# NOTE: when we have an index page, we dymanically generate a sub-index page in markdown,
-	#	   but only generate the html using that sub-index page
-	if CFG["make_index_files"]:
-		if (FrontmatterKeys.index in doc.frontmatter) and (
-			doc.frontmatter[FrontmatterKeys.index]
-		):
-			gen_idx_path, downstream_frontmatter = add_index_page(md_path, CFG)
-			plain_path = get_plain_path(gen_idx_path, CFG)
-			is_index_page = True
-
-	# construct and run the command
-	cmd, out_path = gen_cmd(
-		plain_path=plain_path,
-		plain_path_out=plain_path_out,
-		CFG=CFG,
-		frontmatter=doc.frontmatter,
+
+def run_pandoc(
+	source: str,
+	pandoc_args: Dict[str, Any],
+	CFG: Config,
+	backend: PandocBackend,
+	cache: Optional["PandocCache"] = None,
+	label: str = "text",
+) -> str:
+	"""convert markdown `source` to html, running python filters in-process if possible
+
+	if `cache` is given, the html is taken from it if there, and stored in it otherwise
+	(see `PandocCache`). `label` names the page in error messages.
+
+	if `CFG["inprocess_filters"]` is set and every filter defines `FILTER_ACTIONS`
+	(see `load_filter_actions`), the markdown is converted to a pandoc json AST,
+	the filter actions are applied to it here, and the AST is then converted to html.
+	this avoids starting a python interpreter per filter per page. otherwise, the
+	filters are passed to pandoc as executables, as usual
+
+	the args are split between the two conversions (see `PANDOC_READER_ARGS`), so
+	that transforms like `shift-heading-level-by` and `citeproc` are applied once
+	"""
+	if cache is not None:
+		with PROFILER.phase("pandoc cache"):
+			key: str = cache.key(source, pandoc_args, CFG, backend)
+			cached: Optional[str] = cache.get(key)
+		if cached is not None:
+			return cached
+		html: str = run_pandoc(source, pandoc_args, CFG, backend, label=label)
+		cache.put(key, html)
+		return html
+
+	filters: Union[str, List[str]] = pandoc_args.get("filter", [])
+	if isinstance(filters, str):
+		filters = [filters]
+
+	arg_order: List[str] = list(pandoc_args)
+	actions: List[Callable] = list()
+	use_inprocess: bool = (
+		CFG["inprocess_filters"]
+		and bool(filters)
+		# lua filters would need to run in between, keep the order the same
+		and "lua-filter" not in pandoc_args
+		# pandoc runs citeproc and filters in the order given, here it always runs first
+		and not ("citeproc" in pandoc_args and arg_order.index("citeproc") > arg_order.index("filter"))
 	)
+	if use_inprocess:
+		for filter_path in filters:
+			filter_actions: Optional[List[Callable]] = load_filter_actions(filter_path)
+			if filter_actions is None:
+				use_inprocess = False
+				break
+			actions.extend(filter_actions)
+
+	if not use_inprocess:
+		with PROFILER.phase("pandoc"):
+			return backend.convert(source, PANDOC_FROM, PANDOC_TO, pandoc_args, label)
+
+	reader_args: Dict[str, Any] = {
+		k: v for k, v in pandoc_args.items()
+		if k in PANDOC_READER_ARGS or k in PANDOC_GENERAL_ARGS
+	}
+	writer_args: Dict[str, Any] = {
+		k: v for k, v in pandoc_args.items()
+		if k not in PANDOC_READER_ARGS and k != "filter"
+	}
+	with PROFILER.phase("pandoc"):
+		ast_json: str = backend.convert(source, PANDOC_FROM, "json", reader_args, label)
+	# each action walks the whole document in turn, same as running the filters one by one
+	with PROFILER.phase("filters"):
+		ast_json = pandocfilters.applyJSONFilters(actions, ast_json, PANDOC_TO)
+	with PROFILER.phase("pandoc"):
+		return backend.convert(ast_json, "json", PANDOC_TO, writer_args, label)
+
+
+# output of `pandoc --version`, see `get_pandoc_version`
+_PANDOC_VERSION: Optional[str] = None
+
+
+def get_pandoc_version() -> str:
+	"""get the version of `pandoc` on the path, only running it once"""
+	global _PANDOC_VERSION
+	if _PANDOC_VERSION is None:
+		try:
+			p_out = subprocess.run(["pandoc", "--version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+			_PANDOC_VERSION = p_out.stdout.decode("utf-8").split("\n", 1)[0].strip()
+		except OSError:
+			_PANDOC_VERSION = "unknown"
+	return _PANDOC_VERSION
+
+
+class PandocCache(object):
+	"""content-addressed cache of the html generated by pandoc, in `CFG["pandoc_cache_dir"]`
+
+	the key is a hash of the markdown, the pandoc command line arguments, the
+	contents of any files passed to pandoc (includes, filters, templates), the
+	backend and how filters are run, and the pandoc version, so a hit can be used
+	in place of running pandoc even for a page which was never built in this output
+	directory before. if `refresh` is set (on `--rebuild`), entries are only written. entries are
+	files named by their key, and their mtime is updated on every hit, so that
+	`prune` can remove the least recently used ones once the cache is larger
+	than `CFG["pandoc_cache_max_mb"]`.
+
+	NOTE: files read by filters themselves (such as a `csv_table` with a `source`)
+	are not part of the key
+	"""
 
-	site_link = CFG["site_link"]
-	if is_index_page and CFG["make_rss"]:
-		rss_path = out_path.with_suffix(".rss")
-		with open(rss_path, "w") as rss_file:
-			rss_items = [
-				RSS_ITEM_TEMPLATE.format(
-					title=downstream_page["title"],
-					link=f"{site_link}/{downstream_page[FrontmatterKeys.filename]}",
-					description=downstream_page["description"],
-				) for downstream_page in downstream_frontmatter
-			]
-			rss_file.write(
-				RSS_TEMPLATE.format(
-					title=doc.frontmatter["title"],
-					link=site_link,
-					description=doc.frontmatter["description"],
-					items="\n    ".join(rss_items),
-				)
-			)
+	def __init__(self, path: Path, max_bytes: int, refresh: bool = False) -> None:
+		self.path: Path = path
+		self.max_bytes: int = max_bytes
+		self.refresh: bool = refresh
+		# hashes of the files passed to pandoc, only computed once per build
+		self._file_hashes: Dict[str, str] = dict()
+		self._lock: threading.Lock = threading.Lock()
+		self.n_hits: int = 0
+		self.n_misses: int = 0
+		os.makedirs(self.path, exist_ok=True)
 
-	p_out = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-	if p_out.returncode != 0:
-		raise RuntimeError(
-			f"Failed to generate {plain_path}:\n\n{p_out.stderr.decode('utf-8')}"
+	@staticmethod
+	def open(CFG: Config) -> Optional["PandocCache"]:
+		"""open the cache, or `None` if `pandoc_cache_dir` is not set
+
+		when every page is rebuilt (`--rebuild`, or `smart_rebuild: false`), pandoc is run
+		for every page, and the cache is only refreshed
+		"""
+		if not CFG["pandoc_cache_dir"]:
+			return None
+		return PandocCache(
+			Path(CFG["pandoc_cache_dir"]),
+			int(CFG["pandoc_cache_max_mb"] * 1024 * 1024),
+			refresh=not CFG["smart_rebuild"],
 		)
 
-	# rerender the page
-	do_rerender: Union[bool, int] = CFG["mustache_rerender"]
-	if do_rerender:
-		with open(out_path, "r", encoding="utf-8") as f:
-			content: str = f.read()
-		content_new: str = content
-		
-		for _ in range(do_rerender):
-			content_new = chevron.render(
-				content_new,
-				{
-					**CFG["frontmatter_defaults"],
-					**doc.frontmatter, 
-					CFG["globals_key"]: CFG,
-					FrontmatterKeys.filename: out_path.name,
-				},
-				keep=True,
-			)
+	def _hash_arg_file(self, path: str) -> str:
+		if path not in self._file_hashes:
+			self._file_hashes[path] = hash_file(path) if os.path.isfile(path) else "missing"
+		return self._file_hashes[path]
+
+	def key(self, source: str, pandoc_args: Dict[str, Any], CFG: Config, backend: "PandocBackend") -> str:
+		"""get the key under which the html from `source` and `pandoc_args` is stored"""
+		hasher = hashlib.sha256()
+		hasher.update(backend.version().encode("utf-8"))
+		hasher.update(b"\0")
+		hasher.update(json.dumps([CFG["pandoc_backend"], bool(CFG["inprocess_filters"])]).encode("utf-8"))
+		hasher.update(b"\0")
+		hasher.update(json.dumps([*PANDOC_BASE_ARGS, *pandoc_args_to_cli(pandoc_args)]).encode("utf-8"))
+		hasher.update(b"\0")
+		for k in PANDOC_FILE_ARGS:
+			v: Any = pandoc_args.get(k)
+			paths: List[str] = [v] if isinstance(v, str) else list(v) if isinstance(v, Iterable) else []
+			for p in paths:
+				hasher.update(f"{k}={self._hash_arg_file(str(p))}\0".encode("utf-8"))
+		hasher.update(source.encode("utf-8"))
+		return hasher.hexdigest()
+
+	def _entry(self, key: str) -> Path:
+		return self.path / key[:2] / f"{key}.html"
+
+	def get(self, key: str) -> Optional[str]:
+		"""get the stored html, or `None` if there is none, or the cache is being refreshed"""
+		entry: Path = self._entry(key)
+		if self.refresh:
+			with self._lock:
+				self.n_misses += 1
+			return None
+		try:
+			with open(entry, "r", encoding="utf-8", newline="") as f:
+				html: str = f.read()
+			# mark as recently used
+			os.utime(entry)
+		except FileNotFoundError:
+			with self._lock:
+				self.n_misses += 1
+			return None
+		with self._lock:
+			self.n_hits += 1
+		return html
+
+	def put(self, key: str, html: str) -> None:
+		entry: Path = self._entry(key)
+		os.makedirs(entry.parent, exist_ok=True)
+		write_atomic(entry, html)
+
+	def prune(self) -> int:
+		"""remove the least recently used entries until the cache fits in `max_bytes`, returning how many"""
+		entries: List[Tuple[float, int, str]] = list()
+		for dirpath, _, filenames in os.walk(self.path):
+			for fname in filenames:
+				path: str = os.path.join(dirpath, fname)
+				try:
+					st: os.stat_result = os.stat(path)
+				except FileNotFoundError:
+					continue
+				entries.append((st.st_mtime, st.st_size, path))
+
+		total: int = sum(size for _, size, _ in entries)
+		n_removed: int = 0
+		# oldest first
+		heapq.heapify(entries)
+		while total > self.max_bytes and entries:
+			_, size, path = heapq.heappop(entries)
+			try:
+				os.remove(path)
+			except FileNotFoundError:
+				pass
+			total -= size
+			n_removed += 1
+		return n_removed
+
+
+def get_pandoc_backend(CFG: Config) -> PandocBackend:
+	"""create the backend selected by `CFG["pandoc_backend"]`"""
+	if CFG["pandoc_backend"] not in PANDOC_BACKENDS:
+		raise ValueError(
+			f"Config validation: unknown `pandoc_backend` '{CFG['pandoc_backend']}', expected one of {list(PANDOC_BACKENDS)}"
+		)
+	with PROFILER.phase("backend start"):
+		return PANDOC_BACKENDS[CFG["pandoc_backend"]](CFG)
 
-		with open(out_path, "w", encoding="utf-8") as f:
-			f.write(content_new)
 
-	# if an index page, delete the auto-generated index page
-	if is_index_page:
-		os.remove(gen_idx_path)
+def get_plain_path(fname: Path, CFG: Config) -> Path:
+	"""get the plain path from a filename"""
 
+	return Path(str(fname).removesuffix(".md")).relative_to(CFG["content"])
 
-def gen_all_pages(CFG: Config) -> None:
-	# create all required directories first
-	# REVIEW: is this needed?
-	# for content_dir in Path(CFG['content']).glob('*'):
-	# 	if content_dir.is_dir():
-	# 		public_dir : Path = CFG['public'] / content_dir.relative_to(CFG['content'])
-	# 		if not public_dir.exists():
-	# 			public_dir.mkdir(parents=True)
-	# 			print(f"# Created {public_dir}")
 
-	# generate all pages
+def get_out_path(plain_path: Path, CFG: Config) -> Path:
+	"""get the path of the html file generated from a plain path"""
 
-	# get the build time
-	build_time: float = float("-inf")
-	if CFG["smart_rebuild"] and os.path.isfile(CFG["build_time_fname"]):
-		with open(CFG["build_time_fname"], "r", encoding="utf-8") as f:
-			build_time = float(f.read())
+	return Path(CFG["public"]) / Path(f"{plain_path}.html")
 
-	# read all content files
-	content_files: Iterable[Path] = list(Path(CFG["content"]).glob("**/*.md"))
 
-	# ignore dynamically generated ones
-	content_files = [
-		x for x in content_files if not x.name.endswith(CFG["generated_index_suffix"])
-	]
-	n_files: int = len(content_files)
+# compiled mustache templates, keyed by the sha1 of their text, least recently used first
+_TEMPLATE_CACHE: "OrderedDict[str, List[Tuple[str, str]]]" = OrderedDict()
+_TEMPLATE_CACHE_LOCK: threading.Lock = threading.Lock()
+TEMPLATE_CACHE_SIZE: int = 256
 
-	# generate
-	print(
-		f"# Generating {len(content_files)} pages:\n\t{[unipath(x) for x in content_files]}"
-	)
-	print("=" * 50)
-	for idx, md_path in enumerate(content_files):
-		plain_path: str = unipath(get_plain_path(md_path, CFG))
 
-		# skip if the file is older than the build time
-		if CFG["smart_rebuild"] and os.stat(md_path).st_mtime < build_time:
-			print(f"\t({idx+1} / {n_files})  [unmodified]  '{plain_path}'")
-			continue
-		else:
-			print(f"\t({idx+1} / {n_files})  [building..]  '{plain_path}'")
+def compile_template(template: str) -> List[Tuple[str, str]]:
+	"""tokenize a mustache template, reusing the tokens if the same template was seen before"""
+	key: str = hashlib.sha1(template.encode("utf-8")).hexdigest()
+	with _TEMPLATE_CACHE_LOCK:
+		if key in _TEMPLATE_CACHE:
+			_TEMPLATE_CACHE.move_to_end(key)
+			return _TEMPLATE_CACHE[key]
 
-		gen_page(md_path, CFG)
+	tokens: List[Tuple[str, str]] = list(chevron.tokenizer.tokenize(template))
 
-	# write the build date
-	with open(CFG["build_time_fname"], "w", encoding="utf-8") as f:
-		f.write(str(time.time()))
+	with _TEMPLATE_CACHE_LOCK:
+		_TEMPLATE_CACHE[key] = tokens
+		while len(_TEMPLATE_CACHE) > TEMPLATE_CACHE_SIZE:
+			_TEMPLATE_CACHE.popitem(last=False)
 
+	return tokens
 
-def main(argv: List[str]) -> None:
 
-	# check for help
-	if any((x in argv) for x in ["-h", "--help", "--readme", "--README"]):
-		print(__doc__)
-		exit(0)
+def render_template(template: str, context: Mapping[str, Any], cache: bool = True) -> str:
+	"""render a mustache template, same as `chevron.render(template, context, keep=True)`
 
-	# check if we want to print the default config
-	if "--default-cfg" in argv:
-		print(yaml.dump(DEFAULT_CONFIG))
-		exit(0)
+	templates without any tags are returned as-is. if `cache` is set, the tokens are
+	cached by `compile_template`, which should only be used for templates which are
+	rendered again, not for the html of a page
+	"""
+	if "{{" not in template:
+		return template
+	if not cache:
+		return chevron.render(template, context, keep=True)
+	return chevron.render(compile_template(template), context, keep=True)
 
-	# load the config file
-	config_file: str = argv[1]
-	CFG: Config = yaml.full_load(open(config_file, "r", encoding="utf-8"))
 
-	# merge the config with the default config
-	CFG = {
-		**DEFAULT_CONFIG, 
-		**CFG,
-	}
+# context layers shared by all pages, and the config they were built from
+_CONTEXT_LAYERS: Optional[Tuple[Config, Tuple[List[Mapping[str, Any]], List[Mapping[str, Any]]]]] = None
 
-	# update the globals
-	update_extras(CFG)
-	# validate cfg
-	if CFG["make_rss"]:
-		if CFG["site_link"] is None:
-			raise ValueError("Config validation: `site_link` must be set to generate rss")
-		if not CFG["make_index_files"]:
-			raise ValueError("Config validation: `make_index_files` must be set to generate rss")
 
-	# check for force rebuild
-	if "--rebuild" in argv:
-		CFG["smart_rebuild"] = False
+def get_context_layers(CFG: Config) -> Tuple[List[Mapping[str, Any]], List[Mapping[str, Any]]]:
+	"""get the layers of the mustache context shared by every page, in order of priority
 
-	# TODO: checking for unknown args
+	the first list goes above the frontmatter of a page: the whole config under
+	`CFG["globals_key"]`, and the fingerprinted resources as `__assets__` (see
+	`fingerprint_resources`), so a page can not shadow them. the second goes below
+	it, and is `CFG["frontmatter_defaults"]`. they are built once for the current
+	config, not copied for every page
+	"""
+	global _CONTEXT_LAYERS
+	cached: Optional[Tuple[Config, Tuple[List[Mapping[str, Any]], List[Mapping[str, Any]]]]] = _CONTEXT_LAYERS
+	if cached is None or cached[0] is not CFG:
+		cached = (
+			CFG,
+			(
+				[
+					{CFG["globals_key"]: CFG},
+					{FrontmatterKeys.assets: CFG.get(FrontmatterKeys.assets, dict())},
+				],
+				[CFG.get("frontmatter_defaults", dict())],
+			),
+		)
+		_CONTEXT_LAYERS = cached
+	return cached[1]
 
-	print(f"# Using config file '{config_file}', loaded data:")
-	print("-" * 3)
-	print(yaml.dump(CFG, default_flow_style=False, indent=2))
-	print("-" * 3)
 
-	# change the path to the location of the config file, since paths are relative to it
-	# only change the dir if we are not already in the correct dir
-	if os.path.dirname(config_file):
-		os.chdir(os.path.dirname(config_file))
+def mustache_context(CFG: Config, generated: Mapping[str, Any], frontmatter: Mapping[str, Any]) -> ChainMap:
+	"""get the mustache context of a page, without merging its layers into one dict
 
-	# check the `<content>` directory exists
-	if not os.path.isdir(CFG["content"]):
-		raise FileNotFoundError(
-			f"{CFG['content']} is not a valid directory -- should have markdown files in it"
+	in order of priority: the keys generated for the page (such as `__filename__`),
+	the globals (see `get_context_layers`), the frontmatter of the page, and the
+	frontmatter defaults
+	"""
+	above, below = get_context_layers(CFG)
+	return ChainMap(generated, *above, frontmatter, *below)
+
+
+# strings from frontmatter rendered with the globals, and the config they were rendered with, see `render_globals`
+_GLOBALS_RENDERED: Optional[Tuple[Config, Dict[str, str]]] = None
+
+
+def render_globals(value: Any, CFG: Config) -> Any:
+	"""render every string in `value` (a frontmatter tree) as a template, with the globals as context
+
+	only strings containing mustache tags are rendered, and the result for each
+	distinct string is cached, since the same templates tend to recur across pages.
+	`value` is not modified, and is returned as-is (not copied) if it has no tags
+	"""
+	global _GLOBALS_RENDERED
+	cached: Optional[Tuple[Config, Dict[str, str]]] = _GLOBALS_RENDERED
+	if cached is None or cached[0] is not CFG:
+		cached = (CFG, dict())
+		_GLOBALS_RENDERED = cached
+	rendered: Dict[str, str] = cached[1]
+
+	def _render(v: Any) -> Any:
+		if isinstance(v, str):
+			if "{{" not in v:
+				return v
+			if v not in rendered:
+				rendered[v] = render_template(v, get_context_layers(CFG)[0][0])
+			return rendered[v]
+		elif isinstance(v, dict):
+			new_dict: Dict[Any, Any] = {k: _render(x) for k, x in v.items()}
+			return v if all(new_dict[k] is x for k, x in v.items()) else new_dict
+		elif isinstance(v, list):
+			new_list: List[Any] = [_render(x) for x in v]
+			return v if all(a is b for a, b in zip(new_list, v)) else new_list
+		else:
+			return v
+
+	return _render(value)
+
+
+# how `ParseCache` stores the yaml types json does not have
+_JSON_DATE_TAGS: Dict[str, Callable[[str], Any]] = {
+	"__date__": datetime.date.fromisoformat,
+	"__datetime__": datetime.datetime.fromisoformat,
+}
+
+
+def frontmatter_to_json(value: Any) -> Any:
+	"""convert parsed frontmatter to something `json.dumps` stores exactly, with dates tagged
+
+	raises `TypeError` for anything which would not come back the same from
+	`frontmatter_from_json`, such as sets, bytes, or non-string keys
+	"""
+	if value is None or isinstance(value, (bool, int, float, str)):
+		return value
+	if isinstance(value, datetime.datetime):
+		return {"__datetime__": value.isoformat()}
+	if isinstance(value, datetime.date):
+		return {"__date__": value.isoformat()}
+	if isinstance(value, list):
+		return [frontmatter_to_json(x) for x in value]
+	if isinstance(value, dict):
+		if not all(isinstance(k, str) for k in value):
+			raise TypeError("frontmatter has non-string keys")
+		if len(value) == 1 and next(iter(value)) in _JSON_DATE_TAGS:
+			raise TypeError("frontmatter has a mapping which looks like a tagged date")
+		return {k: frontmatter_to_json(v) for k, v in value.items()}
+	raise TypeError(f"cant store {type(value).__name__} in frontmatter as json")
+
+
+def frontmatter_from_json(value: Any) -> Any:
+	"""undo `frontmatter_to_json`"""
+	if isinstance(value, list):
+		return [frontmatter_from_json(x) for x in value]
+	if isinstance(value, dict):
+		if len(value) == 1:
+			tag, text = next(iter(value.items()))
+			if tag in _JSON_DATE_TAGS:
+				return _JSON_DATE_TAGS[tag](text)
+		return {k: frontmatter_from_json(v) for k, v in value.items()}
+	return value
+
+
+class ParseCache(object):
+	"""on-disk cache of parsed frontmatter, so unchanged pages are not parsed again
+
+	stored in a sqlite database at `CFG["parse_cache_fname"]`, with the frontmatter
+	(as json, see `frontmatter_to_json`) and the offset of the content stored by the
+	content hash of the file. frontmatter which json cant hold exactly is not stored.
+	the `(mtime, size)` and hash last seen for each path are also stored, so that a
+	file which has not been touched is not even read. only used from one thread
+	"""
+
+	FORMAT_VERSION: int = 2
+
+	def __init__(self, path: Path) -> None:
+		self.path: Path = path
+		self.db: sqlite3.Connection = sqlite3.connect(str(path))
+		version: int = self.db.execute("PRAGMA user_version").fetchone()[0]
+		if version != self.FORMAT_VERSION:
+			self.db.executescript("""
+				DROP TABLE IF EXISTS files;
+				DROP TABLE IF EXISTS parsed;
+			""")
+			self.db.execute(f"PRAGMA user_version = {self.FORMAT_VERSION}")
+		self.db.executescript("""
+			CREATE TABLE IF NOT EXISTS files (
+				path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, hash TEXT
+			);
+			CREATE TABLE IF NOT EXISTS parsed (
+				hash TEXT PRIMARY KEY, frontmatter TEXT, content_offset INTEGER
+			);
+		""")
+		self.seen: Set[str] = set()
+		self.n_hits: int = 0
+		self.n_misses: int = 0
+
+	@staticmethod
+	def open(CFG: Config) -> Optional["ParseCache"]:
+		"""open the cache, or `None` if `parse_cache_fname` is not set or the cache cant be opened"""
+		if not CFG["parse_cache_fname"]:
+			return None
+		try:
+			return ParseCache(Path(CFG["parse_cache_fname"]))
+		except sqlite3.DatabaseError as e:
+			# not a database, or a broken one. it is only a cache, so start again
+			LOG.warning(f"# Ignoring unreadable parse cache '{CFG['parse_cache_fname']}': {e}")
+			os.remove(CFG["parse_cache_fname"])
+			return ParseCache(Path(CFG["parse_cache_fname"]))
+
+	def load(self, filename: Path) -> PandocMarkdown:
+		"""load a `PandocMarkdown` from `filename`, using the cache if possible"""
+		key: str = unipath(filename)
+		self.seen.add(key)
+		st: os.stat_result = os.stat(filename)
+		doc: PandocMarkdown = PandocMarkdown()
+
+		row: Optional[Tuple[int, int, str]] = self.db.execute(
+			"SELECT mtime_ns, size, hash FROM files WHERE path = ?", (key,),
+		).fetchone()
+		file_hash: str
+		data: Optional[bytes] = None
+		if row is not None and (row[0], row[1]) == (st.st_mtime_ns, st.st_size):
+			file_hash = row[2]
+		else:
+			with open(filename, "rb") as f:
+				data = f.read()
+			file_hash = hashlib.sha256(data).hexdigest()
+			self.db.execute(
+				"INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+				(key, st.st_mtime_ns, st.st_size, file_hash),
+			)
+
+		parsed: Optional[Tuple[str, int]] = self.db.execute(
+			"SELECT frontmatter, content_offset FROM parsed WHERE hash = ?", (file_hash,),
+		).fetchone()
+		if parsed is not None:
+			self.n_hits += 1
+			doc.set_frontmatter_source(frontmatter_from_json(json.loads(parsed[0])), filename, parsed[1])
+			return doc
+
+		self.n_misses += 1
+		if data is None:
+			with open(filename, "rb") as f:
+				data = f.read()
+		frontmatter_text, offset = doc.read_frontmatter(io.BytesIO(data), filename)
+		doc.set_frontmatter_source(doc.loader(frontmatter_text), filename, offset)
+		try:
+			frontmatter_json: str = json.dumps(frontmatter_to_json(doc.frontmatter))
+		except TypeError:
+			# parsed again next time
+			return doc
+		self.db.execute(
+			"INSERT OR REPLACE INTO parsed VALUES (?, ?, ?)",
+			(file_hash, frontmatter_json, offset),
 		)
-	if not os.path.isdir(CFG["resources"]):
-		raise FileNotFoundError(
-			f"{CFG['resources']} is not a valid directory -- should have find resources in it"
+		return doc
+
+	def keep(self, filename: Path) -> None:
+		"""dont forget `filename` on `close`, even though it was not loaded"""
+		self.seen.add(unipath(filename))
+
+	def close(self) -> None:
+		"""forget files not loaded (or kept) since the cache was opened, and save"""
+		self.db.executemany(
+			"DELETE FROM files WHERE path = ?",
+			[
+				(path,) for (path,) in self.db.execute("SELECT path FROM files").fetchall()
+				if path not in self.seen
+			],
 		)
+		self.db.execute("DELETE FROM parsed WHERE hash NOT IN (SELECT hash FROM files)")
+		self.db.commit()
+		self.db.close()
 
-	# create the `<public>` directory, if it doesn't exist
-	if not os.path.isdir(CFG["public"]):
-		os.mkdir(CFG["public"])
 
-	# copy everything from the `<content>/<resources>` directory to the `<public>/<resources>` directory
-	resource_dir_src: Path = Path(CFG["resources"]).relative_to(Path(CFG["content"]))
-	resource_dir_dst: str = str(Path(CFG["public"]) / resource_dir_src)
+class PageInfo(object):
+	"""a content page, as found during discovery at the start of the build
 
-	if not os.path.isdir(resource_dir_dst):
-		os.mkdir(resource_dir_dst)
+	the page table built by `discover_pages` maps each source path to one of these,
+	so that every source file is only read and parsed once per build. the parsed
+	`doc` is shared between threads, so it should be treated as read-only
+	"""
 
-	print(f"# Copying resources from {CFG['resources']} to {resource_dir_dst}")
-	copytree(CFG["resources"], resource_dir_dst, dirs_exist_ok=True)
+	def __init__(self, path: Path, plain_path: Path, doc: PandocMarkdown, mtime: float) -> None:
+		self.path: Path = path
+		self.plain_path: Path = plain_path
+		self.doc: PandocMarkdown = doc
+		self.mtime: float = mtime
 
-	# generate all pages
-	gen_all_pages(CFG)
+	@property
+	def frontmatter(self) -> Dict[str, Any]:
+		return self.doc.frontmatter
+
+	@staticmethod
+	def create_from_file(
+		md_path: Path,
+		CFG: Config,
+		parse_cache: Optional[ParseCache] = None,
+	) -> "PageInfo":
+		with PROFILER.phase("parse", page=unipath(md_path)):
+			return PageInfo(
+				path=md_path,
+				plain_path=get_plain_path(md_path, CFG),
+				doc=(
+					PandocMarkdown.create_from_file(md_path) if parse_cache is None
+					else parse_cache.load(md_path)
+				),
+				mtime=os.stat(md_path).st_mtime,
+			)
+
+
+# maps the path of each source file to its `PageInfo`
+PageTable = Dict[Path, PageInfo]
+
+
+def iter_content_files(CFG: Config) -> Iterator[Path]:
+	"""find the content files, walking the content directory with `os.scandir`
+
+	files are yielded as they are found, so parsing can start before the walk is done.
+	the public and resources directories are not searched, in case they are inside
+	the content directory, and neither are generated index files (`generated_index_suffix`)
+	"""
+	skip_dirs: Set[str] = {
+		os.path.abspath(CFG["public"]),
+		os.path.abspath(CFG["resources"]),
+	}
+	stack: List[str] = [CFG["content"]]
+	while stack:
+		dir_path: str = stack.pop()
+		subdirs: List[str] = list()
+		with os.scandir(dir_path) as it:
+			for entry in it:
+				if entry.is_dir():
+					if os.path.abspath(entry.path) not in skip_dirs:
+						subdirs.append(entry.path)
+				elif (
+					entry.name.endswith(".md")
+					and not entry.name.endswith(CFG["generated_index_suffix"])
+				):
+					yield Path(entry.path)
+		# depth first, in the order found
+		stack.extend(reversed(subdirs))
+
+
+def discover_pages(
+	CFG: Config,
+	previous: Optional[PageTable] = None,
+	parse_cache: Optional[ParseCache] = None,
+) -> PageTable:
+	"""find all content files (see `iter_content_files`) and read and parse each of them once
+
+	pages in `previous` whose file has not been modified since are reused as-is,
+	and the frontmatter of others is taken from `parse_cache` if given and possible
+	"""
+	pages: PageTable = dict()
+	for md_path in iter_content_files(CFG):
+		if (
+			previous is not None
+			and md_path in previous
+			and previous[md_path].mtime == os.stat(md_path).st_mtime
+		):
+			pages[md_path] = previous[md_path]
+			if parse_cache is not None:
+				parse_cache.keep(md_path)
+		else:
+			pages[md_path] = PageInfo.create_from_file(md_path, CFG, parse_cache=parse_cache)
+
+	return pages
+
+
+def get_hierarchy_key(plain_path: Path, CFG: Config) -> Tuple[str, ...]:
+	"""get the place of a page in the hierarchy, as a tuple of names from the top down
+
+	with `dotlist_hierarchy`, `blog/posts.2022.md` is at `("blog/", "posts", "2022")`,
+	so the hierarchy does not extend across directories. otherwise, `blog/posts/2022.md`
+	is at `("blog", "posts", "2022")`, below `blog/posts.md` and `blog.md`
+	"""
+	if CFG["dotlist_hierarchy"]:
+		return (*(f"{x}/" for x in plain_path.parent.parts), *plain_path.name.split("."))
+	else:
+		return plain_path.parts
+
+
+class PageHierarchy(object):
+	"""tree of the pages in a `PageTable`, by their place in the hierarchy
+
+	built once per build (see `get_page_hierarchy`), after which the pages below a
+	page are found in time proportional to their number, instead of by searching
+	the content directory for every index page. nodes of the tree need not have a
+	page: if there is no `blog.2022.md`, then `blog.2022.post.md` is still found
+	below `blog.md`, and counts as one of its direct children
+	"""
+
+	def __init__(self, pages: PageTable, CFG: Config) -> None:
+		self.keys: Dict[Path, Tuple[str, ...]] = dict()
+		# the page at each node of the tree, if any
+		self.node_pages: Dict[Tuple[str, ...], Path] = dict()
+		# the child nodes of each node, with the root at `()`
+		self.node_children: Dict[Tuple[str, ...], List[Tuple[str, ...]]] = {(): list()}
+		# sorted children of index pages, see `get_index_children`
+		self.index_children: Dict[Path, List[Tuple[Path, bool]]] = dict()
+
+		for md_path, page in pages.items():
+			key: Tuple[str, ...] = get_hierarchy_key(page.plain_path, CFG)
+			self.keys[md_path] = key
+			self.node_pages[key] = md_path
+			for k in range(1, len(key) + 1):
+				if key[:k] not in self.node_children:
+					self.node_children[key[:k]] = list()
+					self.node_children[key[:k - 1]].append(key[:k])
+
+	def children(self, md_path: Path) -> List[Path]:
+		"""pages directly below `md_path`, skipping over nodes without a page"""
+		result: List[Path] = list()
+		stack: List[Tuple[str, ...]] = list(reversed(self.node_children[self.keys[md_path]]))
+		while stack:
+			node: Tuple[str, ...] = stack.pop()
+			if node in self.node_pages:
+				result.append(self.node_pages[node])
+			else:
+				stack.extend(reversed(self.node_children[node]))
+		return result
+
+	def descendants(self, md_path: Path) -> List[Path]:
+		"""all pages below `md_path`, recursively"""
+		result: List[Path] = list()
+		stack: List[Tuple[str, ...]] = list(reversed(self.node_children[self.keys[md_path]]))
+		while stack:
+			node: Tuple[str, ...] = stack.pop()
+			if node in self.node_pages:
+				result.append(self.node_pages[node])
+			stack.extend(reversed(self.node_children[node]))
+		return result
+
+
+# the hierarchy of the last page table, see `get_page_hierarchy`
+_HIERARCHY: Optional[Tuple[PageTable, bool, PageHierarchy]] = None
+_HIERARCHY_LOCK: threading.Lock = threading.Lock()
+
+
+def get_page_hierarchy(pages: PageTable, CFG: Config) -> PageHierarchy:
+	"""get the hierarchy of `pages`, which is only built once per page table
+
+	the page table should not be modified after this is first called for it
+	"""
+	global _HIERARCHY
+	with _HIERARCHY_LOCK:
+		if (
+			_HIERARCHY is None
+			or _HIERARCHY[0] is not pages
+			or _HIERARCHY[1] != CFG["dotlist_hierarchy"]
+		):
+			with PROFILER.phase("hierarchy"):
+				_HIERARCHY = (pages, CFG["dotlist_hierarchy"], PageHierarchy(pages, CFG))
+		return _HIERARCHY[2]
+
+
+def get_downstream_pages(
+	path_original: Path,
+	CFG: Config,
+	pages: Optional[PageTable] = None,
+	recursive: bool = True,
+) -> List[Path]:
+	"""get the paths of the pages below the page `path_original` in the hierarchy
+
+	all of them if `recursive`, otherwise only the direct children. looked up in
+	the hierarchy of `pages`, which is built by `discover_pages` if not given
+	"""
+	if pages is None:
+		pages = discover_pages(CFG)
+	hierarchy: PageHierarchy = get_page_hierarchy(pages, CFG)
+	if recursive:
+		return hierarchy.descendants(path_original)
+	else:
+		return hierarchy.children(path_original)
+
+
+def get_index_page_size(frontmatter: Dict[str, Any]) -> Optional[int]:
+	"""get the number of children per page of an index page, or `None` if it is not paginated"""
+	page_size: Any = frontmatter.get(FrontmatterKeys.index_page_size)
+	if not page_size or int(page_size) <= 0:
+		return None
+	return int(page_size)
+
+
+def get_index_slice_plain_path(plain_path: Path, page_number: int) -> Path:
+	"""get the plain path of page `page_number` of the index page at `plain_path`, e.g. `blog.page2`"""
+	if page_number == 1:
+		return plain_path
+	return plain_path.with_name(f"{plain_path.name}.page{page_number}")
+
+
+def get_index_children(
+	path_original: Path,
+	CFG: Config,
+	pages: Optional[PageTable] = None,
+) -> List[Tuple[Path, bool]]:
+	"""get all pages below the index page `path_original`, sorted as set in its frontmatter, and whether each is directly below it
+
+	only computed once per page table, see `PageHierarchy.index_children`
+	"""
+	if pages is None:
+		pages = discover_pages(CFG)
+	hierarchy: PageHierarchy = get_page_hierarchy(pages, CFG)
+	cached: Optional[List[Tuple[Path, bool]]] = hierarchy.index_children.get(path_original)
+	if cached is not None:
+		return cached
+
+	downstream_pages: List[Path] = get_downstream_pages(path_original, CFG, pages=pages)
+	direct_pages: Set[Path] = set(
+		get_downstream_pages(path_original, CFG, pages=pages, recursive=False)
+	)
+
+	# figure out how we should sort the downstream pages
+	doc: PandocMarkdown = pages[path_original].doc
+	sort_key: str = doc.frontmatter_get(FrontmatterKeys.index_sort_key)
+	sort_reverse: bool = doc.frontmatter_get(FrontmatterKeys.index_sort_reverse)
+	out_dir: Path = get_out_path(pages[path_original].plain_path, CFG).parent
+
+	def _sort_value(p: Path) -> Any:
+		if sort_key == FrontmatterKeys.filename:
+			return get_child_filename(p, out_dir, CFG, pages)
+		return pages[p].frontmatter.get(sort_key, "")
+
+	downstream_pages.sort(key=_sort_value, reverse=sort_reverse)
+	children: List[Tuple[Path, bool]] = [(p, p in direct_pages) for p in downstream_pages]
+	hierarchy.index_children[path_original] = children
+	return children
+
+
+def get_index_slices(
+	path_original: Path,
+	CFG: Config,
+	pages: Optional[PageTable] = None,
+) -> List[List[Tuple[Path, bool]]]:
+	"""split the children of an index page (see `get_index_children`) into its pages, by `__index_page_size__`
+
+	there is always at least one page, even if it has no children
+	"""
+	if pages is None:
+		pages = discover_pages(CFG)
+	children: List[Tuple[Path, bool]] = get_index_children(path_original, CFG, pages)
+	page_size: Optional[int] = get_index_page_size(pages[path_original].frontmatter)
+	if page_size is None or not children:
+		return [children]
+	return [
+		children[i:i + page_size]
+		for i in range(0, len(children), page_size)
+	]
+
+
+def get_child_filename(md_path: Path, out_dir: Path, CFG: Config, pages: PageTable) -> str:
+	"""get the path of the output of `md_path`, relative to `out_dir`"""
+	return unipath(Path(os.path.relpath(get_out_path(pages[md_path].plain_path, CFG), out_dir)))
+
+
+def get_child_frontmatter(
+	children: List[Path],
+	out_dir: Path,
+	CFG: Config,
+	pages: PageTable,
+) -> List[Dict[str, Any]]:
+	"""copy the frontmatter of each of `children`, adding its `__filename__` relative to `out_dir`"""
+	return [
+		{
+			**pages[md_path].frontmatter,
+			FrontmatterKeys.filename: get_child_filename(md_path, out_dir, CFG, pages),
+		}
+		for md_path in children
+	]
+
+
+def add_index_page(
+	path_original: Path,
+	CFG: Config,
+	log: Callable[[str], None] = print,
+	pages: Optional[PageTable] = None,
+	page_number: int = 1,
+) -> Tuple[str, List[Dict[str, Any]]]:
+	"""process an index page from `path_original` and return the generated markdown
+
+	the children of the index page are rendered into its content (plus `template_file`,
+	if given), and the result is returned along with the frontmatter of the children,
+	rather than being written to a temporary file. messages are passed to `log`.
+	the frontmatter of the index page and its downstream pages is taken from `pages`,
+	which is built by `discover_pages` if not given.
+
+	all pages below the index page are passed to the template as `__children__`, and
+	only the ones directly below it as `__direct_children__`. each has its `__filename__`
+	set to the path of its output, relative to that of the index page.
+
+	if `__index_page_size__` is set, only the children on page `page_number` (starting
+	from 1) are passed, along with `__page__`, `__page_count__`, `__prev_page__` and
+	`__next_page__` (filenames, or unset on the first and last page), and `__pages__`
+	(a list of every page with its `__page__`, `__filename__`, and `__current__`)
+	"""
+	if pages is None:
+		pages = discover_pages(CFG)
+
+	# get the existing document. it is shared, so copy it instead of modifying it
+	doc: PandocMarkdown = PandocMarkdown()
+	doc.frontmatter = pages[path_original].frontmatter
+	doc.content = pages[path_original].doc.content
+
+	# if we use a template from a file, append that template to the end of the content
+	if "template_file" in doc.frontmatter:
+		with open(doc.frontmatter["template_file"], "r", encoding="utf-8") as f:
+			doc.content += f.read()
+
+	# find the downstream files (recursively) on this page, and which of them are directly below
+	with PROFILER.phase("index children"):
+		slices: List[List[Tuple[Path, bool]]] = get_index_slices(path_original, CFG, pages)
+		if not (1 <= page_number <= len(slices)):
+			raise ValueError(f"index page {path_original} has {len(slices)} pages, not {page_number}")
+		children: List[Tuple[Path, bool]] = slices[page_number - 1]
+
+	log(f"\t   found downstream pages: {[unipath(x) for x, _ in children]}")
+
+	# copy the frontmatter for each file, with the filename relative to the index page
+	plain_path: Path = pages[path_original].plain_path
+	out_dir: Path = get_out_path(plain_path, CFG).parent
+	downstream_frontmatter: List[Dict[str, Any]] = get_child_frontmatter(
+		[p for p, _ in children], out_dir, CFG, pages,
+	)
+	direct_frontmatter: List[Dict[str, Any]] = [
+		fm for fm, (_, is_direct) in zip(downstream_frontmatter, children)
+		if is_direct
+	]
+
+	# names of the pages of this index page
+	slice_filenames: List[str] = [
+		get_out_path(get_index_slice_plain_path(plain_path, i), CFG).name
+		for i in range(1, len(slices) + 1)
+	]
+	pagination: Dict[str, Any] = {
+		FrontmatterKeys.page: page_number,
+		FrontmatterKeys.page_count: len(slices),
+		FrontmatterKeys.pages: [
+			{
+				FrontmatterKeys.page: i,
+				FrontmatterKeys.filename: filename,
+				FrontmatterKeys.current: i == page_number,
+			}
+			for i, filename in enumerate(slice_filenames, start=1)
+		],
+	}
+	if page_number > 1:
+		pagination[FrontmatterKeys.prev_page] = slice_filenames[page_number - 2]
+	if page_number < len(slices):
+		pagination[FrontmatterKeys.next_page] = slice_filenames[page_number]
+
+	# plug the frontmatter into the content using chevron
+	with PROFILER.phase("index render"):
+		doc.content = (
+			"\n\n<!-- THIS IS AN AUTOMATICALLY GENERATED PAGE, CHANGES WILL BE OVERWRITTEN -->\n\n"
+			+ render_template(
+				doc.content,
+				mustache_context(
+					CFG,
+					{
+						FrontmatterKeys.children: downstream_frontmatter,
+						FrontmatterKeys.direct_children: direct_frontmatter,
+						FrontmatterKeys.filename: slice_filenames[page_number - 1],
+						**pagination,
+					},
+					doc.frontmatter,
+				),
+			)
+		)
+
+	return doc.dumps(), downstream_frontmatter
+
+
+def get_index_slice_inputs(
+	md_path: Path,
+	page_number: int,
+	slices: List[List[Tuple[Path, bool]]],
+	CFG: Config,
+	pages: PageTable,
+	manifest: "BuildManifest",
+	config_hash: str,
+) -> Dict[str, str]:
+	"""get the inputs of page `page_number` of a paginated index page, for the build manifest
+
+	like tag pages (see `get_tag_inputs`), rather than the files of its children,
+	this is a hash of the frontmatter and path of each child on the page, so a page
+	is only rebuilt when its slice of the children (or the number of pages) changes.
+	the first page also depends on the frontmatter of all children, for the feeds
+	"""
+	inputs: Dict[str, str] = manifest.hash_inputs(
+		get_page_inputs(md_path, pages[md_path].doc, CFG, pages=pages),
+		config_hash,
+	)
+	# the first page also has the feeds, which are of all the children
+	feed_children: List[Path] = list()
+	if page_number == 1 and CFG["make_rss"]:
+		feed_children = [p for s in slices for p, _ in s]
+	inputs[BuildManifest.INDEX_SLICE_KEY] = hashlib.sha256(
+		json.dumps(
+			[
+				page_number,
+				len(slices),
+				[(unipath(p), is_direct, pages[p].frontmatter) for p, is_direct in slices[page_number - 1]],
+				[(unipath(p), pages[p].frontmatter) for p in feed_children],
+			],
+			sort_keys=True,
+			default=str,
+		).encode("utf-8")
+	).hexdigest()
+	return inputs
+
+
+def parse_feed_date(value: Any) -> Optional[datetime.datetime]:
+	"""get a timezone-aware datetime from a frontmatter date, assuming UTC, or `None` if it is not a date"""
+	dt: datetime.datetime
+	if isinstance(value, datetime.datetime):
+		dt = value
+	elif isinstance(value, datetime.date):
+		dt = datetime.datetime(value.year, value.month, value.day)
+	elif isinstance(value, str):
+		try:
+			dt = datetime.datetime.fromisoformat(value.strip())
+		except ValueError:
+			return None
+	else:
+		return None
+	if dt.tzinfo is None:
+		dt = dt.replace(tzinfo=datetime.timezone.utc)
+	return dt
+
+
+def select_feed_items(
+	children: List[Dict[str, Any]],
+	date_key: str,
+	max_items: Optional[int],
+) -> List[Tuple[Optional[datetime.datetime], Dict[str, Any]]]:
+	"""get the (at most) `max_items` most recent of `children` by `date_key`, newest first, with their dates
+
+	uses a bounded heap, so the children are not all sorted. children without a
+	valid date come last, in their original order
+	"""
+	dated: List[Tuple[Tuple[int, float, int], Optional[datetime.datetime], Dict[str, Any]]] = list()
+	for i, child in enumerate(children):
+		dt: Optional[datetime.datetime] = parse_feed_date(child.get(date_key))
+		dated.append((
+			# newest first, then in order
+			(dt is not None, dt.timestamp() if dt is not None else 0.0, -i),
+			dt,
+			child,
+		))
+
+	selected = (
+		heapq.nlargest(max_items, dated, key=lambda x: x[0]) if max_items is not None
+		else sorted(dated, key=lambda x: x[0], reverse=True)
+	)
+	return [(dt, child) for _, dt, child in selected]
+
+
+def gen_feeds(
+	out_path: Path,
+	plain_path: Path,
+	frontmatter: Dict[str, Any],
+	children: List[Dict[str, Any]],
+	CFG: Config,
+) -> List[Path]:
+	"""write the rss (and optionally atom) feeds of the index page at `out_path`, from the frontmatter of its children
+
+	a feed is only written if its contents changed, and the paths of the feeds
+	written are returned. feeds have no build timestamp, so they only change when
+	their items do
+	"""
+	site_link: str = CFG["site_link"]
+	items: List[Tuple[Optional[datetime.datetime], Dict[str, Any]]] = select_feed_items(
+		children, CFG["feed_date_key"], CFG["feed_max_items"],
+	)
+
+	def _link(child: Dict[str, Any]) -> str:
+		return "/".join([site_link, *plain_path.parent.parts, child[FrontmatterKeys.filename]])
+
+	def _text(x: Any) -> str:
+		return xml_escape(str(x if x is not None else ""), {'"': "&quot;"})
+
+	# used for the `updated` date of the atom feed
+	newest: Optional[datetime.datetime] = max(
+		(dt for dt, _ in items if dt is not None),
+		default=None,
+	)
+
+	feeds: Dict[Path, str] = {
+		out_path.with_suffix(".rss"): RSS_TEMPLATE.format(
+			title=_text(frontmatter.get("title")),
+			link=_text(site_link),
+			description=_text(frontmatter.get("description")),
+			items="\n    ".join(
+				RSS_ITEM_TEMPLATE.format(
+					title=_text(child.get("title")),
+					link=_text(_link(child)),
+					description=_text(child.get("description")),
+					pub_date="" if dt is None else f"\n      <pubDate>{email.utils.format_datetime(dt)}</pubDate>",
+				)
+				for dt, child in items
+			),
+		),
+	}
+	if CFG["make_atom"]:
+		feed_link: str = "/".join([site_link, *plain_path.parent.parts, out_path.name])
+		feeds[out_path.with_suffix(".atom")] = ATOM_TEMPLATE.format(
+			title=_text(frontmatter.get("title")),
+			link=_text(feed_link),
+			subtitle=_text(frontmatter.get("description")),
+			author=_text(frontmatter.get("author", site_link)),
+			updated=(newest or datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)).isoformat(),
+			entries="\n  ".join(
+				ATOM_ENTRY_TEMPLATE.format(
+					title=_text(child.get("title")),
+					link=_text(_link(child)),
+					summary=_text(child.get("description")),
+					updated=(dt or newest or datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)).isoformat(),
+				)
+				for dt, child in items
+			),
+		)
+
+	return [
+		feed_path
+		for feed_path, text in feeds.items()
+		if write_if_changed(feed_path, text)
+	]
+
+
+def gen_page(
+	md_path: Path,
+	CFG: Config,
+	log: Callable[[str], None] = print,
+	pages: Optional[PageTable] = None,
+	backend: Optional[PandocBackend] = None,
+	pandoc_cache: Optional[PandocCache] = None,
+	page_number: int = 1,
+) -> None:
+	"""generate a single page, putting it in the public directory
+
+	messages are passed to `log` instead of being printed directly, so that pages
+	built at the same time do not interleave their output. the page (and, for index
+	pages, its children) is taken from `pages` if given, otherwise read from disk.
+	pandoc is run via `backend`, which defaults to a `SubprocessBackend`, unless
+	the output is found in `pandoc_cache`.
+
+	the markdown is passed to pandoc and the html read back in memory, and the
+	output is written once, atomically, after the mustache rerender.
+
+	for a paginated index page, only page `page_number` is generated (see `add_index_page`),
+	and the feeds are written along with the first page
+	"""
+	# get the original file
+	page: PageInfo
+	if pages is None:
+		if not os.path.isfile(md_path):
+			raise FileNotFoundError(f"{md_path} is not a valid source file")
+		page = PageInfo.create_from_file(md_path, CFG)
+	else:
+		page = pages[md_path]
+	is_index_page: bool = False
+	# add globals to the frontmatter
+	with PROFILER.phase("frontmatter globals"):
+		frontmatter: Dict[str, Any] = render_globals(page.frontmatter, CFG)
+
+	# make the directory if needed
+	slice_plain_path: Path = get_index_slice_plain_path(page.plain_path, page_number)
+	out_path: Path = get_out_path(slice_plain_path, CFG)
+	os.makedirs(out_path.parent, exist_ok=True)
+
+	# if it is a special index file, generate the index page
+	# NOTE: when we have an index page, we dymanically generate a sub-index page in markdown,
+	#	   and generate the html from that instead of the source
+	source: str
+	if (
+		CFG["make_index_files"]
+		and (FrontmatterKeys.index in frontmatter)
+		and frontmatter[FrontmatterKeys.index]
+	):
+		source, downstream_frontmatter = add_index_page(
+			md_path, CFG, log=log, pages=pages, page_number=page_number,
+		)
+		is_index_page = True
+		# the feeds are of all children, not just those on the first page
+		if get_index_page_size(page.frontmatter) is not None and page_number == 1 and CFG["make_rss"]:
+			if pages is None:
+				pages = discover_pages(CFG)
+			downstream_frontmatter = get_child_frontmatter(
+				[p for p, _ in get_index_children(md_path, CFG, pages)],
+				out_path.parent, CFG, pages,
+			)
+	else:
+		with open(md_path, "r", encoding="utf-8") as f:
+			source = f.read()
+
+	if is_index_page and CFG["make_rss"] and page_number == 1:
+		with PROFILER.phase("feeds"):
+			feeds_written: List[Path] = gen_feeds(
+				out_path, page.plain_path, frontmatter, downstream_frontmatter, CFG,
+			)
+		if feeds_written:
+			log(f"\t   updated feeds: {[unipath(x) for x in feeds_written]}")
+
+	render_page(
+		source, frontmatter, out_path, CFG,
+		backend=backend, pandoc_cache=pandoc_cache, label=unipath(slice_plain_path),
+		source_path=md_path,
+	)
+
+
+def render_page(
+	source: str,
+	frontmatter: Dict[str, Any],
+	out_path: Path,
+	CFG: Config,
+	backend: Optional[PandocBackend] = None,
+	pandoc_cache: Optional[PandocCache] = None,
+	label: Optional[str] = None,
+	source_path: Optional[Path] = None,
+) -> None:
+	"""convert the markdown `source` of a page to html with pandoc, rerender it, and write it to `out_path`
+
+	`label` names the page in error messages, and defaults to `out_path`. `source_path`
+	is the file the page was generated from, if any (see `add_source_path_args`)
+	"""
+	# get the args to pass to pandoc
+	pandoc_args: Dict[str, Any] = get_pandoc_args(CFG, frontmatter)
+	if source_path is not None:
+		pandoc_args = add_source_path_args(pandoc_args, source_path, frontmatter)
+
+	# run pandoc
+	if backend is None:
+		backend = SubprocessBackend(CFG)
+	content: str = run_pandoc(
+		source, pandoc_args, CFG, backend,
+		cache=pandoc_cache, label=label if label is not None else unipath(out_path),
+	)
+
+	# rerender the page
+	do_rerender: Union[bool, int] = CFG["mustache_rerender"]
+	if do_rerender:
+		context: ChainMap = mustache_context(
+			CFG,
+			{FrontmatterKeys.filename: out_path.name},
+			frontmatter,
+		)
+
+		with PROFILER.phase("rerender"):
+			for _ in range(do_rerender):
+				content = render_template(content, context, cache=False)
+
+	if CFG["fingerprint_assets"]:
+		with PROFILER.phase("fingerprint"):
+			content = rewrite_asset_links(content, out_path, CFG)
+
+	with PROFILER.phase("write"):
+		write_atomic(out_path, content)
+
+
+def tag_slug(tag: str) -> str:
+	"""get the name of the page for `tag`: lowercase, with whitespace replaced by `-`
+
+	letters and digits in any script are kept. if any other character has to be
+	replaced, a short hash of the tag is appended, so that tags which only differ
+	in punctuation (like `C` and `C++`) do not end up on the same page
+	"""
+	name: str = re.sub(r"\s+", "-", tag.strip().lower())
+	slug: str = re.sub(r"[^\w-]+", "-", name).strip("-")
+	if slug != name or not slug:
+		slug = f"{slug}-{hashlib.sha256(name.encode('utf-8')).hexdigest()[:8]}".lstrip("-")
+	return slug
+
+
+def get_tag_plain_path(tag: str, CFG: Config) -> Path:
+	"""get the plain path (see `get_plain_path`) of the page for `tag`
+
+	this follows the hierarchy, so with `dotlist_hierarchy` it is `tags.<tag>`,
+	next to the other pages, and otherwise `tags/<tag>`
+	"""
+	if CFG["dotlist_hierarchy"]:
+		return Path(f"{CFG['tag_page_dir']}.{tag_slug(tag)}")
+	else:
+		return Path(CFG["tag_page_dir"]) / tag_slug(tag)
+
+
+def build_tag_index(pages: PageTable, CFG: Config) -> Dict[str, List[Path]]:
+	"""map each tag to the pages which have it, in one pass over the frontmatter of all pages
+
+	tags are read from `CFG["tags_key"]` in the frontmatter, as a list or a single
+	string. tags with the same page name (see `tag_slug`), which only differ in case
+	or whitespace, are merged under the first spelling seen
+	"""
+	tag_index: Dict[str, List[Path]] = dict()
+	# slug -> spelling of the tag it is listed under
+	tag_names: Dict[str, str] = dict()
+	for md_path, page in pages.items():
+		tags: Any = page.frontmatter.get(CFG["tags_key"])
+		if tags is None:
+			continue
+		if not isinstance(tags, list):
+			tags = [tags]
+		# each page is listed once per tag page, even if it has several spellings of the tag
+		for name in dict.fromkeys(tag_names.setdefault(tag_slug(str(t)), str(t)) for t in tags):
+			tag_index.setdefault(name, list()).append(md_path)
+
+	return tag_index
+
+
+def add_tag_page(
+	tag: str,
+	members: List[Path],
+	CFG: Config,
+	pages: PageTable,
+) -> Tuple[str, Dict[str, Any], List[Dict[str, Any]]]:
+	"""generate the markdown for the page listing all pages with a given tag
+
+	like an index page, the pages are passed to the template (`tag_template_file`, or
+	`TAG_PAGE_TEMPLATE`) as `__children__`, sorted by the default `__index_sort_key__`.
+	the tag itself is passed as `__tag__`. returns the markdown, along with the
+	frontmatter of the tag page and of its members
+	"""
+	plain_path: Path = get_tag_plain_path(tag, CFG)
+	out_dir: Path = get_out_path(plain_path, CFG).parent
+
+	frontmatter: Dict[str, Any] = {
+		"title": tag,
+		"description": f"pages tagged '{tag}'",
+		FrontmatterKeys.tag: tag,
+	}
+
+	template: str = TAG_PAGE_TEMPLATE
+	if CFG["tag_template_file"]:
+		with open(CFG["tag_template_file"], "r", encoding="utf-8") as f:
+			template = f.read()
+
+	children: List[Dict[str, Any]] = [
+		{
+			**pages[md_path].frontmatter,
+			FrontmatterKeys.filename: unipath(Path(os.path.relpath(
+				get_out_path(pages[md_path].plain_path, CFG),
+				out_dir,
+			))),
+		}
+		for md_path in members
+	]
+	sort_key: str = CFG["default_frontmatter"][FrontmatterKeys.index_sort_key]
+	children.sort(
+		key=lambda x: str(x.get(sort_key, "")),
+		reverse=CFG["default_frontmatter"][FrontmatterKeys.index_sort_reverse],
+	)
+
+	doc: PandocMarkdown = PandocMarkdown()
+	doc.frontmatter = frontmatter
+	doc.content = (
+		"\n\n<!-- THIS IS AN AUTOMATICALLY GENERATED PAGE, CHANGES WILL BE OVERWRITTEN -->\n\n"
+		+ render_template(
+			template,
+			mustache_context(
+				CFG,
+				{
+					FrontmatterKeys.children: children,
+					FrontmatterKeys.filename: get_out_path(plain_path, CFG).name,
+				},
+				frontmatter,
+			),
+		)
+	)
+
+	return doc.dumps(), frontmatter, children
+
+
+def get_tag_inputs(
+	tag: str,
+	members: List[Path],
+	CFG: Config,
+	pages: PageTable,
+	manifest: "BuildManifest",
+	config_hash: str,
+) -> Dict[str, str]:
+	"""get the inputs of the page for `tag`, for the build manifest
+
+	rather than the files of its members, this is a hash of the tag and of the
+	frontmatter and path of each member, so the page is only rebuilt when its
+	membership or member metadata changes, and not when the body of a member does
+	"""
+	inputs: Dict[str, str] = manifest.hash_inputs(
+		[CFG["tag_template_file"]] if CFG["tag_template_file"] else [],
+		config_hash,
+	)
+	inputs[BuildManifest.TAG_MEMBERS_KEY] = hashlib.sha256(
+		json.dumps(
+			[tag, sorted((unipath(p), pages[p].frontmatter) for p in members)],
+			sort_keys=True,
+			default=str,
+		).encode("utf-8")
+	).hexdigest()
+	return inputs
+
+
+def gen_tag_page(
+	tag: str,
+	members: List[Path],
+	CFG: Config,
+	log: Callable[[str], None] = print,
+	pages: Optional[PageTable] = None,
+	backend: Optional[PandocBackend] = None,
+	pandoc_cache: Optional[PandocCache] = None,
+) -> None:
+	"""generate the page for `tag` (see `add_tag_page`) and its feeds, at `get_tag_plain_path`"""
+	if pages is None:
+		pages = discover_pages(CFG)
+
+	plain_path: Path = get_tag_plain_path(tag, CFG)
+	out_path: Path = get_out_path(plain_path, CFG)
+	os.makedirs(out_path.parent, exist_ok=True)
+
+	source, frontmatter, children = add_tag_page(tag, members, CFG, pages)
+	log(f"\t   found tagged pages: {[unipath(x) for x in members]}")
+
+	if CFG["make_rss"]:
+		with PROFILER.phase("feeds"):
+			feeds_written: List[Path] = gen_feeds(out_path, plain_path, frontmatter, children, CFG)
+		if feeds_written:
+			log(f"\t   updated feeds: {[unipath(x) for x in feeds_written]}")
+
+	render_page(
+		source, frontmatter, out_path, CFG,
+		backend=backend, pandoc_cache=pandoc_cache, label=unipath(plain_path),
+	)
+
+
+# config keys which only affect how the build is run, not what it produces
+BUILD_ONLY_CONFIG_KEYS: Set[str] = {
+	"smart_rebuild",
+	"build_manifest_fname",
+	"jobs",
+	"keep_going",
+	"pandoc_backend",
+	"pandoc_server_cmd",
+	"pandoc_server_count",
+	"pandoc_server_timeout",
+	"inprocess_filters",
+	"resources_sync_mode",
+	"resources_sync_check",
+	"resources_sync_delete",
+	"fingerprint_state_fname",
+	"watch_interval",
+	"make_search_index",
+	"search_index_dir",
+	"search_state_fname",
+	"minify_html",
+	"minify_css",
+	"compress_gzip",
+	"compress_brotli",
+	"compress_extensions",
+	"postprocess_state_fname",
+	"parse_cache_fname",
+	"pandoc_cache_dir",
+	"pandoc_cache_max_mb",
+}
+
+
+def hash_file(path: Union[str, Path], chunk_size: int = 1 << 16) -> str:
+	"""get the sha256 hex digest of the contents of a file"""
+	hasher = hashlib.sha256()
+	with open(path, "rb") as f:
+		for chunk in iter(lambda: f.read(chunk_size), b""):
+			hasher.update(chunk)
+	return hasher.hexdigest()
+
+
+def hash_config(CFG: Config) -> str:
+	"""hash the resolved config (including data from `extras_path`), ignoring `BUILD_ONLY_CONFIG_KEYS`"""
+	return hashlib.sha256(
+		json.dumps(
+			{k: v for k, v in CFG.items() if k not in BUILD_ONLY_CONFIG_KEYS},
+			sort_keys=True,
+			default=str,
+		).encode("utf-8")
+	).hexdigest()
+
+
+class BuildManifest(object):
+	"""persistent record of which inputs (and their content hashes) each output was built from
+
+	stored as json at `CFG["build_manifest_fname"]`, mapping each output path to a dict
+	of `{input: sha256}`. the resolved config is stored under the pseudo-input
+	`BuildManifest.CONFIG_KEY`. since inputs are compared by content rather than by
+	modification time, a fresh clone or a `git checkout` does not cause spurious rebuilds
+
+	the number of seconds each output took to build the last time it was built is
+	also kept, so that the slowest pages can be started first (see `PageScheduler`)
+	"""
+
+	FORMAT_VERSION: int = 1
+	CONFIG_KEY: str = "<config>"
+	# pseudo-input of tag pages, see `get_tag_inputs`
+	TAG_MEMBERS_KEY: str = "<tag members>"
+	# pseudo-input of the pages of paginated index pages, see `get_index_slice_inputs`
+	INDEX_SLICE_KEY: str = "<index slice>"
+
+	def __init__(
+		self,
+		path: Path,
+		hash_cache: Optional[Dict[str, Tuple[Tuple[int, int], str]]] = None,
+	) -> None:
+		self.path: Path = path
+		# output path -> {input path -> hash}
+		self.outputs: Dict[str, Dict[str, str]] = dict()
+		# output path -> seconds it took to build
+		self.durations: Dict[str, float] = dict()
+		# hashes of files seen during this build, so each input is only read once
+		self._hashes: Dict[str, Optional[str]] = dict()
+		# hashes of files from earlier builds in this process, with the `(mtime, size)` they were taken at
+		self._hash_cache: Dict[str, Tuple[Tuple[int, int], str]] = (
+			hash_cache if hash_cache is not None else dict()
+		)
+
+	@staticmethod
+	def load(
+		path: Path,
+		hash_cache: Optional[Dict[str, Tuple[Tuple[int, int], str]]] = None,
+	) -> "BuildManifest":
+		"""load the manifest from `path`, or create an empty one if it doesnt exist or is outdated
+
+		`hash_cache` is shared between builds in `--watch` mode, see `BuildCache`
+		"""
+		manifest: BuildManifest = BuildManifest(path, hash_cache)
+		if os.path.isfile(path):
+			with open(path, "r", encoding="utf-8") as f:
+				data: Dict[str, Any] = json.load(f)
+			if data.get("format") == BuildManifest.FORMAT_VERSION:
+				manifest.outputs = data["outputs"]
+				manifest.durations = data.get("durations", dict())
+		return manifest
+
+	def save(self) -> None:
+		"""write the manifest, replacing the old file only once the new one is complete"""
+		write_atomic(
+			self.path,
+			json.dumps(
+				{"format": self.FORMAT_VERSION, "outputs": self.outputs, "durations": self.durations},
+				indent="\t",
+				sort_keys=True,
+			),
+		)
+
+	def hash_input(self, path: Union[str, Path]) -> Optional[str]:
+		"""get the content hash of an input file, or `None` if it does not exist"""
+		key: str = unipath(Path(path))
+		if key not in self._hashes:
+			if not os.path.isfile(path):
+				self._hashes[key] = None
+			else:
+				st: os.stat_result = os.stat(path)
+				stat_key: Tuple[int, int] = (st.st_mtime_ns, st.st_size)
+				cached: Optional[Tuple[Tuple[int, int], str]] = self._hash_cache.get(key)
+				if cached is None or cached[0] != stat_key:
+					cached = (stat_key, hash_file(path))
+					self._hash_cache[key] = cached
+				self._hashes[key] = cached[1]
+		return self._hashes[key]
+
+	def hash_inputs(self, inputs: Iterable[Union[str, Path]], config_hash: str) -> Dict[str, str]:
+		"""get `{input: hash}` for all inputs that exist, plus the config hash"""
+		hashes: Dict[str, str] = {self.CONFIG_KEY: config_hash}
+		for p in inputs:
+			h: Optional[str] = self.hash_input(p)
+			if h is not None:
+				hashes[unipath(Path(p))] = h
+		return hashes
+
+	def needs_rebuild(self, output: Path, inputs: Dict[str, str]) -> Optional[str]:
+		"""get the reason `output` needs to be rebuilt from `inputs`, or `None` if it is up to date"""
+		key: str = unipath(output)
+		if key not in self.outputs:
+			return "not in manifest"
+		if not os.path.isfile(output):
+			return "output missing"
+
+		recorded: Dict[str, str] = self.outputs[key]
+		for inp, h in inputs.items():
+			if inp not in recorded:
+				return f"new input '{inp}'"
+			if recorded[inp] != h:
+				return f"changed input '{inp}'"
+		for inp in recorded:
+			if inp not in inputs:
+				return f"removed input '{inp}'"
+
+		return None
+
+	def record(self, output: Path, inputs: Dict[str, str], duration: Optional[float] = None) -> None:
+		"""record that `output` was built from `inputs`, taking `duration` seconds"""
+		self.outputs[unipath(output)] = inputs
+		if duration is not None:
+			self.durations[unipath(output)] = duration
+
+	def get_input_hash(self, output: Path, inp: Path) -> Optional[str]:
+		"""get the hash `inp` had when `output` was last built from it, or `None` if not recorded"""
+		return self.outputs.get(unipath(output), dict()).get(unipath(inp))
+
+	def get_duration(self, output: Path) -> Optional[float]:
+		"""get how many seconds `output` took to build the last time, or `None` if unknown"""
+		return self.durations.get(unipath(output))
+
+	def forget(self, output: Path) -> None:
+		"""remove `output` from the manifest, so it is rebuilt next time"""
+		self.outputs.pop(unipath(output), None)
+
+	def prune(self, outputs: Iterable[Path]) -> List[str]:
+		"""drop all outputs not in `outputs`, i.e. those which are no longer generated
+
+		### Returns: `List[str]`
+		 the outputs dropped
+		"""
+		keep: Set[str] = {unipath(x) for x in outputs}
+		dropped: List[str] = [k for k in self.outputs if k not in keep]
+		self.outputs = {k: v for k, v in self.outputs.items() if k in keep}
+		self.durations = {k: v for k, v in self.durations.items() if k in keep}
+		return dropped
+
+
+def get_page_inputs(
+	md_path: Path,
+	doc: PandocMarkdown,
+	CFG: Config,
+	pages: Optional[PageTable] = None,
+) -> List[Path]:
+	"""get all files that the output of `md_path` depends on, other than the config
+
+	this is the source itself, any files passed to pandoc (includes, filters, templates),
+	the `template_file` of an index page, and the sources of all pages below an index page
+	(unless it is paginated)
+	"""
+	inputs: List[Path] = [md_path]
+
+	# files passed to pandoc. `include-*` and friends are paths relative to the config
+	pandoc_args: Dict[str, Any] = get_pandoc_args(CFG, doc.frontmatter)
+	for k in PANDOC_FILE_ARGS:
+		v: Any = pandoc_args.get(k)
+		if isinstance(v, str):
+			inputs.append(Path(v))
+		elif isinstance(v, Iterable):
+			inputs.extend(Path(x) for x in v)
+
+	if CFG["make_index_files"] and doc.frontmatter.get(FrontmatterKeys.index):
+		if "template_file" in doc.frontmatter:
+			inputs.append(Path(doc.frontmatter["template_file"]))
+		# paginated index pages depend on the frontmatter of their children instead, see `get_index_slice_inputs`
+		if get_index_page_size(doc.frontmatter) is None:
+			inputs.extend(get_downstream_pages(md_path, CFG, pages=pages))
+
+	return inputs
+
+
+class BuildCache(object):
+	"""state kept in memory from one build to the next, in `--watch` mode
+
+	 - `pages`: the page table, so that only modified pages are parsed again
+	 - `hashes`: content hashes of inputs, only recomputed when their mtime or size changes
+	 - `backend`: the pandoc backend, so pandoc-server processes keep running
+	 - `inputs`: all files which the outputs depended on in the last build
+
+	compiled templates are kept in `_TEMPLATE_CACHE` regardless
+	"""
+
+	def __init__(self) -> None:
+		self.pages: PageTable = dict()
+		self.hashes: Dict[str, Tuple[Tuple[int, int], str]] = dict()
+		self.backend: Optional[PandocBackend] = None
+		self.inputs: Set[str] = set()
+
+	def close(self) -> None:
+		"""stop the backend, it is started again by the next build"""
+		if self.backend is not None:
+			self.backend.close()
+			self.backend = None
+
+
+def get_n_jobs(CFG: Config) -> int:
+	"""get the number of pages to build at the same time, with `0` meaning one per cpu"""
+	n_jobs: int = int(CFG["jobs"])
+	if n_jobs < 0:
+		raise ValueError(f"Config validation: `jobs` must be non-negative, got {n_jobs}")
+	if n_jobs == 0:
+		n_jobs = os.cpu_count() or 1
+	return n_jobs
+
+
+class PageScheduler(object):
+	"""picks which page to start next: the longest (by `estimates`) of those whose dependencies are done
+
+	starting the longest pages first keeps all the workers busy until close to the end,
+	rather than one long page starting last while the others sit idle. a page is only
+	ready once the pages it depends on which are also being built have finished, which is
+	used to build index and tag pages after the pages they list
+	"""
+
+	def __init__(
+		self,
+		paths: List[Path],
+		estimates: Dict[Path, float],
+		dependencies: Optional[Dict[Path, List[Path]]] = None,
+	) -> None:
+		self.estimates: Dict[Path, float] = estimates
+		# position in `paths`, to break ties
+		self._order: Dict[Path, int] = {p: i for i, p in enumerate(paths)}
+		# number of unfinished dependencies of each page which is not yet ready
+		self._n_waiting: Dict[Path, int] = dict()
+		self._dependents: Dict[Path, List[Path]] = dict()
+		self._ready: List[Tuple[float, int, Path]] = list()
+
+		for p in paths:
+			deps: Set[Path] = {
+				d for d in (dependencies or dict()).get(p, [])
+				if d in self._order and d != p
+			}
+			for d in deps:
+				self._dependents.setdefault(d, list()).append(p)
+			if deps:
+				self._n_waiting[p] = len(deps)
+			else:
+				self._push(p)
+
+	def _push(self, path: Path) -> None:
+		heapq.heappush(self._ready, (-self.estimates.get(path, 0.0), self._order[path], path))
+
+	def has_ready(self) -> bool:
+		return bool(self._ready)
+
+	def has_pending(self) -> bool:
+		"""whether any page has not been started yet"""
+		return bool(self._ready) or bool(self._n_waiting)
+
+	def pop(self) -> Path:
+		"""get the next page to start, raising `RuntimeError` if no page is ready"""
+		if not self._ready:
+			raise RuntimeError(
+				f"No page is ready, {len(self._n_waiting)} are waiting on each other: "
+				+ str([unipath(p) for p in self._n_waiting])
+			)
+		return heapq.heappop(self._ready)[2]
+
+	def done(self, path: Path) -> None:
+		"""mark `path` as finished, making the pages which only waited on it ready"""
+		for p in self._dependents.pop(path, []):
+			self._n_waiting[p] -= 1
+			if self._n_waiting[p] == 0:
+				del self._n_waiting[p]
+				self._push(p)
+
+
+def simulate_schedule(
+	paths: List[Path],
+	estimates: Dict[Path, float],
+	dependencies: Optional[Dict[Path, List[Path]]],
+	n_jobs: int,
+) -> Tuple[float, List[Path]]:
+	"""estimate the wall-clock time to build `paths` on `n_jobs` workers, as `build_pages` would
+
+	### Returns: `Tuple[float, List[Path]]`
+	 the estimated number of seconds, and the order the pages would be started in
+	"""
+	scheduler: PageScheduler = PageScheduler(paths, estimates, dependencies)
+	t_now: float = 0.0
+	started: List[Path] = list()
+	# `(finish time, start number, path)` of each running page
+	running: List[Tuple[float, int, Path]] = list()
+	while scheduler.has_pending() or running:
+		while len(running) < n_jobs and (scheduler.has_ready() or not running):
+			path: Path = scheduler.pop()
+			heapq.heappush(running, (t_now + estimates.get(path, 0.0), len(started), path))
+			started.append(path)
+		t_now, _, path_done = heapq.heappop(running)
+		scheduler.done(path_done)
+	return t_now, started
+
+
+def build_pages(
+	queue: List[Tuple[int, Path]],
+	CFG: Config,
+	pages: PageTable,
+	backend: PandocBackend,
+	on_built: Optional[Callable[[Path, float], None]] = None,
+	pandoc_cache: Optional[PandocCache] = None,
+	virtual_pages: Optional[Dict[Path, Tuple[Callable[..., None], Dict[str, Any]]]] = None,
+	estimates: Optional[Dict[Path, float]] = None,
+	dependencies: Optional[Dict[Path, List[Path]]] = None,
+) -> List[Tuple[Path, Exception]]:
+	"""build the pages in `queue` using a pool of `CFG["jobs"]` worker threads
+
+	pandoc does the heavy lifting in a subprocess, so threads are enough to keep
+	all the cores busy. pages are started in the order given by `PageScheduler`:
+	longest first by `estimates`, and only once their `dependencies` are built.
+	the output of each page is buffered, and passed to `LOG` in the order the pages
+	were started once that page is done, so output is never interleaved.
+
+	if `CFG["keep_going"]` is false, pending pages are cancelled and the error is
+	raised as soon as a page fails (pages already running are allowed to finish).
+
+	### Parameters:
+	 - `queue : List[Tuple[int, Path]]`
+	   list of `(index, path)` pairs, where the index is the order the page was found in,
+	   and is only passed to `LOG.page`
+	 - `CFG : Config`
+	 - `pages : PageTable`
+	   the page table from `discover_pages`
+	 - `backend : PandocBackend`
+	   used to run pandoc, shared by all the worker threads
+	 - `on_built : Optional[Callable[[Path, float], None]]`
+	   called with the path of each page which was built successfully and the seconds it took,
+	   in the order the pages were started
+	   (defaults to `None`)
+	 - `pandoc_cache : Optional[PandocCache]`
+	   cache of pandoc output, shared by all the worker threads
+	   (defaults to `None`)
+	 - `virtual_pages : Optional[Dict[Path, Tuple[Callable[..., None], Dict[str, Any]]]]`
+	   pages which are not a content file, like tag pages or the later pages of a paginated
+	   index page, by plain path. paths in `queue` which are keys of this are generated by
+	   calling the function with the keyword arguments, plus those `gen_page` takes
+	   (defaults to `None`)
+	 - `estimates : Optional[Dict[Path, float]]`
+	   expected seconds to build each page, pages without one are started last
+	   (defaults to `None`, building in the order of `queue`)
+	 - `dependencies : Optional[Dict[Path, List[Path]]]`
+	   pages which must be built before each page, if they are in `queue`
+	   (defaults to `None`)
+
+	### Returns: `List[Tuple[Path, Exception]]`
+	 list of pages which failed to build along with the error, only nonempty when `keep_going` is set
+	"""
+	failures: List[Tuple[Path, Exception]] = list()
+
+	if virtual_pages is None:
+		virtual_pages = dict()
+
+	def _label(md_path: Path) -> str:
+		return unipath(md_path if md_path in virtual_pages else pages[md_path].plain_path)
+
+	def _build(md_path: Path) -> Tuple[List[str], float]:
+		messages: List[str] = list()
+		t_start: float = time.perf_counter()
+		with PROFILER.phase("page", page=_label(md_path)):
+			if md_path in virtual_pages:
+				gen_fn, kwargs = virtual_pages[md_path]
+				gen_fn(
+					CFG=CFG,
+					log=messages.append, pages=pages, backend=backend, pandoc_cache=pandoc_cache,
+					**kwargs,
+				)
+			else:
+				gen_page(
+					md_path, CFG,
+					log=messages.append, pages=pages, backend=backend, pandoc_cache=pandoc_cache,
+				)
+		return messages, time.perf_counter() - t_start
+
+	if estimates is None:
+		# all equal, so the order of `queue` is kept
+		estimates = dict()
+	indices: Dict[Path, int] = {md_path: idx for idx, md_path in queue}
+	scheduler: PageScheduler = PageScheduler(
+		[md_path for _, md_path in queue], estimates, dependencies,
+	)
+
+	n_jobs: int = get_n_jobs(CFG)
+	pool: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=n_jobs)
+	# pages in the order they were started, and how many of them were reported
+	started: List[Path] = list()
+	n_reported: int = 0
+	futures: Dict[Path, Future] = dict()
+	running: Dict[Future, Path] = dict()
+	try:
+		while scheduler.has_pending() or running:
+			# only as many pages are submitted as there are workers, so that
+			# each next page is picked once the pages it waits on are done
+			while len(running) < n_jobs and (scheduler.has_ready() or not running):
+				md_path: Path = scheduler.pop()
+				future: Future = pool.submit(_build, md_path)
+				futures[md_path] = future
+				running[future] = md_path
+				started.append(md_path)
+
+			done, _ = wait(running, return_when=FIRST_COMPLETED)
+			for future in done:
+				scheduler.done(running.pop(future))
+
+			# report the pages which are done, in the order they were started
+			while n_reported < len(started) and futures[started[n_reported]].done():
+				md_path = started[n_reported]
+				n_reported += 1
+				idx: int = indices[md_path]
+				plain_path: str = _label(md_path)
+				try:
+					messages, duration = futures.pop(md_path).result()
+				except Exception as e:
+					LOG.page(idx, "FAILED", plain_path)
+					LOG.event("page_error", page=plain_path, error=repr(e))
+					if not CFG["keep_going"]:
+						raise
+					failures.append((md_path, e))
+				else:
+					LOG.page(idx, "built", plain_path, messages)
+					if on_built is not None:
+						on_built(md_path, duration)
+	finally:
+		# on failure, dont start any more pages but wait for the running ones
+		pool.shutdown(wait=True, cancel_futures=True)
+
+	return failures
+
+
+def print_build_plan(
+	queue: List[Tuple[int, Path]],
+	n_files: int,
+	reasons: Dict[Path, str],
+	estimates: Dict[Path, float],
+	unknown: Set[Path],
+	dependencies: Dict[Path, List[Path]],
+	CFG: Config,
+	pages: PageTable,
+) -> None:
+	"""print the pages in `queue` in the order they would be started, why each is rebuilt, and the estimated time
+
+	the time is estimated by `simulate_schedule` with the durations of the last build,
+	pages in `unknown` were never built and are marked with `~`
+	"""
+	n_jobs: int = get_n_jobs(CFG)
+	seconds: float
+	order: List[Path]
+	seconds, order = simulate_schedule(
+		[md_path for _, md_path in queue], estimates, dependencies, n_jobs,
+	)
+	seconds_total: float = sum(estimates.values())
+
+	print(f"# Plan: {len(queue)} of {n_files} pages would be built, with {n_jobs} jobs")
+	for md_path in order:
+		label: str = unipath(pages[md_path].plain_path if md_path in pages else md_path)
+		mark: str = "~" if md_path in unknown else " "
+		print(f"\t{mark}{estimates[md_path]:8.2f}s  '{label}'  ({reasons[md_path]})")
+	print(
+		f"# Estimated time: {seconds:.2f}s, for {seconds_total:.2f}s of pages"
+		+ (f" ({len(unknown)} never built, assumed average)" if unknown else "")
+	)
+	LOG.event(
+		"plan", n_files=n_files, n_queued=len(queue), seconds=seconds, seconds_total=seconds_total,
+		n_unknown=len(unknown),
+	)
+
+
+def remove_stale_outputs(outputs: List[str], CFG: Config) -> List[str]:
+	"""remove outputs which are no longer generated, such as the pages of removed tags,
+	along with their feeds (see `gen_feeds`)
+
+	only files in the public directory are removed, so outputs recorded before
+	`public` was changed are left alone
+
+	### Returns: `List[str]`
+	 the files removed
+	"""
+	public_dir: str = os.path.abspath(CFG["public"])
+	removed: List[str] = list()
+	for output in outputs:
+		out_path: Path = Path(output)
+		if os.path.commonpath([public_dir, os.path.abspath(out_path)]) != public_dir:
+			continue
+		for path in (out_path, out_path.with_suffix(".rss"), out_path.with_suffix(".atom")):
+			if path.is_file():
+				path.unlink()
+				removed.append(unipath(path))
+	return removed
+
+
+def gen_all_pages(CFG: Config, cache: Optional[BuildCache] = None, plan: bool = False) -> PageTable:
+	"""generate all pages which need to be rebuilt, returning the page table
+
+	if `cache` is given, parsed pages, input hashes, and the pandoc backend are
+	taken from and kept in it for the next build. if `plan` is set, the pages which
+	would be rebuilt are only printed by `print_build_plan`, and nothing is written
+	"""
+	# create all required directories first
+	# REVIEW: is this needed?
+	# for content_dir in Path(CFG['content']).glob('*'):
+	# 	if content_dir.is_dir():
+	# 		public_dir : Path = CFG['public'] / content_dir.relative_to(CFG['content'])
+	# 		if not public_dir.exists():
+	# 			public_dir.mkdir(parents=True)
+	# 			print(f"# Created {public_dir}")
+
+	# generate all pages
+
+	# load the manifest of what each page was last built from
+	manifest: BuildManifest = BuildManifest.load(
+		Path(CFG["build_manifest_fname"]),
+		hash_cache=cache.hashes if cache is not None else None,
+	)
+	config_hash: str = hash_config(CFG)
+
+	# read and parse all content files, once
+	with PROFILER.phase("discover"):
+		parse_cache: Optional[ParseCache] = ParseCache.open(CFG)
+		try:
+			pages: PageTable = discover_pages(
+				CFG,
+				previous=cache.pages if cache is not None else None,
+				parse_cache=parse_cache,
+			)
+		finally:
+			if parse_cache is not None:
+				parse_cache.close()
+	if parse_cache is not None:
+		LOG.info(f"# Parse cache: {parse_cache.n_hits} hits, {parse_cache.n_misses} misses")
+		LOG.event("parse_cache", hits=parse_cache.n_hits, misses=parse_cache.n_misses)
+	if cache is not None:
+		cache.pages = pages
+	content_files: List[Path] = list(pages.keys())
+
+	# tag pages, by plain path
+	tag_pages: Dict[Path, Tuple[str, List[Path]]] = dict()
+	if CFG["make_tag_pages"]:
+		with PROFILER.phase("tag index"):
+			tag_pages = {
+				get_tag_plain_path(tag, CFG): (tag, members)
+				for tag, members in build_tag_index(pages, CFG).items()
+			}
+
+	# pages after the first of paginated index pages, by plain path
+	index_slices: Dict[Path, Tuple[Path, int]] = dict()
+	# pages of each paginated index page
+	paginated: Dict[Path, List[List[Tuple[Path, bool]]]] = dict()
+	if CFG["make_index_files"]:
+		for md_path, page in pages.items():
+			if page.frontmatter.get(FrontmatterKeys.index) and get_index_page_size(page.frontmatter) is not None:
+				paginated[md_path] = get_index_slices(md_path, CFG, pages)
+				for page_number in range(2, len(paginated[md_path]) + 1):
+					index_slices[get_index_slice_plain_path(page.plain_path, page_number)] = (md_path, page_number)
+
+	n_files: int = len(content_files) + len(index_slices) + len(tag_pages)
+
+	# generate
+	LOG.info(f"# Generating {len(content_files)} pages")
+	LOG.verbose(f"\t{[unipath(x) for x in content_files]}")
+	if index_slices:
+		LOG.info(f"# and {len(index_slices)} more pages of index pages")
+		LOG.verbose(f"\t{[unipath(x) for x in index_slices]}")
+	if tag_pages:
+		LOG.info(f"# and {len(tag_pages)} tag pages")
+		LOG.verbose(f"\t{[tag for tag, _ in tag_pages.values()]}")
+	LOG.info("=" * 50)
+	if not plan:
+		LOG.start_pages(n_files)
+	queue: List[Tuple[int, Path]] = list()
+	# output path and the hashes of its inputs, for each page
+	page_inputs: Dict[Path, Tuple[Path, Dict[str, str]]] = dict()
+	# why each page in the queue is rebuilt
+	reasons: Dict[Path, str] = dict()
+
+	def _check(idx: int, key: Path, label: Path, out_path: Path, inputs: Dict[str, str]) -> None:
+		"""queue the page `key` unless none of its inputs changed since the output was built"""
+		page_inputs[key] = (out_path, inputs)
+		reason: Optional[str] = (
+			manifest.needs_rebuild(out_path, inputs) if CFG["smart_rebuild"] else "forced rebuild"
+		)
+		if reason is None:
+			if not plan:
+				LOG.page(idx, "unmodified", unipath(label))
+			return
+		# forget the old entry, so the page is rebuilt next time if it fails now
+		manifest.forget(out_path)
+		reasons[key] = reason
+		queue.append((idx, key))
+
+	for idx, md_path in enumerate(content_files):
+		out_path: Path = get_out_path(pages[md_path].plain_path, CFG)
+		with PROFILER.phase("hash inputs"):
+			inputs: Dict[str, str]
+			if md_path in paginated:
+				inputs = get_index_slice_inputs(
+					md_path, 1, paginated[md_path], CFG, pages, manifest, config_hash,
+				)
+			else:
+				inputs = manifest.hash_inputs(
+					get_page_inputs(md_path, pages[md_path].doc, CFG, pages=pages),
+					config_hash,
+				)
+		_check(idx, md_path, pages[md_path].plain_path, out_path, inputs)
+
+	for idx, (slice_plain_path, (md_path, page_number)) in enumerate(index_slices.items(), start=len(content_files)):
+		out_path = get_out_path(slice_plain_path, CFG)
+		with PROFILER.phase("hash inputs"):
+			inputs = get_index_slice_inputs(
+				md_path, page_number, paginated[md_path], CFG, pages, manifest, config_hash,
+			)
+		_check(idx, slice_plain_path, slice_plain_path, out_path, inputs)
+
+	for idx, (tag_plain_path, (tag, members)) in enumerate(
+		tag_pages.items(), start=len(content_files) + len(index_slices),
+	):
+		out_path = get_out_path(tag_plain_path, CFG)
+		with PROFILER.phase("hash inputs"):
+			inputs = get_tag_inputs(tag, members, CFG, pages, manifest, config_hash)
+		_check(idx, tag_plain_path, tag_plain_path, out_path, inputs)
+
+	# drop pages which are no longer generated (removed sources, tags, or pages of index pages), and their outputs
+	stale_outputs: List[str] = manifest.prune(out_path for out_path, _ in page_inputs.values())
+	if stale_outputs and not plan:
+		removed_outputs: List[str] = remove_stale_outputs(stale_outputs, CFG)
+		if removed_outputs:
+			LOG.info(f"# Removed {len(removed_outputs)} outputs which are no longer generated")
+			LOG.verbose(f"\t{removed_outputs}")
+
+	# index and tag pages are built after the pages they list
+	dependencies: Dict[Path, List[Path]] = dict()
+	if CFG["make_index_files"]:
+		for md_path, page in pages.items():
+			if page.frontmatter.get(FrontmatterKeys.index):
+				dependencies[md_path] = [p for p, _ in get_index_children(md_path, CFG, pages)]
+	for slice_plain_path, (md_path, page_number) in index_slices.items():
+		dependencies[slice_plain_path] = [p for p, _ in paginated[md_path][page_number - 1]]
+	for tag_plain_path, (_, members) in tag_pages.items():
+		dependencies[tag_plain_path] = members
+
+	# pages are started longest first, by how long they took on the last build.
+	# pages never built before are assumed to take as long as the average page
+	durations: Dict[Path, Optional[float]] = {
+		key: manifest.get_duration(page_inputs[key][0])
+		for _, key in queue
+	}
+	known: List[float] = list(manifest.durations.values())
+	default_duration: float = sum(known) / len(known) if known else 1.0
+	estimates: Dict[Path, float] = {
+		key: (d if d is not None else default_duration)
+		for key, d in durations.items()
+	}
+
+	if plan:
+		print_build_plan(
+			queue, n_files, reasons, estimates,
+			unknown={key for key, d in durations.items() if d is None},
+			dependencies=dependencies,
+			CFG=CFG,
+			pages=pages,
+		)
+		return pages
+
+	# how to generate the pages which are not content files
+	virtual_pages: Dict[Path, Tuple[Callable[..., None], Dict[str, Any]]] = {
+		**{
+			slice_plain_path: (gen_page, dict(md_path=md_path, page_number=page_number))
+			for slice_plain_path, (md_path, page_number) in index_slices.items()
+		},
+		**{
+			tag_plain_path: (gen_tag_page, dict(tag=tag, members=members))
+			for tag_plain_path, (tag, members) in tag_pages.items()
+		},
+	}
+
+	backend: PandocBackend
+	if cache is None:
+		backend = get_pandoc_backend(CFG)
+	else:
+		if cache.backend is None:
+			cache.backend = get_pandoc_backend(CFG)
+		backend = cache.backend
+
+	pandoc_cache: Optional[PandocCache] = PandocCache.open(CFG)
+	try:
+		with PROFILER.phase("pages"):
+			failures: List[Tuple[Path, Exception]] = build_pages(
+				queue, CFG, pages, backend,
+				on_built=lambda md_path, duration: manifest.record(*page_inputs[md_path], duration),
+				pandoc_cache=pandoc_cache,
+				virtual_pages=virtual_pages,
+				estimates=estimates,
+				dependencies=dependencies,
+			)
+	finally:
+		LOG.end_pages()
+		if pandoc_cache is not None:
+			n_evicted: int = pandoc_cache.prune()
+			LOG.info(
+				f"# Pandoc cache: {pandoc_cache.n_hits} hits, {pandoc_cache.n_misses} misses, {n_evicted} evicted"
+			)
+			LOG.event(
+				"pandoc_cache", hits=pandoc_cache.n_hits, misses=pandoc_cache.n_misses, evicted=n_evicted,
+			)
+		if cache is None:
+			backend.close()
+		else:
+			# pseudo-inputs like the config are in `<>`, and are not files
+			cache.inputs = {
+				inp
+				for _, inputs in page_inputs.values()
+				for inp in inputs
+				if not inp.startswith("<")
+			}
+		# save even if a page failed, so that the pages which did build are not rebuilt
+		manifest.save()
+
+	if failures:
+		raise RuntimeError(
+			f"Failed to generate {len(failures)} pages:\n"
+			+ "\n".join(f"\t'{unipath(md_path)}': {e}" for md_path, e in failures)
+		)
+
+	return pages
+
+
+# ioctl to make a copy-on-write clone of a file on linux (btrfs, xfs, ...), from `linux/fs.h`
+FICLONE: int = 0x40049409
+
+
+def _reflink(src: str, dst: str) -> None:
+	"""clone `src` to `dst` without copying the data, raising `OSError` if not supported"""
+	import fcntl
+
+	with open(src, "rb") as f_src, open(dst, "wb") as f_dst:
+		fcntl.ioctl(f_dst.fileno(), FICLONE, f_src.fileno())
+	shutil.copystat(src, dst)
+
+
+def _sync_file(src: str, dst: str, mode: str) -> None:
+	"""put a copy (or link, or clone) of `src` at `dst`, replacing it atomically"""
+	os.makedirs(os.path.dirname(dst), exist_ok=True)
+	dst_tmp: str = os.path.join(os.path.dirname(dst), f".{os.path.basename(dst)}.sync_tmp")
+	if os.path.lexists(dst_tmp):
+		os.remove(dst_tmp)
+
+	try:
+		if mode == "hardlink":
+			os.link(src, dst_tmp)
+		elif mode == "reflink":
+			_reflink(src, dst_tmp)
+		else:
+			shutil.copy2(src, dst_tmp)
+	except (OSError, ImportError):
+		# not supported on this platform or filesystem, or across devices: just copy
+		if os.path.lexists(dst_tmp):
+			os.remove(dst_tmp)
+		shutil.copy2(src, dst_tmp)
+
+	os.replace(dst_tmp, dst)
+
+
+# number of characters of a term which decide its shard in the search index
+SEARCH_PREFIX_LENGTH: int = 2
+
+# weight of each occurrence of a term in each part of a page, for the search index
+SEARCH_FIELD_WEIGHTS: Dict[str, int] = {
+	"title": 5,
+	"tags": 3,
+	"description": 2,
+	"body": 1,
+}
+
+# mustache tags, html tags, and link targets, which are not searched for
+_SEARCH_STRIP_RE: re.Pattern = re.compile(r"\{\{.*?\}\}|<[^>]*>|\]\([^)]*\)", re.DOTALL)
+_SEARCH_TOKEN_RE: re.Pattern = re.compile(r"\w+")
+
+
+def get_search_shard_name(term: str) -> str:
+	"""name of the shard of the search index with `term`: its first `SEARCH_PREFIX_LENGTH`
+	characters, or `_` and their utf-8 bytes in hex if they are not all ascii letters and digits
+	"""
+	prefix: str = term[:SEARCH_PREFIX_LENGTH]
+	if re.fullmatch(r"[a-z0-9]+", prefix):
+		return prefix
+	return "_" + prefix.encode("utf-8").hex()
+
+
+def tokenize_search_text(text: str) -> List[str]:
+	"""split `text` into lowercase words of 2 to 32 characters, ignoring markup"""
+	return [
+		token
+		for token in _SEARCH_TOKEN_RE.findall(_SEARCH_STRIP_RE.sub(" ", text).lower())
+		if 2 <= len(token) <= 32
+	]
+
+
+def get_search_fields(page: PageInfo, CFG: Config) -> Dict[str, str]:
+	"""get the text of each part of `page` which is searched, see `SEARCH_FIELD_WEIGHTS`"""
+	tags: Any = page.frontmatter.get(CFG["tags_key"]) or []
+	if not isinstance(tags, list):
+		tags = [tags]
+	return {
+		"title": str(page.frontmatter.get("title") or ""),
+		"tags": " ".join(str(t) for t in tags),
+		"description": str(page.frontmatter.get("description") or ""),
+		"body": page.doc.content,
+	}
+
+
+def get_search_terms(fields: Dict[str, str]) -> Dict[str, int]:
+	"""get the weight of each term in a page, from its `fields`"""
+	terms: Dict[str, int] = dict()
+	for field, text in fields.items():
+		weight: int = SEARCH_FIELD_WEIGHTS[field]
+		for token in tokenize_search_text(text):
+			terms[token] = terms.get(token, 0) + weight
+	return terms
+
+
+def get_source_hashes(pages: PageTable, CFG: Config) -> Dict[Path, Optional[str]]:
+	"""get the content hash of the source of each page, as recorded in the build manifest
+	when its output was last built, or `None` if not recorded
+	"""
+	manifest: BuildManifest = BuildManifest.load(Path(CFG["build_manifest_fname"]))
+	return {
+		md_path: manifest.get_input_hash(get_out_path(page.plain_path, CFG), md_path)
+		for md_path, page in pages.items()
+	}
+
+
+class SearchIndex(object):
+	"""inverted index of the content pages, written as json shards to `CFG["search_index_dir"]` in the public directory
+
+	the index is split by the first `SEARCH_PREFIX_LENGTH` characters of each term
+	(see `get_search_shard_name`), so a search only needs to fetch `docs.json` and the
+	shard of each of its terms. `docs.json` has the `prefix_length` and the `docs`,
+	a list of `[url, title, description]` (or `null`, for unused ids) where the url is
+	relative to the public directory. each shard maps terms to a flat list of
+	`doc id, weight, doc id, weight, ...`, by doc id.
+
+	each page is only tokenized if it changed since the last build (as recorded, with its
+	id and a hash of its postings in each shard, at `CFG["search_state_fname"]`), and only
+	the shards in which the postings of a page changed are rewritten. pages whose source
+	has the same hash as when they were last indexed are not even read
+	"""
+
+	FORMAT_VERSION: int = 1
+
+	def __init__(self, CFG: Config) -> None:
+		self.state_path: Path = Path(CFG["search_state_fname"])
+		self.index_dir: Path = Path(CFG["public"]) / CFG["search_index_dir"]
+		self.tags_key: str = CFG["tags_key"]
+		# `{"id": int, "hash": str, "source": str, "shards": {shard: hash of its postings}}` of each page, by url
+		self.docs: Dict[str, Dict[str, Any]] = dict()
+
+	def _settings(self) -> Dict[str, Any]:
+		return {
+			"format": self.FORMAT_VERSION,
+			"prefix_length": SEARCH_PREFIX_LENGTH,
+			"weights": SEARCH_FIELD_WEIGHTS,
+			"tags_key": self.tags_key,
+		}
+
+	@staticmethod
+	def load(CFG: Config) -> "SearchIndex":
+		"""load the state of the index, or start from scratch if it is outdated or the index is missing"""
+		index: SearchIndex = SearchIndex(CFG)
+		if os.path.isfile(index.state_path) and os.path.isfile(index.index_dir / "docs.json"):
+			with open(index.state_path, "r", encoding="utf-8") as f:
+				data: Dict[str, Any] = json.load(f)
+			if data.get("settings") == index._settings():
+				index.docs = data["docs"]
+		if not index.docs and os.path.isdir(index.index_dir):
+			# the old shards can't be updated, remove them
+			shutil.rmtree(index.index_dir)
+		return index
+
+	def save(self) -> None:
+		write_atomic(
+			self.state_path,
+			json.dumps({"settings": self._settings(), "docs": self.docs}, sort_keys=True),
+		)
+
+	def update(
+		self,
+		pages: PageTable,
+		CFG: Config,
+		source_hashes: Optional[Dict[Path, Optional[str]]] = None,
+	) -> Tuple[int, int]:
+		"""update the index to match `pages`
+
+		`source_hashes` are the content hashes of the page sources, if known (see
+		`get_source_hashes`). a page whose source hash is the same as when it was last
+		indexed is skipped, without reading its content
+
+		### Returns: `Tuple[int, int]`
+		 number of pages which changed (including removed ones), and of shards written
+		"""
+		# hash each page whose source changed, and tokenize those whose fields changed
+		changed: Dict[str, Tuple[str, Dict[str, str], Dict[str, int]]] = dict()
+		urls: Set[str] = set()
+		sources: Dict[str, Optional[str]] = dict()
+		for md_path, page in pages.items():
+			url: str = unipath(Path(f"{page.plain_path}.html"))
+			urls.add(url)
+			sources[url] = source_hashes.get(md_path) if source_hashes is not None else None
+			if sources[url] is not None and url in self.docs and self.docs[url].get("source") == sources[url]:
+				continue
+			fields: Dict[str, str] = get_search_fields(page, CFG)
+			page_hash: str = hashlib.sha256(
+				json.dumps(fields, sort_keys=True).encode("utf-8")
+			).hexdigest()
+			if url not in self.docs or self.docs[url]["hash"] != page_hash:
+				changed[url] = (page_hash, fields, get_search_terms(fields))
+			else:
+				self.docs[url]["source"] = sources[url]
+		removed: List[str] = [url for url in self.docs if url not in urls]
+		if not changed and not removed:
+			return 0, 0
+
+		# postings of these ids are removed from the touched shards, and those of changed pages added again
+		stale_ids: Set[int] = set()
+		touched: Set[str] = set()
+		for url in removed:
+			stale_ids.add(self.docs[url]["id"])
+			touched.update(self.docs[url]["shards"])
+		for url in changed:
+			if url in self.docs:
+				stale_ids.add(self.docs[url]["id"])
+
+		# load the list of pages
+		docs_path: Path = self.index_dir / "docs.json"
+		doc_list: List[Optional[List[str]]] = list()
+		if os.path.isfile(docs_path):
+			with open(docs_path, "r", encoding="utf-8") as f:
+				doc_list = json.load(f)["docs"]
+		for url in removed:
+			doc_list[self.docs.pop(url)["id"]] = None
+
+		# give ids to the new pages, reusing those of removed pages, and group postings by shard
+		free_ids: List[int] = [i for i, doc in enumerate(doc_list) if doc is None]
+		free_ids.reverse()
+		postings: Dict[str, Dict[str, List[int]]] = dict()
+		for url, (page_hash, fields, terms) in changed.items():
+			doc_id: int
+			if url in self.docs:
+				doc_id = self.docs[url]["id"]
+			elif free_ids:
+				doc_id = free_ids.pop()
+			else:
+				doc_id = len(doc_list)
+				doc_list.append(None)
+			doc_list[doc_id] = [url, fields["title"], fields["description"]]
+
+			doc_postings: Dict[str, Dict[str, int]] = dict()
+			for term, weight in terms.items():
+				shard: str = get_search_shard_name(term)
+				doc_postings.setdefault(shard, dict())[term] = weight
+				postings.setdefault(shard, dict()).setdefault(term, list()).extend((doc_id, weight))
+			shard_hashes: Dict[str, str] = {
+				shard: hashlib.sha256(
+					json.dumps(x, sort_keys=True).encode("utf-8")
+				).hexdigest()[:16]
+				for shard, x in doc_postings.items()
+			}
+
+			# only the shards where the postings of this page changed
+			old_hashes: Dict[str, str] = self.docs[url]["shards"] if url in self.docs else dict()
+			touched.update(
+				shard for shard in shard_hashes.keys() | old_hashes.keys()
+				if shard_hashes.get(shard) != old_hashes.get(shard)
+			)
+			self.docs[url] = {"id": doc_id, "hash": page_hash, "source": sources[url], "shards": shard_hashes}
+
+		# rewrite the touched shards
+		os.makedirs(self.index_dir, exist_ok=True)
+		for shard in touched:
+			shard_path: Path = self.index_dir / f"{shard}.json"
+			index: Dict[str, List[int]] = dict()
+			if os.path.isfile(shard_path):
+				with open(shard_path, "r", encoding="utf-8") as f:
+					index = json.load(f)
+			for term in list(index.keys()):
+				flat: List[int] = index[term]
+				kept: List[int] = list()
+				for i in range(0, len(flat), 2):
+					if flat[i] not in stale_ids:
+						kept.extend(flat[i:i + 2])
+				index[term] = kept
+			for term, flat in postings.get(shard, dict()).items():
+				index.setdefault(term, list()).extend(flat)
+
+			index = {term: flat for term, flat in index.items() if flat}
+			if index:
+				for term, flat in index.items():
+					# keep the postings in order of doc id
+					pairs: List[Tuple[int, int]] = sorted(zip(flat[::2], flat[1::2]))
+					index[term] = [x for pair in pairs for x in pair]
+				write_atomic(shard_path, json.dumps(index, sort_keys=True, separators=(",", ":")))
+			elif os.path.isfile(shard_path):
+				os.remove(shard_path)
+
+		write_if_changed(
+			docs_path,
+			json.dumps(
+				{"prefix_length": SEARCH_PREFIX_LENGTH, "docs": doc_list},
+				separators=(",", ":"),
+			),
+		)
+
+		return len(changed) + len(removed), len(touched)
+
+
+# siblings written next to public files by `postprocess_public`, with a compressed copy of them
+POSTPROCESS_SUFFIXES: Tuple[str, ...] = (".gz", ".br")
+
+# in html, matches (in order): elements whose whitespace matters, comments (other than
+# conditional comments), tags, and runs of whitespace in text. see `minify_html`
+_HTML_MINIFY_RE: re.Pattern = re.compile(
+	r"(<(pre|code|textarea|script|style)\b.*?</\2\s*>)|(<!--(?!\[if).*?-->)|(<[^>]*>)|(\s+)",
+	re.DOTALL | re.IGNORECASE,
+)
+
+# in css, matches (in order): strings, comments (other than `/*! ... */`), punctuation
+# with the whitespace around it, and runs of whitespace. see `minify_css`
+_CSS_MINIFY_RE: re.Pattern = re.compile(
+	r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|(/\*(?!!).*?\*/)|\s*([{};,>])\s*|(\s+)""",
+	re.DOTALL,
+)
+
+
+def minify_html(text: str) -> str:
+	"""remove comments, and collapse each run of whitespace in text to a single space
+	(or newline, if it had one). tags, and the contents of `pre`, `code` (which pandoc
+	styles with `white-space: pre-wrap`), `textarea`, `script`, and `style` elements,
+	are left as they are
+	"""
+
+	def _sub(m: re.Match) -> str:
+		if m.group(3) is not None:
+			return ""
+		if m.group(5) is not None:
+			return "\n" if "\n" in m.group(5) else " "
+		return m.group(0)
+
+	return _HTML_MINIFY_RE.sub(_sub, text)
+
+
+def minify_css(text: str) -> str:
+	"""remove comments, whitespace around `{};,>`, and collapse other whitespace outside of strings"""
+
+	def _sub(m: re.Match) -> str:
+		if m.group(1) is not None:
+			return m.group(1)
+		if m.group(2) is not None:
+			return ""
+		if m.group(3) is not None:
+			return m.group(3)
+		return " "
+
+	return _CSS_MINIFY_RE.sub(_sub, text).strip()
+
+
+# minifier for each file extension, and the config key enabling it
+MINIFIERS: Dict[str, Tuple[str, Callable[[str], str]]] = {
+	".html": ("minify_html", minify_html),
+	".css": ("minify_css", minify_css),
+}
+
+
+def get_postprocess_settings(CFG: Config) -> Dict[str, Any]:
+	"""the config keys affecting `postprocess_public`, or an empty dict if it is disabled"""
+	settings: Dict[str, Any] = {
+		key: CFG[key]
+		for key in ("minify_html", "minify_css", "compress_gzip", "compress_brotli")
+	}
+	if not any(settings.values()):
+		return dict()
+	settings["compress_brotli"] = CFG["compress_brotli"] and brotli is not None
+	settings["compress_extensions"] = sorted(x.lower() for x in CFG["compress_extensions"])
+	return settings
+
+
+class PostprocessState(object):
+	"""record of the files processed by `postprocess_public`, stored as json at `CFG["postprocess_state_fname"]`
+
+	maps each file to the hash of its contents before and after it was minified, and
+	the compressed siblings written for it. a file whose contents still have the
+	second hash (and whose siblings all exist) is skipped. everything is processed
+	again when the settings (see `get_postprocess_settings`) change
+	"""
+
+	FORMAT_VERSION: int = 1
+
+	def __init__(self, path: Path, settings: Dict[str, Any]) -> None:
+		self.path: Path = path
+		self.settings: Dict[str, Any] = settings
+		# `[hash before, hash after, [suffixes]]` of each file
+		self.files: Dict[str, List[Any]] = dict()
+		# entries from a build with different settings, only used to remove their siblings
+		self.stale: Dict[str, List[Any]] = dict()
+
+	@staticmethod
+	def load(CFG: Config) -> Optional["PostprocessState"]:
+		"""load the state, or `None` if post-processing is disabled"""
+		settings: Dict[str, Any] = get_postprocess_settings(CFG)
+		if not settings:
+			return None
+		state: PostprocessState = PostprocessState(Path(CFG["postprocess_state_fname"]), settings)
+		if os.path.isfile(state.path):
+			with open(state.path, "r", encoding="utf-8") as f:
+				data: Dict[str, Any] = json.load(f)
+			if data.get("format") == PostprocessState.FORMAT_VERSION:
+				if data["settings"] == settings:
+					state.files = data["files"]
+				else:
+					state.stale = data["files"]
+		return state
+
+	def save(self) -> None:
+		write_atomic(
+			self.path,
+			json.dumps(
+				{"format": self.FORMAT_VERSION, "settings": self.settings, "files": self.files},
+				indent="\t",
+				sort_keys=True,
+			),
+		)
+
+	def is_unchanged(self, path: str) -> bool:
+		"""check if `path` and its siblings are still as written by the last post-processing"""
+		entry: Optional[List[Any]] = self.files.get(unipath(Path(path)))
+		return (
+			entry is not None
+			and all(os.path.isfile(path + suffix) for suffix in entry[2])
+			and hash_file(path) == entry[1]
+		)
+
+	def is_minified_copy(self, src: str, dst: str) -> bool:
+		"""check if `dst` is `src`, minified, so that syncing the resources does not undo the minification"""
+		entry: Optional[List[Any]] = self.files.get(unipath(Path(dst)))
+		return (
+			entry is not None
+			and entry[0] != entry[1]
+			and os.path.isfile(dst)
+			and hash_file(src) == entry[0]
+			and hash_file(dst) == entry[1]
+		)
+
+
+def postprocess_file(path: str, settings: Dict[str, Any], previous: Optional[List[Any]]) -> List[Any]:
+	"""minify `path` in place if enabled for its type, and write its compressed siblings
+
+	gzip files are written with no timestamp, so their contents only depend on the file.
+	siblings are only kept if smaller than the file, and those from `previous` which
+	are not written now are removed
+
+	### Returns: `List[Any]`
+	 the entry for `PostprocessState.files`
+	"""
+	with open(path, "rb") as f:
+		data: bytes = f.read()
+	hash_in: str = hashlib.sha256(data).hexdigest()
+
+	ext: str = os.path.splitext(path)[1].lower()
+	if ext in MINIFIERS and settings[MINIFIERS[ext][0]]:
+		try:
+			minified: bytes = MINIFIERS[ext][1](data.decode("utf-8")).encode("utf-8")
+		except UnicodeDecodeError:
+			minified = data
+		if minified != data:
+			data = minified
+			write_atomic(path, data)
+
+	suffixes: List[str] = list()
+	if ext in settings["compress_extensions"]:
+		if settings["compress_gzip"]:
+			suffixes.append(".gz")
+		if settings["compress_brotli"]:
+			suffixes.append(".br")
+
+	written: List[str] = list()
+	for suffix in suffixes:
+		compressed: bytes
+		if suffix == ".gz":
+			compressed = gzip.compress(data, compresslevel=9, mtime=0)
+		else:
+			compressed = brotli.compress(data, quality=11)
+		if len(compressed) < len(data):
+			write_atomic(path + suffix, compressed)
+			written.append(suffix)
+
+	for suffix in (previous[2] if previous is not None else []):
+		if suffix not in written and os.path.isfile(path + suffix):
+			os.remove(path + suffix)
+
+	return [hash_in, hashlib.sha256(data).hexdigest(), written]
+
+
+def postprocess_public(CFG: Config, state: PostprocessState) -> Tuple[int, int, int]:
+	"""minify and compress the files in the public directory, in parallel, see `postprocess_file`
+
+	files not changed since the last build (see `PostprocessState.is_unchanged`) are
+	skipped, and the siblings of files which no longer exist are removed
+
+	### Returns: `Tuple[int, int, int]`
+	 number of files processed, unchanged, and removed
+	"""
+	settings: Dict[str, Any] = state.settings
+	extensions: Set[str] = set(settings["compress_extensions"]) | {
+		ext for ext, (key, _) in MINIFIERS.items() if settings[key]
+	}
+
+	paths: List[str] = list()
+	for dirpath, _, filenames in os.walk(CFG["public"]):
+		for fname in filenames:
+			# temporary files from `write_atomic` start with a `.`
+			if not fname.startswith(".") and os.path.splitext(fname)[1].lower() in extensions:
+				paths.append(os.path.join(dirpath, fname))
+
+	previous: Dict[str, List[Any]] = {**state.stale, **state.files}
+
+	def _process(path: str) -> Optional[List[Any]]:
+		if state.is_unchanged(path):
+			return None
+		return postprocess_file(path, settings, previous.get(unipath(Path(path))))
+
+	with ThreadPoolExecutor(max_workers=get_n_jobs(CFG)) as pool:
+		entries: List[Optional[List[Any]]] = list(pool.map(_process, paths))
+
+	files: Dict[str, List[Any]] = dict()
+	n_processed: int = 0
+	for path, entry in zip(paths, entries):
+		key: str = unipath(Path(path))
+		if entry is None:
+			files[key] = state.files[key]
+		else:
+			files[key] = entry
+			n_processed += 1
+
+	# remove the siblings of files which are gone
+	n_removed: int = 0
+	for key, entry in previous.items():
+		if key not in files:
+			for suffix in entry[2]:
+				if os.path.isfile(key + suffix):
+					os.remove(key + suffix)
+					n_removed += 1
+
+	state.files = files
+	state.stale = dict()
+	return n_processed, len(paths) - n_processed, n_removed
+
+
+# number of hex digits of the content hash in the names of fingerprinted resources
+FINGERPRINT_LENGTH: int = 12
+
+# fingerprinted path of each resource, relative to the public directory, see `fingerprint_resources`
+_ASSET_PATHS: Dict[str, str] = dict()
+
+# `href` and `src` attributes in html
+_ASSET_LINK_RE: re.Pattern = re.compile(r"""\b(href|src)(\s*=\s*)(["'])(.*?)\3""", re.IGNORECASE | re.DOTALL)
+
+
+class FingerprintState(object):
+	"""record of the copies written by `fingerprint_resources`, stored as json at `CFG["fingerprint_state_fname"]`
+
+	maps each fingerprinted copy to the resource it is a copy of, both relative to the
+	public resources directory. only files recorded here are treated as fingerprinted
+	copies, so a resource which happens to have a hash in its name is left alone
+	"""
+
+	FORMAT_VERSION: int = 1
+
+	def __init__(self, path: Path) -> None:
+		self.path: Path = path
+		self.copies: Dict[str, str] = dict()
+
+	@staticmethod
+	def load(CFG: Config) -> "FingerprintState":
+		state: FingerprintState = FingerprintState(Path(CFG["fingerprint_state_fname"]))
+		if os.path.isfile(state.path):
+			with open(state.path, "r", encoding="utf-8") as f:
+				data: Dict[str, Any] = json.load(f)
+			if data.get("format") == FingerprintState.FORMAT_VERSION:
+				state.copies = data["copies"]
+		return state
+
+	def save(self) -> None:
+		write_atomic(
+			self.path,
+			json.dumps({"format": self.FORMAT_VERSION, "copies": self.copies}, indent="\t", sort_keys=True),
+		)
+
+	def remove_stale(self, dst_dir: Path, current: Dict[str, str]) -> int:
+		"""remove the recorded copies in `dst_dir` which are not in `current`, and their compressed copies,
+		then record `current` instead
+
+		### Returns: `int`
+		 number of files removed
+		"""
+		n_removed: int = 0
+		for rel_path in self.copies:
+			if rel_path in current:
+				continue
+			for suffix in ("", *POSTPROCESS_SUFFIXES):
+				path: Path = dst_dir / (rel_path + suffix)
+				if path.is_file():
+					path.unlink()
+					n_removed += 1
+		self.copies = dict(current)
+		return n_removed
+
+
+def get_resource_origin(rel_path: str, fingerprint_state: Optional[FingerprintState] = None) -> str:
+	"""get the resource a file in the public resources directory was made from: the file
+	itself, or the file it is a compressed (see `postprocess_file`) or fingerprinted (as
+	recorded in `fingerprint_state`) copy of
+	"""
+	for suffix in POSTPROCESS_SUFFIXES:
+		if rel_path.endswith(suffix):
+			rel_path = rel_path[:-len(suffix)]
+			break
+	if fingerprint_state is not None:
+		origin: Optional[str] = fingerprint_state.copies.get(unipath(Path(rel_path)))
+		if origin is not None:
+			return str(Path(origin))
+	return rel_path
+
+
+def fingerprint_resources(
+	src_dir: Path,
+	dst_dir: Path,
+	CFG: Config,
+	state: Optional[FingerprintState] = None,
+	dry_run: bool = False,
+) -> Dict[str, str]:
+	"""put a copy of each resource with one of `CFG["fingerprint_extensions"]` at a name with its content hash
+
+	for example, `css/default.css` is also at `css/default.3f2a1b9c0d4e.css`, which
+	can be cached forever, since a changed file gets a new name. copies are made as by
+	`sync_resources`, only if not already there. the copies are recorded in `state`,
+	and those recorded by the last build which are no longer current are removed.
+	if `dry_run` is set, the names are only computed, and no file is copied or removed
+
+	### Returns: `Dict[str, str]`
+	 fingerprinted path of each resource, both relative to `src_dir`
+	"""
+	extensions: Set[str] = {x.lower() for x in CFG["fingerprint_extensions"]}
+	src_files: List[str] = list()
+	for dirpath, _, filenames in os.walk(src_dir):
+		for fname in filenames:
+			if os.path.splitext(fname)[1].lower() in extensions:
+				src_files.append(os.path.relpath(os.path.join(dirpath, fname), src_dir))
+
+	def _fingerprint(rel_path: str) -> str:
+		src: str = os.path.join(src_dir, rel_path)
+		stem, ext = os.path.splitext(rel_path)
+		rel_path_fp: str = f"{stem}.{hash_file(src)[:FINGERPRINT_LENGTH]}{ext}"
+		dst: str = os.path.join(dst_dir, rel_path_fp)
+		if not dry_run and not os.path.isfile(dst):
+			_sync_file(src, dst, CFG["resources_sync_mode"])
+		return rel_path_fp
+
+	with ThreadPoolExecutor(max_workers=get_n_jobs(CFG)) as pool:
+		fingerprints: Dict[str, str] = dict(zip(src_files, pool.map(_fingerprint, src_files)))
+
+	# remove fingerprinted copies of older versions, and their compressed copies
+	if state is not None and not dry_run:
+		state.remove_stale(dst_dir, {
+			unipath(Path(rel_path_fp)): unipath(Path(rel_path))
+			for rel_path, rel_path_fp in fingerprints.items()
+		})
+
+	return fingerprints
+
+
+def get_asset_manifest(fingerprints: Dict[str, str], prefix: str) -> Dict[str, Any]:
+	"""get the fingerprinted paths as a tree for mustache, which splits keys at `.`
+
+	`{{__assets__.css/default.css}}` gives the path of `css/default.css` (relative to
+	the resources directory) with `prefix` (the resources directory relative to the
+	public directory), for example `resources/css/default.3f2a1b9c0d4e.css`
+	"""
+	assets: Dict[str, Any] = dict()
+	for rel_path, rel_path_fp in sorted(fingerprints.items()):
+		key: str = unipath(Path(rel_path))
+		parts: List[str] = key.split(".")
+		node: Any = assets
+		for part in parts[:-1]:
+			node = node.setdefault(part, dict())
+			if not isinstance(node, dict):
+				break
+		else:
+			if not isinstance(node.get(parts[-1]), dict):
+				node[parts[-1]] = posixpath.join(prefix, unipath(Path(rel_path_fp)))
+				continue
+		# one of `a.b` and `a.b.c` has to be a path, and the other a tree
+		LOG.warning(
+			f"# `{{{{{FrontmatterKeys.assets}.{key}}}}}` is not available to templates, since the name clashes "
+			"with another fingerprinted resource. links to it are still rewritten"
+		)
+	return assets
+
+
+def set_asset_paths(fingerprints: Dict[str, str], prefix: str, CFG: Config) -> None:
+	"""point links at the fingerprinted resources, and give them to templates as `__assets__`
+
+	`prefix` is the resources directory relative to the public directory
+	"""
+	global _GLOBALS_RENDERED
+	_ASSET_PATHS.clear()
+	_ASSET_PATHS.update({
+		posixpath.join(prefix, unipath(Path(rel_path))): posixpath.join(prefix, unipath(Path(rel_path_fp)))
+		for rel_path, rel_path_fp in fingerprints.items()
+	})
+	# updated in place, since the mustache context layers keep it. this is part
+	# of the config hash, so all pages are rebuilt when a fingerprint changes
+	assets: Dict[str, Any] = CFG.setdefault(FrontmatterKeys.assets, dict())
+	assets_new: Dict[str, Any] = get_asset_manifest(fingerprints, prefix)
+	if assets != assets_new:
+		assets.clear()
+		assets.update(assets_new)
+		_GLOBALS_RENDERED = None
+
+
+def rewrite_asset_links(content: str, out_path: Path, CFG: Config) -> str:
+	"""point `href` and `src` attributes in the html `content` of the page at `out_path` at fingerprinted resources
+
+	relative links are resolved from the page, and absolute ones from the public directory.
+	links to other sites, and to files which are not fingerprinted, are left as they are
+	"""
+	if not _ASSET_PATHS:
+		return content
+	page_dir: str = unipath(Path(os.path.relpath(out_path.parent, CFG["public"])))
+
+	def _sub(m: re.Match) -> str:
+		url: str = m.group(4)
+		# links with a scheme, or to other hosts
+		if re.match(r"^([a-zA-Z][a-zA-Z0-9+.-]*:|//)", url):
+			return m.group(0)
+		# keep any query or fragment
+		idx_rest: int = len(url)
+		for c in "?#":
+			if c in url:
+				idx_rest = min(idx_rest, url.index(c))
+		path: str = url[:idx_rest]
+		if not path:
+			return m.group(0)
+		target: str = posixpath.normpath(
+			path.lstrip("/") if path.startswith("/") else posixpath.join(page_dir, path)
+		)
+		if target not in _ASSET_PATHS:
+			return m.group(0)
+		path = path[:len(path) - len(posixpath.basename(path))] + posixpath.basename(_ASSET_PATHS[target])
+		return f"{m.group(1)}{m.group(2)}{m.group(3)}{path}{url[idx_rest:]}{m.group(3)}"
+
+	return _ASSET_LINK_RE.sub(_sub, content)
+
+
+def _resource_unchanged(src: str, dst: str, CFG: Config) -> bool:
+	"""check if `dst` is already an up to date copy of `src`"""
+	try:
+		st_dst: os.stat_result = os.stat(dst)
+	except FileNotFoundError:
+		return False
+	st_src: os.stat_result = os.stat(src)
+
+	if CFG["resources_sync_mode"] == "hardlink" and os.path.samestat(st_src, st_dst):
+		return True
+	if st_src.st_size != st_dst.st_size:
+		return False
+	if CFG["resources_sync_check"] == "hash":
+		return hash_file(src) == hash_file(dst)
+	# copies keep the modification time of the source
+	return st_src.st_mtime_ns == st_dst.st_mtime_ns
+
+
+def sync_resources(
+	src_dir: Path,
+	dst_dir: Path,
+	CFG: Config,
+	postprocess_state: Optional["PostprocessState"] = None,
+	fingerprint_state: Optional[FingerprintState] = None,
+) -> Tuple[int, int, int]:
+	"""copy new or changed files from `src_dir` to `dst_dir`, in parallel
+
+	 - files are compared by size and modification time, or by content hash if
+	   `CFG["resources_sync_check"]` is `"hash"`
+	 - `CFG["resources_sync_mode"]` decides whether files are copied, hardlinked,
+	   or cloned with a reflink (falling back to copying where not supported)
+	 - if `CFG["resources_sync_delete"]` is set, files in `dst_dir` which are not
+	   in `src_dir` are deleted, other than compressed or fingerprinted copies (as recorded
+	   in `fingerprint_state`) of files which are (see `get_resource_origin`)
+	 - files minified by `postprocess_public` (see `postprocess_state`) are unchanged
+	   if the source is the same as before minification
+
+	### Returns: `Tuple[int, int, int]`
+	 number of files copied, unchanged, and deleted
+	"""
+	if CFG["resources_sync_mode"] not in ("copy", "hardlink", "reflink"):
+		raise ValueError(
+			f"Config validation: unknown `resources_sync_mode` '{CFG['resources_sync_mode']}'"
+		)
+
+	# find all source files, relative to `src_dir`
+	src_files: Set[str] = set()
+	for dirpath, _, filenames in os.walk(src_dir):
+		for fname in filenames:
+			src_files.add(os.path.relpath(os.path.join(dirpath, fname), src_dir))
+
+	def _sync(rel_path: str) -> bool:
+		src: str = os.path.join(src_dir, rel_path)
+		dst: str = os.path.join(dst_dir, rel_path)
+		if _resource_unchanged(src, dst, CFG):
+			return False
+		if postprocess_state is not None and postprocess_state.is_minified_copy(src, dst):
+			return False
+		_sync_file(src, dst, CFG["resources_sync_mode"])
+		return True
+
+	with ThreadPoolExecutor(max_workers=get_n_jobs(CFG)) as pool:
+		copied: List[bool] = list(pool.map(_sync, sorted(src_files)))
+
+	# remove files which are no longer in the source, then any directories left empty
+	n_deleted: int = 0
+	if CFG["resources_sync_delete"]:
+		for dirpath, _, filenames in os.walk(dst_dir, topdown=False):
+			for fname in filenames:
+				dst: str = os.path.join(dirpath, fname)
+				rel_path: str = os.path.relpath(dst, dst_dir)
+				if rel_path not in src_files and get_resource_origin(rel_path, fingerprint_state) not in src_files:
+					os.remove(dst)
+					n_deleted += 1
+			if dirpath != str(dst_dir) and not os.listdir(dirpath):
+				os.rmdir(dirpath)
+
+	return sum(copied), len(copied) - sum(copied), n_deleted
+
+
+def get_arg_value(argv: List[str], flag: str) -> Optional[str]:
+	"""get the value following `flag` in `argv`, or `None` if there is none"""
+	if flag not in argv:
+		return None
+	idx: int = argv.index(flag)
+	if idx + 1 < len(argv) and not argv[idx + 1].startswith("-"):
+		return argv[idx + 1]
+	return None
+
+
+def load_config(config_file: str, argv: List[str]) -> Config:
+	"""load the config file, merge it with the default config, apply command line args, and validate it"""
+	with open(config_file, "r", encoding="utf-8") as f:
+		CFG: Config = yaml.load(f, Loader=YAML_FULL_LOADER)
+
+	# merge the config with the default config
+	CFG = {
+		**DEFAULT_CONFIG, 
+		**CFG,
+	}
+
+	# update the globals
+	update_extras(CFG)
+	# validate cfg
+	if CFG["make_rss"]:
+		if CFG["site_link"] is None:
+			raise ValueError("Config validation: `site_link` must be set to generate rss")
+		if not CFG["make_index_files"]:
+			raise ValueError("Config validation: `make_index_files` must be set to generate rss")
+
+	# check for force rebuild
+	if "--rebuild" in argv:
+		CFG["smart_rebuild"] = False
+
+	# check for parallel build options
+	if "--jobs" in argv:
+		CFG["jobs"] = int(get_arg_value(argv, "--jobs"))
+	if "--keep-going" in argv:
+		CFG["keep_going"] = True
+	get_n_jobs(CFG)
+
+	return CFG
+
+
+def build_site(CFG: Config, cache: Optional[BuildCache] = None, plan: bool = False) -> None:
+	"""sync the resources, generate all pages, index them for search, and post-process them,
+	from the directory containing the config
+
+	if `plan` is set, only print which pages would be rebuilt (see `print_build_plan`),
+	without writing anything
+	"""
+
+	# check the `<content>` directory exists
+	if not os.path.isdir(CFG["content"]):
+		raise FileNotFoundError(
+			f"{CFG['content']} is not a valid directory -- should have markdown files in it"
+		)
+	if not os.path.isdir(CFG["resources"]):
+		raise FileNotFoundError(
+			f"{CFG['resources']} is not a valid directory -- should have find resources in it"
+		)
+
+	# the `<resources>` directory relative to `<content>`, and where it is copied to in `<public>`
+	resource_dir_src: Path = Path(CFG["resources"]).relative_to(Path(CFG["content"]))
+	resource_dir_dst: str = str(Path(CFG["public"]) / resource_dir_src)
+
+	if plan:
+		# the fingerprints are part of the config hash, so they are needed to tell which pages changed
+		if CFG["fingerprint_assets"]:
+			set_asset_paths(
+				fingerprint_resources(Path(CFG["resources"]), Path(resource_dir_dst), CFG, dry_run=True),
+				unipath(resource_dir_src),
+				CFG,
+			)
+		gen_all_pages(CFG, cache, plan=True)
+		return
+
+	# create the `<public>` directory, if it doesn't exist
+	if not os.path.isdir(CFG["public"]):
+		os.mkdir(CFG["public"])
+
+	if not os.path.isdir(resource_dir_dst):
+		os.mkdir(resource_dir_dst)
+
+	postprocess_state: Optional[PostprocessState] = PostprocessState.load(CFG)
+	fingerprint_state: FingerprintState = FingerprintState.load(CFG)
+
+	# copy everything from the `<content>/<resources>` directory to the `<public>/<resources>` directory
+	LOG.info(f"# Syncing resources from {CFG['resources']} to {resource_dir_dst}")
+	with PROFILER.phase("resources"):
+		n_copied, n_unchanged, n_deleted = sync_resources(
+			Path(CFG["resources"]), Path(resource_dir_dst), CFG, postprocess_state, fingerprint_state,
+		)
+	LOG.info(f"\t{n_copied} copied, {n_unchanged} unchanged, {n_deleted} deleted")
+	LOG.event("resources", copied=n_copied, unchanged=n_unchanged, deleted=n_deleted)
+
+	# give resources names with their content hash, and point links at them
+	if CFG["fingerprint_assets"]:
+		with PROFILER.phase("fingerprint"):
+			fingerprints: Dict[str, str] = fingerprint_resources(
+				Path(CFG["resources"]), Path(resource_dir_dst), CFG, fingerprint_state,
+			)
+		fingerprint_state.save()
+		set_asset_paths(fingerprints, unipath(resource_dir_src), CFG)
+		LOG.info(f"# Fingerprinted {len(fingerprints)} resources")
+	elif fingerprint_state.copies:
+		# fingerprinting was turned off since the last build
+		fingerprint_state.remove_stale(Path(resource_dir_dst), dict())
+		fingerprint_state.save()
+
+	# generate all pages
+	pages: PageTable = gen_all_pages(CFG, cache)
+
+	# update the search index
+	if CFG["make_search_index"]:
+		with PROFILER.phase("search index"):
+			search_index: SearchIndex = SearchIndex.load(CFG)
+			n_changed, n_shards = search_index.update(pages, CFG, get_source_hashes(pages, CFG))
+			search_index.save()
+		LOG.info(f"# Search index: {n_changed} pages changed, {n_shards} shards written")
+		LOG.event("search_index", changed=n_changed, shards=n_shards)
+
+	# minify and compress the public files
+	if postprocess_state is not None:
+		if CFG["compress_brotli"] and brotli is None:
+			LOG.warning("# `compress_brotli` is set, but the `brotli` package is not installed: not writing .br files")
+		LOG.info("# Post-processing public files")
+		with PROFILER.phase("postprocess"):
+			n_processed, n_unchanged, n_removed = postprocess_public(CFG, postprocess_state)
+		postprocess_state.save()
+		LOG.info(f"\t{n_processed} processed, {n_unchanged} unchanged, {n_removed} removed")
+		LOG.event("postprocess", processed=n_processed, unchanged=n_unchanged, removed=n_removed)
+
+
+def snapshot_files(paths: Iterable[str], dirs: Iterable[str]) -> Dict[str, Tuple[int, int]]:
+	"""get `(mtime, size)` of each of `paths` and every file under `dirs`, skipping missing ones"""
+	snapshot: Dict[str, Tuple[int, int]] = dict()
+
+	def _add(path: str) -> None:
+		try:
+			st: os.stat_result = os.stat(path)
+		except FileNotFoundError:
+			return
+		snapshot[unipath(Path(path))] = (st.st_mtime_ns, st.st_size)
+
+	for d in dirs:
+		for dirpath, _, filenames in os.walk(d):
+			for fname in filenames:
+				_add(os.path.join(dirpath, fname))
+	for p in paths:
+		_add(p)
+
+	return snapshot
+
+
+class QuietHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+	"""serves files without logging every request"""
+
+	def log_message(self, format: str, *args: Any) -> None:
+		pass
+
+
+def serve_public(CFG: Config, port: int, background: bool = True) -> http.server.ThreadingHTTPServer:
+	"""serve the public directory on `localhost:<port>`
+
+	from a background thread if `background` is set, otherwise until Ctrl+C is pressed
+	"""
+	server: http.server.ThreadingHTTPServer = http.server.ThreadingHTTPServer(
+		("127.0.0.1", port),
+		functools.partial(QuietHTTPRequestHandler, directory=os.path.abspath(CFG["public"])),
+	)
+	LOG.info(f"# Serving {CFG['public']} at http://127.0.0.1:{port}/")
+	if background:
+		threading.Thread(target=server.serve_forever, daemon=True).start()
+	else:
+		LOG.info("# Press Ctrl+C to stop")
+		try:
+			server.serve_forever()
+		except KeyboardInterrupt:
+			pass
+		finally:
+			server.server_close()
+	return server
+
+
+def watch_site(config_file: str, argv: List[str], CFG: Config) -> None:
+	"""build the site, then rebuild whenever the content, resources, config, or any other input changes
+
+	the page table, input hashes, compiled templates, and pandoc backend are kept in
+	memory between builds, and the build manifest makes sure only the changed pages
+	(and the index pages above them) are rebuilt. `config_file` should be relative
+	to the current directory, i.e. the directory containing it
+	"""
+	cache: BuildCache = BuildCache()
+	# `--rebuild` only applies to the first build
+	rebuild_first: bool = "--rebuild" in argv
+	argv = [x for x in argv if x != "--rebuild"]
+
+	def _snapshot() -> Dict[str, Tuple[int, int]]:
+		return snapshot_files(
+			[config_file, *([CFG["extras_path"]] if CFG["extras_path"] else []), *cache.inputs],
+			[CFG["content"], CFG["resources"]],
+		)
+
+	def _build() -> None:
+		try:
+			build_site(CFG, cache)
+		except Exception:
+			# keep watching, the next change might fix it
+			traceback.print_exc()
+		LOG.info(f"# Watching for changes every {CFG['watch_interval']}s, press Ctrl+C to stop")
+
+	try:
+		_build()
+		if rebuild_first:
+			CFG = load_config(config_file, argv)
+		snapshot: Dict[str, Tuple[int, int]] = _snapshot()
+
+		while True:
+			time.sleep(CFG["watch_interval"])
+			snapshot_new: Dict[str, Tuple[int, int]] = _snapshot()
+			if snapshot_new == snapshot:
+				continue
+
+			changed: List[str] = sorted(
+				k for k in snapshot.keys() | snapshot_new.keys()
+				if snapshot.get(k) != snapshot_new.get(k)
+			)
+			LOG.info(f"# Changed: {changed}")
+			LOG.event("changed", files=changed)
+
+			# reload the config if it, or the extras, changed
+			config_files: Set[str] = {unipath(Path(config_file))}
+			if CFG["extras_path"]:
+				config_files.add(unipath(Path(CFG["extras_path"])))
+			if config_files & set(changed):
+				try:
+					CFG = load_config(config_file, argv)
+				except Exception:
+					traceback.print_exc()
+				# backend options might have changed
+				cache.close()
+
+			_build()
+			snapshot = _snapshot()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		cache.close()
+
+
+def main(argv: List[str]) -> None:
+
+	# check for help
+	if any((x in argv) for x in ["-h", "--help", "--readme", "--README"]):
+		print(__doc__)
+		exit(0)
+
+	# check if we want to print the default config
+	if "--default-cfg" in argv:
+		print(yaml.dump(DEFAULT_CONFIG))
+		exit(0)
+
+	# load the config file
+	config_file: str = argv[1]
+	CFG: Config = load_config(config_file, argv)
+
+	# TODO: checking for unknown args
+
+	# check for logging options
+	if "--quiet" in argv or "-q" in argv:
+		LOG.level = LOG.QUIET
+	if "--verbose" in argv or "-v" in argv:
+		LOG.level = LOG.VERBOSE
+
+	LOG.info(f"# Using config file '{config_file}'")
+	LOG.verbose("-" * 3)
+	LOG.verbose(yaml.dump(CFG, default_flow_style=False, indent=2))
+	LOG.verbose("-" * 3)
+
+	# change the path to the location of the config file, since paths are relative to it
+	# only change the dir if we are not already in the correct dir
+	if os.path.dirname(config_file):
+		os.chdir(os.path.dirname(config_file))
+
+	if "--log-json" in argv:
+		LOG.open_json(get_arg_value(argv, "--log-json") or "build_log.jsonl")
+
+	serve_port: Optional[int] = None
+	if "--serve" in argv:
+		serve_port = int(get_arg_value(argv, "--serve") or 8000)
+
+	# check for profiling options
+	profile_path: Optional[str] = None
+	cprofile_path: Optional[str] = None
+	if "--profile" in argv:
+		profile_path = get_arg_value(argv, "--profile") or "build_profile.json"
+	if "--cprofile" in argv:
+		cprofile_path = get_arg_value(argv, "--cprofile") or "build_profile.prof"
+		# only one page can be under `cProfile` at a time
+		CFG["jobs"] = 1
+	if profile_path is not None or cprofile_path is not None:
+		PROFILER.enable(cprofile=cprofile_path is not None)
+
+	try:
+		with PROFILER.phase("build"):
+			if "--plan" in argv:
+				build_site(CFG, plan=True)
+			elif "--watch" in argv:
+				if serve_port is not None:
+					serve_public(CFG, serve_port)
+				watch_site(os.path.basename(config_file), argv, CFG)
+			else:
+				build_site(CFG)
+	finally:
+		if PROFILER.enabled:
+			print("# Profile:")
+			print(PROFILER.summary())
+			if profile_path is not None:
+				PROFILER.save_trace(profile_path)
+				print(f"# Wrote trace to '{profile_path}'")
+			if cprofile_path is not None:
+				PROFILER.cprofile.dump_stats(cprofile_path)
+				# no stats if no page was built
+				if PROFILER.cprofile.stats:
+					pstats.Stats(PROFILER.cprofile).sort_stats("cumulative").print_stats(20)
+				print(f"# Wrote cProfile stats to '{cprofile_path}'")
+		LOG.close()
+
+	# with `--watch`, the server was started in the background before the first build
+	if serve_port is not None and "--watch" not in argv and "--plan" not in argv:
+		serve_public(CFG, serve_port, background=False)
 
 
 if __name__ == "__main__":
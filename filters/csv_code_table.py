@@ -1,5 +1,10 @@
 """python pandoc filter replicating [pandoc-csv2table](https://hackage.haskell.org/package/pandoc-csv2table)
 
+tables from a `source` file are cached as json in `CSV_TABLE_CACHE_DIR` (an environment
+variable, `.csv_table_cache` by default, relative to where the build runs; set it to an
+empty string to disable the cache), keyed by the contents of the file and the options.
+only the first `max_rows` rows of the body are kept if given, followed by a notice.
+
 By [@mivanit](mivanit.github.io)
 """
 
@@ -11,6 +16,13 @@ import io
 import sys
 import subprocess
 import csv
+import contextlib
+import gc
+import hashlib
+import json
+import tempfile
+import threading
+from collections import OrderedDict
 
 from pandocfilters import toJSONFilter, Table, Plain, Str
 
@@ -22,6 +34,24 @@ ALIGN_MAP : Dict[str,str] = {
     'D' : 'AlignDefault',
 }
 
+# bump this when the generated table changes, to invalidate the cache
+CACHE_VERSION : int = 1
+
+CACHE_DIR : str = os.environ.get("CSV_TABLE_CACHE_DIR", ".csv_table_cache")
+
+# tables from `source` files already read by this process, by cache key, least recently used first
+_MEMORY_CACHE : "OrderedDict[str, str]" = OrderedDict()
+_MEMORY_CACHE_LOCK : threading.Lock = threading.Lock()
+# total length of the json kept in `_MEMORY_CACHE`, beyond which the oldest tables are dropped
+MEMORY_CACHE_MAX_CHARS : int = 64 * 1024 * 1024
+
+# only pause the garbage collector when running as a filter subprocess. when run
+# in-process by `build.py`, other threads share the collector
+_PAUSE_GC : bool = False
+
+# bytes read at a time when hashing a `source` file
+HASH_CHUNK_SIZE : int = 1024 * 1024
+
 emptyblock = lambda : ["",[],[]]
 
 def Plain_factory(val : str) -> List:
@@ -57,15 +87,13 @@ def header_factory(lst_vals : List) -> List:
         [ table_row_factory(lst_vals) ],
     ]
 
-def body_factory(table_vals : List) -> List:
+def body_factory(table_rows : List) -> List:
+    """wrap rows already made by `table_row_factory` into the table body"""
     return [[
         emptyblock(),
         0,
         [],
-        [
-            table_row_factory(row)
-            for row in table_vals
-        ],
+        table_rows,
     ]]
 
 def keyvals_process(keyvals : List[Tuple[str, str]]) -> Dict[str,str]:
@@ -77,43 +105,64 @@ def keyvals_process(keyvals : List[Tuple[str, str]]) -> Dict[str,str]:
 
     
 
-def codeblock_process(key, value, format_, _):
-    # figure out whether this block should be processed
-    if not (key == 'CodeBlock'):
-        return None
-    
-    [[ident, classes, lst_keyvals], code] = value
+@contextlib.contextmanager
+def gc_paused() -> Iterator[None]:
+    """pause the garbage collector, which otherwise runs over and over while a big table
+    is built (or loaded), despite none of its objects being part of a cycle
 
-    if "csv_table" not in classes:
-        return None
+    does nothing unless `_PAUSE_GC` is set, since the collector is global to the process"""
+    if not _PAUSE_GC:
+        yield
+        return
+    was_enabled : bool = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
 
-    # read the keyvals
-    keyvals : dict = keyvals_process(lst_keyvals)
-    header : bool = bool(int(keyvals.get("header", 1)))
-    source : Optional[str] = keyvals.get("source")
-    aligns : Optional[List[str]] = (
-        list(keyvals.get("aligns", "")) 
-        if "aligns" in keyvals 
-        else None
-    )
-    caption : Optional[str] = keyvals.get("caption", None)
 
-    # read the csv source into a table
-    if source is None:
-        table_data = list(csv.reader(io.StringIO(code)))
-    else:
-        if os.path.isfile(source):
-            table_data = list(csv.reader(open(source, "r")))
-        else:
-            raise Exception(f"csv source file not found: {source}")
-
-    # validate the csv table
-    n_cols : int = len(table_data[0])
-    assert all(
-        len(row) == n_cols 
-        for row in table_data
-        ), "csv table is not rectangular"
-    
+def read_table(
+        rows : Iterable[List[str]],
+        max_rows : Optional[int] = None,
+    ) -> Tuple[List[str], List, int]:
+    """read the header and the body rows (as AST) from `rows` in one pass, checking the shape as it goes
+
+    only the first `max_rows` body rows are turned into AST, but the rest are still
+    counted and checked. returns the header, the body rows, and the total number of body rows
+    """
+    rows_iter : Iterator[List[str]] = iter(rows)
+    row_header : Optional[List[str]] = next(rows_iter, None)
+    if row_header is None:
+        raise Exception("csv table is empty")
+    n_cols : int = len(row_header)
+
+    table_rows : List = list()
+    n_rows : int = 0
+    with gc_paused():
+        for row in rows_iter:
+            if len(row) != n_cols:
+                raise Exception(
+                    f"csv table is not rectangular: row {n_rows + 2} has {len(row)} columns, expected {n_cols}"
+                )
+            if max_rows is None or n_rows < max_rows:
+                table_rows.append(table_row_factory(row))
+            n_rows += 1
+
+    return row_header, table_rows, n_rows
+
+
+def make_table(
+        rows : Iterable[List[str]],
+        aligns : Optional[List[str]],
+        caption : Optional[str],
+        max_rows : Optional[int],
+    ) -> List:
+    """make the table, followed by a notice if it was truncated, as a list of blocks"""
+    row_header, table_rows, n_rows = read_table(rows, max_rows)
+    n_cols : int = len(row_header)
+
     if aligns is None:
         aligns = [ "D" for _ in range(n_cols) ]
     else:
@@ -123,18 +172,9 @@ def codeblock_process(key, value, format_, _):
             aligns = [ aln.upper() for aln in aligns ]        
         else:
             raise Exception(f"aligns length mismatch: {aligns}")
-    
-    if header:
-        row_header : List = table_data[0]
-        table_rows : List = table_data[1:]
-    else:
-        raise Exception("lack of header not supported")
-        row_header = []
-        table_rows = table_data
-    
 
     # write the table
-    return {
+    blocks : List = [{
         "t": "Table",
         "c" : [
             # idk
@@ -162,7 +202,130 @@ def codeblock_process(key, value, format_, _):
                 []
             ],
         ]
-    }
+    }]
+
+    if len(table_rows) < n_rows:
+        blocks.append({
+            "t" : "Para",
+            "c" : [{
+                "t" : "Emph",
+                "c" : [{"t" : "Str", "c" : f"(showing {len(table_rows)} of {n_rows} rows)"}],
+            }],
+        })
+
+    return blocks
+
+
+def cache_key(path : str, options : Dict[str, Any]) -> str:
+    """hash of the contents of the `source` file at `path` and the options it is read with"""
+    h = hashlib.sha256()
+    h.update(json.dumps([CACHE_VERSION, options], sort_keys = True).encode("utf-8"))
+    with open(path, "rb") as f:
+        for chunk in iter(lambda : f.read(HASH_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _memory_cache_store(key : str, value : str) -> None:
+    """keep `value` in `_MEMORY_CACHE`, dropping the least recently used tables beyond `MEMORY_CACHE_MAX_CHARS`"""
+    if len(value) > MEMORY_CACHE_MAX_CHARS:
+        return
+    with _MEMORY_CACHE_LOCK:
+        _MEMORY_CACHE[key] = value
+        _MEMORY_CACHE.move_to_end(key)
+        total : int = sum(len(v) for v in _MEMORY_CACHE.values())
+        while total > MEMORY_CACHE_MAX_CHARS:
+            _, dropped = _MEMORY_CACHE.popitem(last = False)
+            total -= len(dropped)
+
+
+def cache_get(key : str) -> Optional[List]:
+    """get the blocks for `key` from memory or from `CACHE_DIR`, or `None`"""
+    with _MEMORY_CACHE_LOCK:
+        value : Optional[str] = _MEMORY_CACHE.get(key)
+        if value is not None:
+            _MEMORY_CACHE.move_to_end(key)
+    if value is None:
+        if not CACHE_DIR:
+            return None
+        try:
+            with open(os.path.join(CACHE_DIR, f"{key}.json"), "r", encoding = "utf-8") as f:
+                value = f.read()
+        except OSError:
+            return None
+        _memory_cache_store(key, value)
+    # a fresh copy, since other filters might modify it
+    with gc_paused():
+        return json.loads(value)
+
+
+def cache_put(key : str, blocks : List) -> None:
+    """store the blocks for `key` in memory and in `CACHE_DIR`, ignoring errors writing it"""
+    value : str = json.dumps(blocks)
+    _memory_cache_store(key, value)
+    if not CACHE_DIR:
+        return
+    try:
+        os.makedirs(CACHE_DIR, exist_ok = True)
+        fd, tmp_path = tempfile.mkstemp(dir = CACHE_DIR, suffix = ".tmp")
+        with os.fdopen(fd, "w", encoding = "utf-8") as f:
+            f.write(value)
+        os.replace(tmp_path, os.path.join(CACHE_DIR, f"{key}.json"))
+    except OSError:
+        pass
+
+
+def codeblock_process(key, value, format_, _):
+    # figure out whether this block should be processed
+    if not (key == 'CodeBlock'):
+        return None
+    
+    [[ident, classes, lst_keyvals], code] = value
+
+    if "csv_table" not in classes:
+        return None
+
+    # read the keyvals
+    keyvals : dict = keyvals_process(lst_keyvals)
+    header : bool = bool(int(keyvals.get("header", 1)))
+    source : Optional[str] = keyvals.get("source")
+    aligns : Optional[List[str]] = (
+        list(keyvals.get("aligns", "")) 
+        if "aligns" in keyvals 
+        else None
+    )
+    caption : Optional[str] = keyvals.get("caption", None)
+    max_rows : Optional[int] = (
+        int(keyvals["max_rows"])
+        if "max_rows" in keyvals
+        else None
+    )
+
+    if not header:
+        raise Exception("lack of header not supported")
+
+    # read the csv source into a table
+    if source is None:
+        return make_table(csv.reader(io.StringIO(code)), aligns, caption, max_rows)
+
+    if not os.path.isfile(source):
+        raise Exception(f"csv source file not found: {source}")
+
+    key_cache : str = cache_key(
+        source,
+        dict(aligns = aligns, header = header, caption = caption, max_rows = max_rows),
+    )
+    blocks : Optional[List] = cache_get(key_cache)
+    if blocks is None:
+        # rows are parsed as they are read, so the whole file is never in memory
+        with open(source, "r", encoding = "utf-8", newline = "") as f:
+            blocks = make_table(csv.reader(f), aligns, caption, max_rows)
+        cache_put(key_cache, blocks)
+    return blocks
+
+
+# actions to apply when this filter is run in-process by `build.py`
+FILTER_ACTIONS = [codeblock_process]
 
 
 def test_filter():
@@ -176,6 +339,7 @@ def test_filter():
 
 
 if __name__ == "__main__":
+    _PAUSE_GC = True
     toJSONFilter(codeblock_process)
     # test_filter()
     
@@ -19,5 +19,8 @@ def links_md2html(key, value, format, meta) -> None:
 	else:
 		return None
 
+# actions to apply when this filter is run in-process by `build.py`
+FILTER_ACTIONS = [links_md2html]
+
 if __name__ == "__main__":
 	toJSONFilter(links_md2html)
\ No newline at end of file
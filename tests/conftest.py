@@ -0,0 +1,62 @@
+import inspect
+import os
+import sys
+from pathlib import Path
+from typing import *
+
+import chevron
+import pytest
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import build
+import benchmark  # registers the `stub` pandoc backend
+
+
+# building pages renders templates with `keep=True`, which needs the chevron from `requirements.txt`
+needs_chevron_keep = pytest.mark.skipif(
+	"keep" not in inspect.signature(chevron.render).parameters,
+	reason="needs the version of chevron in requirements.txt",
+)
+
+
+class Site(object):
+	"""a small site in a temporary directory, built with the stub pandoc backend"""
+
+	def __init__(self, root: Path) -> None:
+		self.root: Path = root
+		self.content: Path = root / "content"
+		self.public: Path = root / "public"
+		(self.content / "resources").mkdir(parents=True)
+		self.config: Dict[str, Any] = {
+			"content": "./content/",
+			"public": "./public/",
+			"resources": "./content/resources/",
+			"site_link": "https://example.com",
+			"pandoc_backend": "stub",
+		}
+
+	def write(self, name: str, frontmatter: Dict[str, Any], body: str = "text\n") -> Path:
+		"""write the page `name` (without `.md`), returning its path"""
+		path: Path = self.content / f"{name}.md"
+		path.write_text(f"---\n{yaml.dump(frontmatter)}---\n\n{body}", encoding="utf-8")
+		return path
+
+	def build(self, argv: Sequence[str] = ()) -> Dict[str, Any]:
+		"""write the config and build the site, returning the config"""
+		(self.root / "config.yml").write_text(yaml.dump(self.config), encoding="utf-8")
+		CFG: Dict[str, Any] = build.load_config("config.yml", list(argv))
+		build.build_site(CFG)
+		return CFG
+
+	def outputs(self) -> Set[str]:
+		"""names of the files in the public directory, other than resources"""
+		return {x.name for x in self.public.iterdir() if x.is_file()}
+
+
+@pytest.fixture
+def site(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Site:
+	# paths in the config, and the build state, are relative to the working directory
+	monkeypatch.chdir(tmp_path)
+	return Site(tmp_path)
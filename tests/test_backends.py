@@ -0,0 +1,78 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import build
+
+
+def _server_request(pandoc_args):
+	# `server_request` only maps args, so no servers need to be started
+	backend = object.__new__(build.PandocServerBackend)
+	return backend.server_request("text", build.PANDOC_FROM, build.PANDOC_TO, pandoc_args)
+
+
+def test_server_request_splits_at_first_separator():
+	request = _server_request({
+		"variable": ["url=http://example.com", "ratio:a=b", "flag"],
+		"metadata": "lang=en:us",
+	})
+	assert request["variables"] == {"url": "http://example.com", "ratio": "a=b", "flag": True}
+	assert request["metadata"] == {"lang": "en:us"}
+
+
+def test_server_request_maps_args():
+	request = _server_request({"toc": True, "shift-heading-level-by": 1})
+	assert request["table-of-contents"] is True
+	assert request["shift-heading-level-by"] == 1
+	assert request["from"] == build.PANDOC_FROM
+	assert request["html-math-method"] == "mathjax"
+
+
+def test_server_request_falls_back_on_filters():
+	assert _server_request({"filter": ["filters/links_md2html.py"]}) is None
+
+
+def test_pandoc_args_to_cli():
+	assert build.pandoc_args_to_cli({"toc": True, "number-sections": False, "variable": ["a=b", "c=d"], "toc-depth": 2}) == [
+		"--toc", "--variable", "a=b", "--variable", "c=d", "--toc-depth", "2",
+	]
+
+
+def test_server_request_reads_include_files(tmp_path):
+	header: Path = tmp_path / "header.html"
+	header.write_text("<style></style>")
+	request = _server_request({"include-in-header": str(header)})
+	assert request["variables"] == {"header-includes": ["<style></style>"]}
+	assert request["standalone"] is True
+
+
+def test_get_pandoc_backend():
+	import benchmark  # registers the `stub` backend
+
+	backend = build.get_pandoc_backend({**build.DEFAULT_CONFIG, "pandoc_backend": "stub"})
+	assert isinstance(backend, benchmark.StubBackend)
+	assert backend.convert("some [link](page.md)\n", build.PANDOC_FROM, build.PANDOC_TO, {}) == (
+		'<p>some <a href="page.md">link</a></p>'
+	)
+	with pytest.raises(ValueError):
+		build.get_pandoc_backend({**build.DEFAULT_CONFIG, "pandoc_backend": "missing"})
+
+
+def test_subprocess_backend_command(monkeypatch):
+	calls = list()
+
+	def _run(cmd, input, stdout, stderr):
+		calls.append((cmd, input))
+		return subprocess.CompletedProcess(cmd, 1 if b"FAIL" in input else 0, b"<p>x</p>", b"bad input")
+
+	monkeypatch.setattr(build.subprocess, "run", _run)
+	backend = build.SubprocessBackend(build.DEFAULT_CONFIG)
+	assert backend.convert("x", "json", "html5", {"toc": True}) == "<p>x</p>"
+	assert calls[-1] == (["pandoc", "--mathjax", "--from", "json", "--to", "html5", "--toc"], b"x")
+
+	with pytest.raises(RuntimeError, match="blog.post"):
+		backend.convert("FAIL", build.PANDOC_FROM, build.PANDOC_TO, {}, label="blog.post")
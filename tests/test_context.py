@@ -0,0 +1,25 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import build
+
+
+def test_globals_are_not_shadowed_by_frontmatter():
+	CFG = {**build.DEFAULT_CONFIG, "site_name": "site", "frontmatter_defaults": {"title": "default"}}
+	context = build.mustache_context(
+		CFG,
+		{build.FrontmatterKeys.filename: "page.html"},
+		{"__globals__": {"site_name": "page"}, "title": "page", build.FrontmatterKeys.filename: "x"},
+	)
+	assert context["__globals__"] is CFG
+	assert context["title"] == "page"
+	assert context[build.FrontmatterKeys.filename] == "page.html"
+
+
+def test_frontmatter_defaults_are_below_frontmatter():
+	CFG = {**build.DEFAULT_CONFIG, "frontmatter_defaults": {"title": "default", "author": "someone"}}
+	context = build.mustache_context(CFG, {}, {"title": "page"})
+	assert context["title"] == "page"
+	assert context["author"] == "someone"
@@ -0,0 +1,85 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "filters"))
+
+pytest.importorskip("pandocfilters")
+
+import csv_code_table
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+	monkeypatch.setattr(csv_code_table, "CACHE_DIR", str(tmp_path / "cache"))
+	monkeypatch.setattr(csv_code_table, "_MEMORY_CACHE", csv_code_table.OrderedDict())
+	return tmp_path / "cache"
+
+
+def _block(code="", **keyvals):
+	return [["", ["csv_table"], [[k, str(v)] for k, v in keyvals.items()]], code]
+
+
+def _body_rows(blocks):
+	return blocks[0]["c"][4][0][3]
+
+
+def _cell(row, i):
+	return row[1][i][4][0]["c"][0]["c"]
+
+
+def test_inline_table():
+	blocks = csv_code_table.codeblock_process("CodeBlock", _block("a,b\n1,2\n3,4\n", aligns="LR"), "html", {})
+	assert len(blocks) == 1
+	table = blocks[0]["c"]
+	assert [x[0]["t"] for x in table[2]] == ["AlignLeft", "AlignRight"]
+	assert [_cell(row, 1) for row in _body_rows(blocks)] == ["2", "4"]
+	assert csv_code_table.codeblock_process("CodeBlock", [["", ["python"], []], "x"], "html", {}) is None
+
+
+def test_max_rows_keeps_counting():
+	blocks = csv_code_table.codeblock_process("CodeBlock", _block("a\n1\n2\n3\n", max_rows=2), "html", {})
+	assert len(_body_rows(blocks)) == 2
+	assert blocks[1]["c"][0]["c"][0]["c"] == "(showing 2 of 3 rows)"
+	with pytest.raises(Exception, match="row 4"):
+		csv_code_table.codeblock_process("CodeBlock", _block("a,b\n1,2\n3,4\n5\n", max_rows=1), "html", {})
+
+
+def test_source_tables_are_cached(tmp_path, cache_dir, monkeypatch):
+	source: Path = tmp_path / "data.csv"
+	source.write_text("name,value\nx,1\ny,2\n")
+	block = _block(source=source, caption="data")
+
+	first = csv_code_table.codeblock_process("CodeBlock", block, "html", {})
+	assert len(list(cache_dir.glob("*.json"))) == 1
+
+	# later reads come from memory, or the cache directory, without parsing the file
+	def _fail(*args):
+		raise AssertionError("table was parsed again")
+
+	with monkeypatch.context() as m:
+		m.setattr(csv_code_table, "make_table", _fail)
+		second = csv_code_table.codeblock_process("CodeBlock", block, "html", {})
+		csv_code_table._MEMORY_CACHE.clear()
+		third = csv_code_table.codeblock_process("CodeBlock", block, "html", {})
+	assert first == second == third
+	# each read gets its own copy
+	second[0]["c"][1] = None
+	assert csv_code_table.codeblock_process("CodeBlock", block, "html", {}) == first
+
+	source.write_text("name,value\nx,1\ny,3\n")
+	changed = csv_code_table.codeblock_process("CodeBlock", block, "html", {})
+	assert _cell(_body_rows(changed)[1], 1) == "3"
+	assert len(list(cache_dir.glob("*.json"))) == 2
+
+
+def test_memory_cache_is_bounded(monkeypatch):
+	monkeypatch.setattr(csv_code_table, "MEMORY_CACHE_MAX_CHARS", 10)
+	csv_code_table._memory_cache_store("a", "1234")
+	csv_code_table._memory_cache_store("b", "1234")
+	csv_code_table._memory_cache_store("a", "1234")
+	csv_code_table._memory_cache_store("c", "1234")
+	assert list(csv_code_table._MEMORY_CACHE) == ["a", "c"]
+	csv_code_table._memory_cache_store("big", "x" * 11)
+	assert "big" not in csv_code_table._MEMORY_CACHE
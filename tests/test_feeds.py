@@ -0,0 +1,69 @@
+import datetime
+import re
+import sys
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import build
+
+
+UTC = datetime.timezone.utc
+
+
+def _child(name, date=None, **kwargs):
+	filename: str = re.sub(r"\W+", "-", name).strip("-")
+	return {"title": name, build.FrontmatterKeys.filename: f"{filename}.html", "date": date, **kwargs}
+
+
+def test_parse_feed_date():
+	assert build.parse_feed_date(datetime.date(2024, 1, 2)) == datetime.datetime(2024, 1, 2, tzinfo=UTC)
+	assert build.parse_feed_date("2024-01-02 03:04") == datetime.datetime(2024, 1, 2, 3, 4, tzinfo=UTC)
+	assert build.parse_feed_date("2024-01-02T03:04:00+02:00").utcoffset() == datetime.timedelta(hours=2)
+	assert build.parse_feed_date("soon") is None
+	assert build.parse_feed_date(None) is None
+
+
+def test_select_feed_items_newest_first():
+	children = [
+		_child("undated 1"),
+		_child("old", datetime.date(2020, 1, 1)),
+		_child("new", "2024-05-01"),
+		_child("undated 2", "not a date"),
+		_child("middle", datetime.datetime(2022, 1, 1, 12, 0)),
+	]
+	titles = lambda items: [child["title"] for _, child in items]
+	assert titles(build.select_feed_items(children, "date", None)) == ["new", "middle", "old", "undated 1", "undated 2"]
+	assert titles(build.select_feed_items(children, "date", 2)) == ["new", "middle"]
+
+
+def test_gen_feeds_escapes_and_only_writes_changes(tmp_path):
+	CFG = {**build.DEFAULT_CONFIG, "site_link": "https://example.com", "make_atom": True}
+	out_path: Path = tmp_path / "blog.html"
+	frontmatter = {"title": "Tom & Jerry's <blog>", "description": 'a "quoted" blog'}
+	children = [
+		_child("post <1>", datetime.date(2024, 1, 2), description="fish & chips"),
+		_child("post 2", datetime.date(2024, 1, 1)),
+	]
+
+	written = build.gen_feeds(out_path, Path("blog"), frontmatter, children, CFG)
+	assert sorted(p.name for p in written) == ["blog.atom", "blog.rss"]
+
+	rss = ET.parse(tmp_path / "blog.rss").getroot()
+	assert rss.find("channel/title").text == "Tom & Jerry's <blog>"
+	items = rss.findall("channel/item")
+	assert [x.find("title").text for x in items] == ["post <1>", "post 2"]
+	assert items[0].find("link").text == "https://example.com/post-1.html"
+	assert items[0].find("description").text == "fish & chips"
+	assert items[0].find("pubDate").text == "Tue, 02 Jan 2024 00:00:00 +0000"
+
+	atom = ET.parse(tmp_path / "blog.atom").getroot()
+	ns = {"a": "http://www.w3.org/2005/Atom"}
+	assert atom.find("a:updated", ns).text == "2024-01-02T00:00:00+00:00"
+	assert len(atom.findall("a:entry", ns)) == 2
+
+	# no timestamp of the build, so nothing changes
+	assert build.gen_feeds(out_path, Path("blog"), frontmatter, children, CFG) == []
+	children.append(_child("post 3", datetime.date(2024, 2, 1)))
+	assert len(build.gen_feeds(out_path, Path("blog"), frontmatter, children, CFG)) == 2
@@ -0,0 +1,145 @@
+import json
+import os
+import sys
+from pathlib import Path
+from typing import *
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import build
+from benchmark import StubBackend
+
+pandocfilters = pytest.importorskip("pandocfilters")
+
+REPO_DIR: Path = Path(__file__).resolve().parent.parent
+
+
+FILTER_SOURCE: str = """
+from pandocfilters import Str
+
+def caps(key, value, format, meta):
+    if key == "Str":
+        return Str(value.upper())
+
+FILTER_ACTIONS = [caps]
+"""
+
+
+class RecordingBackend(StubBackend):
+	"""records every conversion, and acts out the pandoc args the tests care about
+
+	`shift-heading-level-by` adds a paragraph each time pandoc would apply it, and
+	filters are run when converting to html, as pandoc would run them
+	"""
+
+	def __init__(self) -> None:
+		self.calls: List[Tuple[str, str, Dict[str, Any]]] = list()
+
+	def convert(self, text, fmt_from, fmt_to, pandoc_args, label="text"):
+		self.calls.append((fmt_from, fmt_to, dict(pandoc_args)))
+		ast = json.loads(text) if fmt_from == "json" else self.to_ast(text)
+		if "shift-heading-level-by" in pandoc_args:
+			ast["blocks"].append({"t": "Para", "c": [{"t": "Str", "c": "shifted"}]})
+		if fmt_to == "json":
+			return json.dumps(ast)
+		for filter_path in pandoc_args.get("filter", []):
+			actions = build.load_filter_actions(filter_path) or []
+			ast = json.loads(pandocfilters.applyJSONFilters(actions, json.dumps(ast), fmt_to))
+		return self.to_html(ast)
+
+
+def _run(tmp_path: Path, inprocess: bool, pandoc_args: Dict[str, Any]) -> Tuple[str, RecordingBackend]:
+	filter_path: Path = tmp_path / "caps.py"
+	filter_path.write_text(FILTER_SOURCE)
+	CFG = {**build.DEFAULT_CONFIG, "inprocess_filters": inprocess}
+	backend = RecordingBackend()
+	html: str = build.run_pandoc(
+		"some text\n\nmore [text](other.md)\n",
+		{**pandoc_args, "filter": [str(filter_path)]},
+		CFG,
+		backend,
+	)
+	return html, backend
+
+
+def test_inprocess_filters_match_pandoc_filters(tmp_path):
+	args = {"shift-heading-level-by": 1, "toc": True}
+	html_subprocess, backend_subprocess = _run(tmp_path, False, args)
+	html_inprocess, backend_inprocess = _run(tmp_path, True, args)
+
+	assert len(backend_subprocess.calls) == 1
+	assert len(backend_inprocess.calls) == 2
+	assert html_inprocess == html_subprocess
+	assert html_inprocess.count("SHIFTED") == 1
+
+
+def test_inprocess_filters_split_reader_and_writer_args(tmp_path):
+	args = {"shift-heading-level-by": 1, "metadata": ["a=b"], "toc": True, "data-dir": "x"}
+	_, backend = _run(tmp_path, True, args)
+	(_, to_json, reader_args), (from_json, _, writer_args) = backend.calls
+	assert (to_json, from_json) == ("json", "json")
+	assert reader_args == {"shift-heading-level-by": 1, "metadata": ["a=b"], "data-dir": "x"}
+	assert writer_args == {"toc": True, "data-dir": "x"}
+
+
+def test_citeproc_after_filters_is_left_to_pandoc(tmp_path):
+	_, backend = _run(tmp_path, True, {"citeproc": True})
+	assert len(backend.calls) == 2
+
+	filter_path: Path = tmp_path / "caps.py"
+	backend = RecordingBackend()
+	build.run_pandoc(
+		"text\n",
+		{"filter": [str(filter_path)], "citeproc": True},
+		{**build.DEFAULT_CONFIG, "inprocess_filters": True},
+		backend,
+	)
+	assert len(backend.calls) == 1
+
+
+def test_repo_filter_runs_in_process():
+	CFG = {**build.DEFAULT_CONFIG, "inprocess_filters": True}
+	backend = RecordingBackend()
+	html: str = build.run_pandoc(
+		"see [the post](blog.post.md) and [a site](https://example.com)\n",
+		{"filter": [str(REPO_DIR / "filters" / "links_md2html.py")]},
+		CFG,
+		backend,
+	)
+	assert len(backend.calls) == 2
+	assert html == '<p>see <a href="blog.post.html">the post</a> and <a href="https://example.com">a site</a></p>'
+
+
+def test_filters_which_cant_run_in_process(tmp_path, capsys):
+	no_actions: Path = tmp_path / "no_actions.py"
+	no_actions.write_text("x = 1\n")
+	broken: Path = tmp_path / "broken.py"
+	broken.write_text("import a_module_which_does_not_exist\n")
+	assert build.load_filter_actions(str(no_actions)) is None
+	assert build.load_filter_actions(str(broken)) is None
+	assert "broken.py" in capsys.readouterr().out
+	assert build.load_filter_actions(str(tmp_path / "filter.lua")) is None
+
+	# any filter which cant run in-process sends the whole page through pandoc
+	backend = RecordingBackend()
+	(tmp_path / "caps.py").write_text(FILTER_SOURCE)
+	build.run_pandoc(
+		"text\n",
+		{"filter": [str(tmp_path / "caps.py"), str(no_actions)]},
+		{**build.DEFAULT_CONFIG, "inprocess_filters": True},
+		backend,
+	)
+	assert len(backend.calls) == 1
+
+
+def test_filters_are_reloaded_when_changed(tmp_path):
+	filter_path: Path = tmp_path / "caps.py"
+	filter_path.write_text(FILTER_SOURCE)
+	first = build.load_filter_actions(str(filter_path))
+	assert build.load_filter_actions(str(filter_path)) is first
+
+	filter_path.write_text(FILTER_SOURCE + "\nFILTER_ACTIONS = []\n")
+	os.utime(filter_path, ns=(0, os.stat(filter_path).st_mtime_ns + 1))
+	assert build.load_filter_actions(str(filter_path)) == []
@@ -0,0 +1,63 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import build
+
+
+def _cfg(tmp_path: Path, **kwargs):
+	return {
+		**build.DEFAULT_CONFIG,
+		"fingerprint_state_fname": str(tmp_path / "fingerprint_state.json"),
+		"resources_sync_delete": True,
+		**kwargs,
+	}
+
+
+def _build(src: Path, dst: Path, CFG):
+	state = build.FingerprintState.load(CFG)
+	build.sync_resources(src, dst, CFG, fingerprint_state=state)
+	fingerprints = build.fingerprint_resources(src, dst, CFG, state)
+	state.save()
+	return fingerprints
+
+
+def test_fingerprint_copies_are_recorded_and_replaced(tmp_path):
+	src, dst = tmp_path / "src", tmp_path / "dst"
+	(src / "css").mkdir(parents=True)
+	(src / "css" / "style.css").write_text("a { color: red }")
+	CFG = _cfg(tmp_path)
+
+	old = _build(src, dst, CFG)["css/style.css"]
+	assert (dst / old).read_text() == "a { color: red }"
+
+	(src / "css" / "style.css").write_text("a { color: blue }")
+	new = _build(src, dst, CFG)["css/style.css"]
+	assert new != old
+	assert (dst / new).is_file()
+	assert not (dst / old).exists()
+	assert (dst / "css" / "style.css").read_text() == "a { color: blue }"
+
+
+def test_hash_like_names_are_not_fingerprinted_copies(tmp_path):
+	src, dst = tmp_path / "src", tmp_path / "dst"
+	src.mkdir()
+	# a real resource, which only looks like a fingerprinted copy of `font.woff`
+	(src / "font.0123456789ab.woff").write_bytes(b"font")
+	(src / "font.woff").write_bytes(b"other font")
+	CFG = _cfg(tmp_path)
+
+	_build(src, dst, CFG)
+	_build(src, dst, CFG)
+	assert (dst / "font.0123456789ab.woff").read_bytes() == b"font"
+	assert build.get_resource_origin("font.0123456789ab.woff") == "font.0123456789ab.woff"
+
+
+def test_asset_manifest_warns_on_clashing_names(capsys):
+	assets = build.get_asset_manifest(
+		{"img/logo.png": "img/logo.111111111111.png", "img/logo.png.webp": "img/logo.png.222222222222.webp"},
+		"resources",
+	)
+	assert assets == {"img/logo": {"png": "resources/img/logo.111111111111.png"}}
+	assert "img/logo.png.webp" in capsys.readouterr().out
@@ -0,0 +1,97 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import build
+from conftest import needs_chevron_keep
+
+
+def test_stale_outputs_and_their_feeds_are_removed(tmp_path):
+	public: Path = tmp_path / "public"
+	public.mkdir()
+	for name in ("tags.a.html", "tags.a.rss", "tags.a.atom", "tags.b.html", "tags.b.rss"):
+		(public / name).write_text(name)
+	outside: Path = tmp_path / "old_public" / "page.html"
+	outside.parent.mkdir()
+	outside.write_text("page")
+
+	manifest = build.BuildManifest(tmp_path / "manifest.json")
+	for out_path in (public / "tags.a.html", public / "tags.b.html", outside):
+		manifest.record(out_path, {"<config>": "x"}, duration=1.0)
+
+	stale = manifest.prune([public / "tags.b.html"])
+	assert sorted(stale) == sorted([build.unipath(public / "tags.a.html"), build.unipath(outside)])
+	assert list(manifest.durations) == [build.unipath(public / "tags.b.html")]
+
+	removed = build.remove_stale_outputs(stale, {**build.DEFAULT_CONFIG, "public": str(public)})
+	assert len(removed) == 3
+	assert sorted(p.name for p in public.iterdir()) == ["tags.b.html", "tags.b.rss"]
+	assert outside.is_file()
+
+
+def test_needs_rebuild_reasons(tmp_path):
+	out_path: Path = tmp_path / "page.html"
+	src: Path = tmp_path / "page.md"
+	src.write_text("one")
+	manifest = build.BuildManifest(tmp_path / "manifest.json")
+	inputs = manifest.hash_inputs([src], "config 1")
+	assert manifest.needs_rebuild(out_path, inputs) == "not in manifest"
+
+	manifest.record(out_path, inputs)
+	assert manifest.needs_rebuild(out_path, inputs) == "output missing"
+	out_path.write_text("html")
+	assert manifest.needs_rebuild(out_path, inputs) is None
+
+	assert manifest.needs_rebuild(out_path, manifest.hash_inputs([src], "config 2")) == "changed input '<config>'"
+	assert manifest.needs_rebuild(out_path, manifest.hash_inputs([src, tmp_path / "missing.md"], "config 1")) is None
+	other: Path = tmp_path / "other.md"
+	other.write_text("other")
+	assert manifest.needs_rebuild(out_path, manifest.hash_inputs([src, other], "config 1")).startswith("new input")
+	assert manifest.needs_rebuild(out_path, {"<config>": "config 1"}).startswith("removed input")
+
+
+def test_manifest_compares_content_not_mtime(tmp_path):
+	out_path: Path = tmp_path / "page.html"
+	out_path.write_text("html")
+	src: Path = tmp_path / "page.md"
+	src.write_text("one")
+	manifest = build.BuildManifest(tmp_path / "manifest.json")
+	manifest.record(out_path, manifest.hash_inputs([src], "config"), duration=2.0)
+	manifest.save()
+
+	# same content, new mtime: up to date
+	src.write_text("one")
+	loaded = build.BuildManifest.load(tmp_path / "manifest.json")
+	assert loaded.needs_rebuild(out_path, loaded.hash_inputs([src], "config")) is None
+	assert loaded.get_duration(out_path) == 2.0
+
+	src.write_text("two")
+	loaded = build.BuildManifest.load(tmp_path / "manifest.json")
+	assert loaded.needs_rebuild(out_path, loaded.hash_inputs([src], "config")) == f"changed input '{build.unipath(src)}'"
+
+
+@needs_chevron_keep
+def test_only_changed_pages_and_their_index_are_rebuilt(site):
+	site.write("blog", {"title": "blog", "__index__": True}, "{{#__children__}}\n- {{title}}\n{{/__children__}}\n")
+	site.write("blog.a", {"title": "a"})
+	site.write("blog.b", {"title": "b"})
+	site.write("about", {"title": "about"})
+	site.build()
+
+	def _files():
+		# outputs are written to a new file and renamed, so a rewritten output is a new inode
+		return {name: (site.public / name).stat().st_ino for name in ("blog.html", "blog.a.html", "blog.b.html", "about.html")}
+
+	before = _files()
+	site.build()
+	assert _files() == before
+
+	site.write("blog.a", {"title": "a, changed"})
+	site.build()
+	after = _files()
+	assert {name for name in before if after[name] != before[name]} == {"blog.html", "blog.a.html"}
+	assert "a, changed" in (site.public / "blog.html").read_text(encoding="utf-8")
+
+	site.build(["--rebuild"])
+	assert all(t != after[name] for name, t in _files().items())
@@ -0,0 +1,95 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import build
+
+
+def test_source_path_args_without_title():
+	args = build.add_source_path_args({"variable": "a=b"}, Path("content/notes.draft.md"), {})
+	assert args["variable"] == ["a=b", "sourcefile=content/notes.draft.md"]
+	assert args["metadata"] == ["pagetitle=notes.draft"]
+
+
+def test_source_path_args_keep_title():
+	args = build.add_source_path_args({}, Path("content/page.md"), {"title": "Page"})
+	assert "metadata" not in args
+	args = build.add_source_path_args({"metadata": ["pagetitle:Other"]}, Path("content/page.md"), {})
+	assert args["metadata"] == ["pagetitle:Other"]
+	assert args["variable"] == ["sourcefile=content/page.md"]
+
+
+def test_write_atomic(tmp_path):
+	path: Path = tmp_path / "page.html"
+	build.write_atomic(path, "one")
+	build.write_atomic(path, b"two")
+	assert path.read_bytes() == b"two"
+	assert os.stat(path).st_mode & 0o777 == 0o666 & ~build._UMASK
+
+	# a failed write leaves the old file, and no temporary file
+	with pytest.raises(TypeError):
+		build.write_atomic(path, 3)
+	assert path.read_bytes() == b"two"
+	assert [x.name for x in tmp_path.iterdir()] == ["page.html"]
+
+
+def test_write_if_changed(tmp_path):
+	path: Path = tmp_path / "feed.rss"
+	assert build.write_if_changed(path, "items")
+	ino: int = os.stat(path).st_ino
+	assert not build.write_if_changed(path, "items")
+	assert os.stat(path).st_ino == ino
+	assert build.write_if_changed(path, "more items")
+	assert path.read_text() == "more items"
+
+
+def _sync_cfg(**kwargs):
+	return {**build.DEFAULT_CONFIG, **kwargs}
+
+
+def test_sync_resources_copies_only_changes(tmp_path):
+	src, dst = tmp_path / "src", tmp_path / "dst"
+	(src / "css").mkdir(parents=True)
+	(src / "css" / "style.css").write_text("a {}")
+	(src / "logo.svg").write_text("<svg/>")
+	CFG = _sync_cfg(resources_sync_delete=True)
+
+	assert build.sync_resources(src, dst, CFG) == (2, 0, 0)
+	assert (dst / "css" / "style.css").read_text() == "a {}"
+	assert build.sync_resources(src, dst, CFG) == (0, 2, 0)
+
+	(src / "css" / "style.css").write_text("b { color: red }")
+	(src / "logo.svg").unlink()
+	(dst / "extra.txt").write_text("not a resource")
+	assert build.sync_resources(src, dst, CFG) == (1, 0, 2)
+	assert (dst / "css" / "style.css").read_text() == "b { color: red }"
+	assert sorted(x.name for x in dst.iterdir()) == ["css"]
+
+
+def test_sync_resources_check_by_hash(tmp_path):
+	src, dst = tmp_path / "src", tmp_path / "dst"
+	src.mkdir()
+	(src / "a.txt").write_text("one")
+	build.sync_resources(src, dst, _sync_cfg())
+
+	# same size and mtime, different content
+	st = os.stat(src / "a.txt")
+	(src / "a.txt").write_text("two")
+	os.utime(src / "a.txt", ns=(st.st_atime_ns, st.st_mtime_ns))
+	assert build.sync_resources(src, dst, _sync_cfg()) == (0, 1, 0)
+	assert build.sync_resources(src, dst, _sync_cfg(resources_sync_check="hash")) == (1, 0, 0)
+	assert (dst / "a.txt").read_text() == "two"
+
+
+def test_sync_resources_hardlink(tmp_path):
+	src, dst = tmp_path / "src", tmp_path / "dst"
+	src.mkdir()
+	(src / "a.txt").write_text("one")
+	CFG = _sync_cfg(resources_sync_mode="hardlink")
+	build.sync_resources(src, dst, CFG)
+	assert os.path.samefile(src / "a.txt", dst / "a.txt")
+	assert build.sync_resources(src, dst, CFG) == (0, 1, 0)
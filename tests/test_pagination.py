@@ -0,0 +1,36 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import build
+from conftest import needs_chevron_keep
+
+pytestmark = needs_chevron_keep
+
+
+INDEX_BODY: str = "{{#__children__}}\n- [{{title}}]({{__filename__}})\n{{/__children__}}\n"
+
+
+def _write_blog(site, page_size: int, n_posts: int) -> None:
+	site.write("blog", {"title": "blog", "__index__": True, "__index_page_size__": page_size}, INDEX_BODY)
+	for i in range(n_posts):
+		site.write(f"blog.post{i}", {"title": f"post {i}", "date": f"2024-01-{1 + i:02d}"})
+
+
+def test_index_pages_are_paginated(site):
+	_write_blog(site, page_size=2, n_posts=5)
+	site.build()
+	assert {"blog.html", "blog.page2.html", "blog.page3.html", "blog.rss"} <= site.outputs()
+	assert "blog.page4.html" not in site.outputs()
+	page2: str = (site.public / "blog.page2.html").read_text(encoding="utf-8")
+	assert "post 2" in page2 and "post 4" not in page2
+
+
+def test_pages_of_shrunk_index_pages_are_removed(site):
+	_write_blog(site, page_size=2, n_posts=5)
+	site.build()
+	_write_blog(site, page_size=4, n_posts=5)
+	site.build()
+	assert "blog.page2.html" in site.outputs()
+	assert "blog.page3.html" not in site.outputs()
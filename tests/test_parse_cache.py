@@ -0,0 +1,52 @@
+import datetime
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import build
+
+
+FRONTMATTER: str = """---
+title: page
+date: 2024-01-02
+updated: 2024-01-02 03:04:05+01:00
+tags: [a, b]
+nested: {count: 3, ratio: 0.5, draft: false, none: null}
+---
+body
+"""
+
+
+def _load_twice(tmp_path: Path, text: str):
+	md_path: Path = tmp_path / "page.md"
+	md_path.write_text(text, encoding="utf-8")
+	docs = list()
+	for _ in range(2):
+		cache = build.ParseCache(tmp_path / "cache.sqlite")
+		docs.append(cache.load(md_path))
+		cache.close()
+	return docs, cache
+
+
+def test_parse_cache_round_trips_frontmatter(tmp_path):
+	(first, second), cache = _load_twice(tmp_path, FRONTMATTER)
+	assert cache.n_hits == 1
+	assert second.frontmatter == first.frontmatter
+	assert type(second.frontmatter["date"]) is datetime.date
+	assert second.frontmatter["updated"] == datetime.datetime(
+		2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone(datetime.timedelta(hours=1)),
+	)
+
+
+def test_parse_cache_skips_what_json_cant_hold(tmp_path):
+	(first, second), cache = _load_twice(tmp_path, "---\nids: !!set {a, b}\n1: one\n---\nbody\n")
+	assert cache.n_hits == 0
+	assert second.frontmatter == first.frontmatter == {"ids": {"a", "b"}, 1: "one"}
+
+
+def test_frontmatter_json_is_unambiguous():
+	with pytest.raises(TypeError):
+		build.frontmatter_to_json({"x": {"__date__": "2024-01-02"}})
@@ -0,0 +1,68 @@
+import gzip
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import build
+
+
+def test_minify_html_collapses_text_whitespace():
+	html = "<p>some   text\n\n  here</p>  <!-- note -->\n<p>x</p>"
+	assert build.minify_html(html) == "<p>some text\nhere</p> \n<p>x</p>"
+
+
+def test_minify_html_keeps_preformatted_whitespace():
+	html = (
+		"<p>run <code>a  =  b\n  c</code>  now</p>\n"
+		"<pre><code>if x:\n    y</code></pre>\n"
+		"<script>var a  =  1;</script>"
+	)
+	assert build.minify_html(html) == (
+		"<p>run <code>a  =  b\n  c</code> now</p>\n"
+		"<pre><code>if x:\n    y</code></pre>\n"
+		"<script>var a  =  1;</script>"
+	)
+
+
+def test_minify_css():
+	css = "a , b {\n  color : red ; /* x */\n}\np { content: '  ' }"
+	assert build.minify_css(css) == "a,b{color : red;}p{content: '  '}"
+
+
+def test_postprocess_public_skips_unchanged_files(tmp_path):
+	public: Path = tmp_path / "public"
+	public.mkdir()
+	page: Path = public / "page.html"
+	page.write_text("<p>" + "some   text " * 50 + "</p>")
+	(public / "other.html").write_text("<p>x</p>")
+	CFG = {
+		**build.DEFAULT_CONFIG,
+		"public": str(public),
+		"postprocess_state_fname": str(tmp_path / "state.json"),
+		"minify_html": True,
+		"compress_gzip": True,
+		"jobs": 1,
+	}
+	state = build.PostprocessState.load(CFG)
+	assert build.postprocess_public(CFG, state) == (2, 0, 0)
+	state.save()
+	assert "   " not in page.read_text()
+	assert gzip.decompress((public / "page.html.gz").read_bytes()) == page.read_bytes()
+	# too small to be worth compressing
+	assert not (public / "other.html.gz").exists()
+
+	state = build.PostprocessState.load(CFG)
+	assert build.postprocess_public(CFG, state) == (0, 2, 0)
+
+	page.write_text("<p>" + "new   text " * 50 + "</p>")
+	assert build.postprocess_public(CFG, state) == (1, 1, 0)
+	assert gzip.decompress((public / "page.html.gz").read_bytes()) == page.read_bytes()
+
+	page.unlink()
+	assert build.postprocess_public(CFG, state) == (0, 1, 1)
+	assert not (public / "page.html.gz").exists()
+
+	# other settings process everything again
+	assert build.PostprocessState.load({**CFG, "minify_css": True}).files == dict()
+	assert build.PostprocessState.load({**CFG, "minify_html": False, "compress_gzip": False}) is None
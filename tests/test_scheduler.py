@@ -0,0 +1,101 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import build
+
+
+def _paths(*names):
+	return [Path(x) for x in names]
+
+
+def test_scheduler_starts_longest_ready_page_first():
+	paths = _paths("a", "b", "c", "index")
+	scheduler = build.PageScheduler(
+		paths,
+		{Path("a"): 1.0, Path("b"): 3.0, Path("c"): 2.0, Path("index"): 10.0},
+		{Path("index"): _paths("a", "b")},
+	)
+	assert [scheduler.pop() for _ in range(3)] == _paths("b", "c", "a")
+	assert not scheduler.has_ready() and scheduler.has_pending()
+	scheduler.done(Path("b"))
+	assert not scheduler.has_ready()
+	scheduler.done(Path("a"))
+	assert scheduler.pop() == Path("index")
+	assert not scheduler.has_pending()
+
+
+def test_scheduler_ignores_dependencies_not_being_built():
+	scheduler = build.PageScheduler(_paths("index"), {}, {Path("index"): _paths("a", "index")})
+	assert scheduler.pop() == Path("index")
+
+
+def test_scheduler_reports_cycles():
+	scheduler = build.PageScheduler(_paths("a", "b"), {}, {Path("a"): _paths("b"), Path("b"): _paths("a")})
+	with pytest.raises(RuntimeError):
+		scheduler.pop()
+
+
+def test_simulate_schedule():
+	estimates = {Path("a"): 1.0, Path("b"): 3.0, Path("c"): 2.0, Path("index"): 1.0}
+	seconds, order = build.simulate_schedule(
+		_paths("a", "b", "c", "index"), estimates, {Path("index"): _paths("a", "b", "c")}, 2,
+	)
+	# b on one worker, c then a on the other, then the index
+	assert order == _paths("b", "c", "a", "index")
+	assert seconds == 4.0
+	assert build.simulate_schedule(_paths("a", "b", "c"), estimates, None, 1)[0] == 6.0
+
+
+def _build(names, jobs, keep_going=False, fail=(), dependencies=None):
+	events = list()
+	lock = threading.Lock()
+
+	def _gen(CFG, log, pages, backend, pandoc_cache, name, seconds):
+		with lock:
+			events.append(("start", name))
+		time.sleep(seconds)
+		with lock:
+			events.append(("end", name))
+		if name in fail:
+			raise ValueError(name)
+
+	virtual_pages = {Path(n): (_gen, dict(name=n, seconds=t)) for n, t in names.items()}
+	built = list()
+	failures = build.build_pages(
+		list(enumerate(virtual_pages)),
+		{**build.DEFAULT_CONFIG, "jobs": jobs, "keep_going": keep_going},
+		dict(),
+		None,
+		on_built=lambda path, duration: built.append(path),
+		virtual_pages=virtual_pages,
+		estimates={Path(n): t for n, t in names.items()},
+		dependencies=dependencies,
+	)
+	return events, built, failures
+
+
+def test_build_pages_waits_for_dependencies():
+	names = {"a": 0.05, "b": 0.1, "index": 0.01, "c": 0.02}
+	events, built, failures = _build(names, jobs=3, dependencies={Path("index"): _paths("a", "b")})
+	assert failures == []
+	assert sorted(built) == sorted(Path(n) for n in names)
+	assert events.index(("start", "index")) > max(events.index(("end", "a")), events.index(("end", "b")))
+
+
+def test_build_pages_keep_going_reports_failures():
+	names = {"a": 0.01, "b": 0.01, "c": 0.01}
+	_, built, failures = _build(names, jobs=2, keep_going=True, fail={"b"})
+	assert [path for path, _ in failures] == [Path("b")]
+	assert sorted(built) == _paths("a", "c")
+
+
+def test_build_pages_stops_at_first_failure():
+	names = {"a": 0.05, "b": 0.01, "c": 0.01, "d": 0.01}
+	with pytest.raises(ValueError):
+		_build(names, jobs=1, fail={"a"})
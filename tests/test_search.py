@@ -0,0 +1,66 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import build
+
+
+@pytest.fixture
+def CFG(site):
+	return {
+		**build.DEFAULT_CONFIG,
+		**site.config,
+		"make_search_index": True,
+		"parse_cache_fname": None,
+	}
+
+
+def _update(CFG, source_hashes=None):
+	pages = build.discover_pages(CFG)
+	index = build.SearchIndex.load(CFG)
+	result = index.update(pages, CFG, source_hashes)
+	index.save()
+	return result
+
+
+def _lookup(CFG, term):
+	index_dir = Path(CFG["public"]) / CFG["search_index_dir"]
+	docs = json.loads((index_dir / "docs.json").read_text())["docs"]
+	shard = index_dir / f"{build.get_search_shard_name(term)}.json"
+	flat = json.loads(shard.read_text()).get(term, []) if shard.is_file() else []
+	return sorted(docs[doc_id][0] for doc_id in flat[::2])
+
+
+def test_search_index_updates_changed_pages(site, CFG):
+	site.write("apple", {"title": "apple", "description": "a fruit"}, "crunchy orchard text\n")
+	site.write("pear", {"title": "pear", "tags": ["orchard"]}, "soft text\n")
+	assert _update(CFG)[0] == 2
+	assert _lookup(CFG, "orchard") == ["apple.html", "pear.html"]
+
+	assert _update(CFG) == (0, 0)
+
+	site.write("apple", {"title": "apple"}, "crunchy text\n")
+	(site.content / "pear.md").unlink()
+	assert _update(CFG)[0] == 2
+	assert _lookup(CFG, "orchard") == []
+	assert _lookup(CFG, "crunchy") == ["apple.html"]
+
+
+def test_search_index_skips_unchanged_sources(site, CFG, monkeypatch):
+	site.write("apple", {"title": "apple"}, "crunchy text\n")
+	_update(CFG, {Path("./content/apple.md"): "hash 1"})
+
+	def _fail(page, CFG):
+		raise AssertionError("unchanged page was read")
+
+	with monkeypatch.context() as m:
+		m.setattr(build, "get_search_fields", _fail)
+		assert _update(CFG, {Path("./content/apple.md"): "hash 1"}) == (0, 0)
+
+	site.write("apple", {"title": "apple"}, "soft text\n")
+	assert _update(CFG, {Path("./content/apple.md"): "hash 2"})[0] == 1
+	assert _lookup(CFG, "soft") == ["apple.html"]
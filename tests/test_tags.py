@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import build
+
+
+def _pages(tags_by_page):
+	return {
+		Path(f"content/{name}.md"): SimpleNamespace(frontmatter={"tags": tags})
+		for name, tags in tags_by_page.items()
+	}
+
+
+def test_tag_slug_keeps_unicode():
+	assert build.tag_slug("日本") == "日本"
+	assert build.tag_slug("中文") == "中文"
+	assert build.tag_slug("Machine Learning") == "machine-learning"
+
+
+def test_tag_slug_punctuation_does_not_collide():
+	slugs = {build.tag_slug(t) for t in ["C", "C++", "C#", "c--", "!", "?", ""]}
+	assert len(slugs) == 7
+	assert build.tag_slug("C") == "c"
+	assert all(slug for slug in slugs)
+
+
+def test_tag_index_does_not_merge_distinct_tags():
+	CFG = {**build.DEFAULT_CONFIG, "tags_key": "tags"}
+	index = build.build_tag_index(
+		_pages({"a": ["日本", "C++"], "b": ["中文", "C"]}),
+		CFG,
+	)
+	assert index == {
+		"日本": [Path("content/a.md")],
+		"C++": [Path("content/a.md")],
+		"中文": [Path("content/b.md")],
+		"C": [Path("content/b.md")],
+	}
+
+
+def test_tag_index_lists_each_page_once_per_tag_page():
+	CFG = {**build.DEFAULT_CONFIG, "tags_key": "tags"}
+	index = build.build_tag_index(
+		_pages({"a": ["Machine Learning", "machine learning", "python"], "b": ["machine  learning"]}),
+		CFG,
+	)
+	assert index == {
+		"Machine Learning": [Path("content/a.md"), Path("content/b.md")],
+		"python": [Path("content/a.md")],
+	}